@@ -1,43 +1,524 @@
 import asyncio
+import csv
+import heapq
+import inspect
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
 from functools import cached_property
-from typing import Dict, Optional, Union, Callable, Any, List, Tuple, TYPE_CHECKING
+from pathlib import Path
+from typing import Dict, Optional, Union, Callable, Any, List, Tuple, AsyncGenerator, Awaitable, Iterator, \
+    Deque, Mapping, NamedTuple, Iterable, TypeVar, Set, TYPE_CHECKING
+from uuid import UUID
 
 if TYPE_CHECKING:
     from typing import Self
 
+    from nonebot_plugin_alconna import Target
+
 from loguru import logger
 from nonebot import get_plugin_config, get_driver
 from pydglab_ws import DGLabClient, DGLabWSServer, StrengthData, FeedbackButton, DGLabWSConnect, RetCode, \
-    DGLabWSClient, PulseOperation, Channel, PulseDataTooLong
+    DGLabWSClient, DGLabLocalClient, Channel, PulseDataTooLong, MessageType, MessageDataHead, PULSE_DATA_MAX_LENGTH, \
+    StrengthOperationType
 
+from . import ws_worker
+from .ws_worker import WorkerConnection, WorkerClient, WorkerError
 from .config import Config
+from .metrics import metrics_process_request, active_clients, scheduled_pulse_jobs, pulse_backlog, binds, app_disconnects, \
+    messages_received, pulse_refill_lag, add_pulses_latency, set_strength_latency, pulse_data_too_long
+from .model import PulseLoop, PulseLoopCursor, PulseWaveform, custom_pulse_data_reloader
+from .transport import RemoteTransport
+from .utils import render_qrcode_async
 
-__all__ = ["DGLabPlayClient", "client_manager"]
+__all__ = [
+    "send_compiled_pulses",
+    "open_connect",
+    "PulseScheduler",
+    "PulseQueueTracker",
+    "PulseTraceEvent",
+    "OptimisticStrength",
+    "StrengthAggregator",
+    "DGLabPlayClient",
+    "WarmConnection",
+    "ClientRegistry",
+    "pulse_scheduler",
+    "client_manager"
+]
 
 APP_PULSE_QUEUE_LEN = 50
 """DG-Lab App 波形队列最大持续时长"""
+WORKER_RESTART_MAX_BACKOFF = 60
+"""重启本地服务端工作进程失败时的最大重试间隔（秒）"""
+WORKER_START_TIMEOUT = 30
+"""等待本地服务端工作进程完成启动的最长时间（秒），超时后结束该进程并按启动失败处理"""
 
 config = get_plugin_config(Config).dg_lab_play
 driver = get_driver()
 
+_T = TypeVar("_T")
+
+PulseJob = AsyncGenerator[float, None]
+"""波形发送任务，每次迭代执行一步，并给出距离下一步的等待时间（秒）"""
+
+
+def _is_send_owned_compatible() -> bool:
+    """pydglab-ws 的私有方法 ``DGLabClient._send_owned`` 是否仍存在且签名未变"""
+    send_owned = getattr(DGLabClient, "_send_owned", None)
+    if not inspect.iscoroutinefunction(send_owned):
+        return False
+    return list(inspect.signature(send_owned).parameters) == ["self", "msg_type", "msg"]
+
+
+_send_owned_compatible = _is_send_owned_compatible()
+if not _send_owned_compatible:
+    logger.warning("当前版本的 pydglab-ws 不支持直接发送已编码的波形数据，将在每次发送时重新编码")
+
+
+async def send_compiled_pulses(client: Union[DGLabClient, WorkerClient], channel: Channel, compiled_post: str):
+    """
+    下发已编码为 JSON 数组的波形数据
+
+    公开的 ``add_pulses`` 只接受 ``PulseOperation`` 并在每次发送时重新编码，因此通过 pydglab-ws 的私有方法
+    ``_send_owned`` 直接发送已编码的数据。升级 pydglab-ws 后该方法不存在或签名发生变化时，
+    改为将数据解码后通过 ``add_pulses`` 发送
+
+    :param client: 已绑定 App 的终端
+    :param channel: 通道选择
+    :param compiled_post: 已编码为 JSON 数组的波形数据
+    """
+    if isinstance(client, WorkerClient):
+        await client.add_compiled_pulses(channel, compiled_post)
+    elif _send_owned_compatible:
+        # noinspection PyProtectedMember
+        await client._send_owned(MessageType.MSG, f"{MessageDataHead.PULSE.value}-{channel.name}:{compiled_post}")
+    else:
+        await client.add_pulses(channel, *PulseWaveform(bytes.fromhex("".join(json.loads(compiled_post)))))
+
+
+async def open_connect(connect: DGLabWSConnect) -> DGLabWSClient:
+    """
+    打开连接并完成终端注册
+
+    ``DGLabWSConnect.__aenter__`` 先打开 WebSocket 连接再注册，注册超时或失败时不会关闭已打开的连接，
+    因此在这里关闭后再抛出异常
+
+    :param connect: 连接管理器，成功时由调用方通过 ``__aexit__`` 关闭
+    :return: 已完成注册的终端
+    """
+    try:
+        return await connect.__aenter__()
+    except BaseException:
+        try:
+            await connect.__aexit__(*sys.exc_info())
+        except AttributeError:
+            # WebSocket 连接未能打开，没有需要关闭的连接
+            pass
+        raise
+
+
+class PulseScheduler:
+    """
+    波形发送调度器
+
+    所有终端的波形发送任务都由同一个循环驱动，而不是每个终端各自创建一个 ``asyncio.Task`` 并各自睡眠。
+    待执行的任务保存在以到期时间为键的最小堆中，调度循环在最早的任务到期时唤醒，取出所有已到期的任务，
+    每一步在各自的 ``asyncio.Task`` 中执行，执行完毕后再重新加入堆中，因此个别终端发送缓慢不会阻塞其他终端的任务。
+    """
+
+    def __init__(self):
+        self.last_lag: float = 0
+        """最近一批任务相对于到期时间的延迟（秒）"""
+        self.max_lag: float = 0
+        """任务相对于到期时间的最大延迟（秒）"""
+        self._heap: List[Tuple[float, int, "DGLabPlayClient", PulseJob]] = []
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._steps: Set[asyncio.Task] = set()
+        """正在执行的任务步骤，保留引用以免被垃圾回收"""
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @property
+    def backlog(self) -> int:
+        """已到期但还未开始执行的任务数"""
+        now = asyncio.get_running_loop().time()
+        return sum(1 for due, *_ in self._heap if due <= now)
+
+    def schedule(self, play_client: "DGLabPlayClient", job: PulseJob, delay: float = 0):
+        """
+        在 ``delay`` 秒后执行一步波形发送任务
+
+        :param play_client: 任务所属的终端，任务不再是终端的 ``pulse_job`` 时将被丢弃
+        :param job: 波形发送任务
+        :param delay: 延迟时间（秒）
+        """
+        if not self._task or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        due = asyncio.get_running_loop().time() + delay
+        heapq.heappush(self._heap, (due, next(self._counter), play_client, job))
+        if self._heap[0][0] == due:
+            self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            now = loop.time()
+            if (delay := self._heap[0][0] - now) > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.last_lag = now - self._heap[0][0]
+            self.max_lag = max(self.max_lag, self.last_lag)
+            pulse_refill_lag.observe(self.last_lag)
+            while self._heap and self._heap[0][0] <= now:
+                _, _, play_client, job = heapq.heappop(self._heap)
+                if play_client.pulse_job is job:
+                    step = play_client.pulse_step = asyncio.create_task(self._run_step(play_client, job))
+                    self._steps.add(step)
+                    step.add_done_callback(self._steps.discard)
+                else:
+                    asyncio.create_task(job.aclose())
+
+    async def _run_step(self, play_client: "DGLabPlayClient", job: PulseJob):
+        try:
+            delay = await job.__anext__()
+        except (StopAsyncIteration, Exception) as e:
+            if not isinstance(e, StopAsyncIteration):
+                logger.exception(f"用户 {play_client.user_id} 的波形发送任务出现异常，已退出")
+            # 任务已结束，之后追加波形时需要重新创建任务
+            if play_client.pulse_job is job:
+                play_client.pulse_job = play_client.pulse_cursor = None
+            return
+        if play_client.pulse_job is job:
+            self.schedule(play_client, job, delay)
+        else:
+            await job.aclose()
+
+
+pulse_scheduler = PulseScheduler()
+scheduled_pulse_jobs.set_function(pulse_scheduler.__len__)
+pulse_backlog.set_function(lambda: pulse_scheduler.backlog)
+
+
+class PulseQueueTracker:
+    """
+    DG-Lab App 波形队列占用估计
+
+    以单调时钟记录每次下发波形的时间与长度，App 每秒消耗 10 条波形数据，据此估计队列当前的占用时长，
+    超出 :data:`APP_PULSE_QUEUE_LEN` 的部分会被 App 丢弃
+
+    :param capacity: 视为队列已满的占用时长（秒）
+    """
+
+    def __init__(self, capacity: float = APP_PULSE_QUEUE_LEN):
+        self.capacity = capacity
+        self.last_post_time: Optional[float] = None
+        """最近一次下发波形的时间"""
+        self.last_post_length: int = 0
+        """最近一次下发的波形数据条数"""
+        self._drain_time: float = 0
+        """按当前占用，队列预计被播放完毕的时间"""
+
+    def occupancy(self, now: float = None) -> float:
+        """队列当前的占用时长（秒）"""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._drain_time - now)
+
+    def deficit(self, now: float = None) -> float:
+        """队列当前的空余时长（秒）"""
+        return max(0.0, self.capacity - self.occupancy(now))
+
+    def time_until_deficit(self, duration: float, now: float = None) -> float:
+        """距离队列空出 ``duration`` 秒的空间还需要的时间（秒）"""
+        return max(0.0, duration - self.deficit(now))
+
+    def refill_delay(self, post_duration: float, post_interval: float, now: float = None) -> float:
+        """
+        距离下一次补充队列需要等待的时间（秒）
+
+        队列仍有空余时在 ``post_interval`` 后继续补充，否则等待队列空出 ``post_duration`` 秒的空间。
+        等待的空间最多为容量的一半，否则容量小于 ``post_duration`` 时空间永远不够，容量与其相近时也会等到队列被播放完
+
+        :param post_duration: 每次下发的最大时长（秒）
+        :param post_interval: 队列仍有空余时的补充间隔（秒）
+        """
+        if self.deficit(now) >= 0.1:
+            return post_interval
+        return self.time_until_deficit(min(post_duration, self.capacity / 2), now)
+
+    def record(self, length: int, now: float = None):
+        """
+        记录一次波形下发
+
+        :param length: 下发的波形数据条数
+        """
+        now = time.monotonic() if now is None else now
+        self.last_post_time = now
+        self.last_post_length = length
+        self._drain_time = min(
+            max(now, self._drain_time) + length * 0.1,
+            now + APP_PULSE_QUEUE_LEN
+        )
+
+    def clear(self):
+        """记录一次队列清空"""
+        self._drain_time = 0
+
+
+class PulseTraceEvent(NamedTuple):
+    """一次波形补充的追踪记录"""
+    timestamp: float
+    """开始发送的时间（Unix 时间戳）"""
+    lag: Optional[float]
+    """相对于预定发送时间的延迟（秒），任务的首次发送没有预定时间，为 ``None``"""
+    send_duration: float
+    """所有目标通道发送完毕的耗时（秒）"""
+    frames: int
+    """发送的波形数据条数"""
+    queue_level: float
+    """发送前估计的 App 波形队列占用（秒），为 ``0`` 说明队列已播放完，波形出现了中断"""
+
+
+class OptimisticStrength:
+    """
+    乐观的强度状态
+
+    发送设置强度的消息时立即按目标强度更新，不等待 App 反馈。每次发送的目标强度带有递增的版本号，
+    收到 App 反馈的强度数据时与各通道尚未确认的目标强度对账：
+    反馈的强度与某个未确认的目标相同时，该目标及更早的目标视为已生效；
+    超过 ``confirm_timeout`` 仍未确认的目标视为已被 App 丢弃或被 App 端的操作覆盖，以反馈的强度为准。
+
+    :param confirm_timeout: 目标强度等待 App 确认的最长时间（秒）
+    """
+
+    def __init__(self, confirm_timeout: float):
+        self.confirm_timeout = confirm_timeout
+        self.confirmed: Optional[StrengthData] = None
+        """App 最近一次反馈的强度数据"""
+        self.version = 0
+        """每次发送目标强度或收到 App 反馈时递增"""
+        self._pending: Dict[Channel, Deque[Tuple[int, int, float]]] = {Channel.A: deque(), Channel.B: deque()}
+        """各通道尚未确认的 版本号，目标强度，发送时间"""
+
+    @property
+    def current(self) -> Optional[StrengthData]:
+        """按已发送的目标强度估计的当前强度，尚未收到 App 反馈时为 ``None``"""
+        if self.confirmed is None:
+            return None
+        self._expire(time.monotonic())
+        pending_a, pending_b = self._pending[Channel.A], self._pending[Channel.B]
+        return StrengthData(
+            a=pending_a[-1][1] if pending_a else self.confirmed.a,
+            b=pending_b[-1][1] if pending_b else self.confirmed.b,
+            a_limit=self.confirmed.a_limit,
+            b_limit=self.confirmed.b_limit
+        )
+
+    def apply(self, channel_to_value: Dict[Channel, int]) -> int:
+        """
+        记录即将发送的目标强度
+
+        :return: 本次目标强度的版本号
+        """
+        self.version += 1
+        now = time.monotonic()
+        for channel, value in channel_to_value.items():
+            self._pending[channel].append((self.version, value, now))
+        return self.version
+
+    def discard(self, version: int, *channels: Channel):
+        """撤销发送失败的目标强度"""
+        for channel in channels:
+            self._pending[channel] = deque(entry for entry in self._pending[channel] if entry[0] != version)
+
+    def reconcile(self, data: StrengthData):
+        """按 App 反馈的强度数据对账"""
+        self.version += 1
+        self.confirmed = data
+        for channel, value in (Channel.A, data.a), (Channel.B, data.b):
+            pending = self._pending[channel]
+            for index, (_, target, _) in enumerate(pending):
+                if target == value:
+                    for _ in range(index + 1):
+                        pending.popleft()
+                    break
+        self._expire(time.monotonic())
+
+    def _expire(self, now: float):
+        for pending in self._pending.values():
+            while pending and now - pending[0][2] > self.confirm_timeout:
+                pending.popleft()
+
+
+class StrengthAggregator:
+    """
+    单个终端的强度指令合并器
+
+    不在合并窗口内的指令立即发送，并开启一个 ``window`` 秒的合并窗口。窗口内到达的强度指令会按到达顺序依次作用于当前强度
+    （与 App 一样限制在 0 到强度上限之间），在窗口结束时合并为每个通道一条 ``SET_TO`` 指令发送，
+    这些指令的调用者都会得到这一次发送的结果，发送后再开启下一个合并窗口。
+    因此单独的指令不会被延迟，连续的指令每个窗口最多发送一次，窗口也不随后续指令顺延，持续的指令不会使发送被无限推迟。
+
+    :param play_client: 所属的终端
+    :param window: 合并窗口（秒），为 ``0`` 时不合并，每条指令立即发送
+    """
+
+    def __init__(self, play_client: "DGLabPlayClient", window: float):
+        self.play_client = play_client
+        self.window = window
+        self._operations: List[Tuple[StrengthOperationType, Dict[Channel, int]]] = []
+        self._result: Optional[asyncio.Future] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._window_end: float = 0
+        """当前合并窗口的结束时间（事件循环时间）"""
+
+    async def submit(
+            self,
+            operation_type: StrengthOperationType,
+            channel_to_value: Dict[Channel, int],
+            coalesce: bool = True
+    ) -> Dict[Channel, Optional[BaseException]]:
+        """
+        提交强度指令，不在合并窗口内时立即发送，否则等待其所在的合并窗口发送完毕
+
+        :param operation_type: 强度变化模式
+        :param channel_to_value: 通道到强度数值的映射
+        :param coalesce: 为 ``False`` 时不参与合并，立即发送，用于全体命令等不应等待合并窗口的场景。\
+            仍会基于乐观估计的强度计算，之后合并发送的指令会作用在其结果上
+        :return: 各通道操作时出现的异常，成功则为 ``None``
+        """
+        if not self.window or not coalesce:
+            return await self._send([(operation_type, channel_to_value)])
+        loop = asyncio.get_running_loop()
+        if self._result is None and (now := loop.time()) >= self._window_end:
+            self._window_end = now + self.window
+            return await self._send([(operation_type, channel_to_value)])
+        self._operations.append((operation_type, channel_to_value))
+        if self._result is None:
+            self._result = loop.create_future()
+            self._flush_task = asyncio.create_task(self._flush_later(self._window_end - loop.time()))
+        # 避免某个调用者被取消时取消其他调用者共同等待的结果
+        return dict(await asyncio.shield(self._result))
+
+    def net_strengths(self, operations: List[Tuple[StrengthOperationType, Dict[Channel, int]]]) -> Dict[Channel, int]:
+        """将指令按顺序作用于乐观估计的当前强度，得到各通道的最终强度"""
+        # 未获取到强度时（正常情况下指令不会在此时提交）按强度为 0、上限为 200 计算
+        strength = self.play_client.strength or StrengthData(a=0, b=0, a_limit=200, b_limit=200)
+        current = {Channel.A: strength.a, Channel.B: strength.b}
+        limits = {Channel.A: strength.a_limit, Channel.B: strength.b_limit}
+        targets: Dict[Channel, int] = {}
+        for operation_type, channel_to_value in operations:
+            for channel, value in channel_to_value.items():
+                if operation_type == StrengthOperationType.INCREASE:
+                    value = targets.get(channel, current[channel]) + value
+                elif operation_type == StrengthOperationType.DECREASE:
+                    value = targets.get(channel, current[channel]) - value
+                targets[channel] = min(max(value, 0), limits[channel])
+        return targets
+
+    async def _send(
+            self,
+            operations: List[Tuple[StrengthOperationType, Dict[Channel, int]]]
+    ) -> Dict[Channel, Optional[BaseException]]:
+        """合并指令并发送，发送前先更新乐观的强度状态，发送失败的通道将被撤销"""
+        channel_to_value = self.net_strengths(operations)
+        version = self.play_client.strength_state.apply(channel_to_value)
+        channel_to_error = await self.play_client.set_strengths(StrengthOperationType.SET_TO, channel_to_value)
+        self.play_client.strength_state.discard(
+            version,
+            *(channel for channel, error in channel_to_error.items() if error)
+        )
+        return channel_to_error
+
+    async def _flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        operations, result = self._operations, self._result
+        self._operations, self._result = [], None
+        self._window_end = asyncio.get_running_loop().time() + self.window
+        try:
+            result.set_result(await self._send(operations))
+        except Exception as e:
+            result.set_exception(e)
+        finally:
+            if not result.done():
+                result.cancel()
+
 
 class DGLabPlayClient:
     """
     单个终端的连接管理器
 
     :param user_id: 用户 ID，如 QQ 号
-    :param client: pydglab-ws 的终端对象
+    :param destroy_callback: 终端被摧毁时调用的回调函数
+    :param client: pydglab-ws 的终端对象，或工作进程上的终端
+    :param update_callback: 终端完成注册、绑定或重新绑定，即 ``client_id``, ``target_id`` 发生变化时调用的回调函数
+    :param server_uri: 终端需要连接的 WebSocket 服务端 URI，为 ``None`` 时使用 ``client`` 或远程服务端
+    :param publish_uri: 生成二维码时使用的服务端 URI，为 ``None`` 时使用配置中的远程服务端或本地服务端 URI
+    :param connect_kwargs: 连接 WebSocket 服务端时 :class:`DGLabWSConnect` 的其他参数
+    :param connect: 已完成注册的连接管理器，与 ``client`` 一同传入，终端退出时将由终端关闭
+    :param transport: 连接服务端时使用的共享传输设置，其参数会被 ``connect_kwargs`` 覆盖
     """
 
-    def __init__(self, user_id: str, destroy_callback: Callable[["Self"], Any], client: DGLabClient = None):
+    def __init__(
+            self,
+            user_id: str,
+            destroy_callback: Callable[["Self"], Any],
+            client: Union[DGLabClient, WorkerClient] = None,
+            update_callback: Callable[["Self"], Any] = None,
+            server_uri: str = None,
+            publish_uri: str = None,
+            connect_kwargs: Dict[str, Any] = None,
+            connect: DGLabWSConnect = None,
+            transport: RemoteTransport = None
+    ):
         self.user_id = user_id
-        self.client: Optional[DGLabClient] = client
+        self.client: Optional[Union[DGLabClient, WorkerClient]] = client
         self._destroy_callback = destroy_callback
+        self._update_callback = update_callback
+        self.server_uri = server_uri or (config.ws_server.remote_server_uri if config.ws_server.remote_server else None)
+        self.publish_uri = publish_uri or (
+            config.ws_server.remote_server_uri if config.ws_server.remote_server else
+            config.ws_server.local_server_publish_uri
+        )
+        self._connect_kwargs = connect_kwargs or {}
+        self._connect = connect
+        self._transport = transport
         self.last_strength: Optional[StrengthData] = None
+        """App 最近一次反馈的强度数据"""
+        self.strength_state = OptimisticStrength(config.dg_lab_client.strength_confirm_timeout)
         self.last_feedback: Optional[FeedbackButton] = None
         self.fetch_task: Optional[asyncio.Task] = None
-        self._pulse_name_data: Tuple[List[str], List[PulseOperation]] = ([], [])
-        self.pulse_task: Optional[asyncio.Task] = None
+        self.pulse_loop = PulseLoop()
+        self.pulse_job: Optional[PulseJob] = None
+        self.pulse_step: Optional[asyncio.Task] = None
+        """正在执行的一步波形发送任务，替换或结束任务时将被取消"""
+        self.pulse_cursor: Optional[PulseLoopCursor] = None
+        self.pulse_queue = PulseQueueTracker(
+            min(config.pulse_data.queue_duration, APP_PULSE_QUEUE_LEN - config.pulse_data.queue_margin)
+        )
+        self.strength_aggregator = StrengthAggregator(self, config.dg_lab_client.strength_coalesce_window)
+        self.pulse_trace: Optional[Deque[PulseTraceEvent]] = None
+        """波形补充的追踪记录，未开启追踪时为 ``None``"""
+        self.session: Optional["Target"] = None
+        """
+        玩家最近一次加入游戏时所在的会话，@全体成员 的全体命令只作用于同一会话中的玩家
+
+        应通过 :meth:`ClientRegistry.set_session` 设置，以同时更新会话索引
+        """
         self.is_destroyed: bool = False
 
         self.register_finished_lock = asyncio.Lock()
@@ -54,33 +535,35 @@ class DGLabPlayClient:
 
     @cached_property
     def qrcode(self) -> Optional[str]:
-        return self.client.get_qrcode(
-            config.ws_server.remote_server_uri if config.ws_server.remote_server else
-            config.ws_server.local_server_publish_uri
-        )
+        return self.client.get_qrcode(self.publish_uri)
 
     @property
-    def pulse_names(self) -> List[str]:
-        return self._pulse_name_data[0]
+    def strength(self) -> Optional[StrengthData]:
+        """乐观估计的当前强度，已发送的强度变化在 App 反馈前即会体现，尚未收到 App 反馈时为 ``None``"""
+        return self.strength_state.current
 
     @property
-    def pulse_data(self) -> List[PulseOperation]:
-        return self._pulse_name_data[1]
+    def pulse_names(self) -> List[str]:
+        return self.pulse_loop.names
 
     async def destroy(self):
         """断开终端的 WS 连接，调用回调函数，并解锁等待锁，以及取消消息获取的任务"""
+        if self.is_destroyed:
+            return
         self.is_destroyed = True
         if self.client and isinstance(self.client, DGLabWSClient):
             await self.client.websocket.close()
+        elif isinstance(self.client, WorkerClient):
+            await self.client.close()
         self._destroy_callback(self)
         for lock in self.register_finished_lock, self.bind_finished_lock:
             if lock.locked():
                 lock.release()
         if self.fetch_task:
             self.fetch_task.cancel()
-        if self.pulse_task and not self.pulse_task.cancelled() and not self.pulse_task.done():
-            self.pulse_task.cancel()
-        logger.info(f"已结束并摧毁 {self.user_id} - {self.client.client_id} 的终端")
+        self.pulse_job = None
+        self._cancel_pulse_step()
+        logger.info(f"已结束并摧毁 {self.user_id} - {self.client.client_id if self.client else None} 的终端")
 
     async def wait_for_bind(self, rebind: bool = False) -> bool:
         """
@@ -93,40 +576,100 @@ class DGLabPlayClient:
                 self.client.bind() if not rebind else self.client.rebind(),
                 timeout=config.dg_lab_client.bind_timeout
             )
+            if self._update_callback:
+                self._update_callback(self)
+            binds.inc(kind="rebind" if rebind else "bind", result="success")
             return True
         except asyncio.TimeoutError:
+            binds.inc(kind="rebind" if rebind else "bind", result="timeout")
             await self.destroy()
             return False
         finally:
             if self.bind_finished_lock.locked():
                 self.bind_finished_lock.release()
 
-    def setup_pulse_job(self, pulse_names: List[str], pulse_data: List[PulseOperation], *channels: Channel):
+    def setup_pulse_job(self, pulse_loop: PulseLoop, *channels: Channel, append: bool = False):
         """
         设置波形发送任务
 
-        :param pulse_names: 波形名称
-        :param pulse_data: 波形数据
+        :param pulse_loop: 波形循环
         :param channels: 目标通道
+        :param append: 新的波形循环是否为在当前波形循环末尾追加了波形的结果，\
+            是则保留 App 波形队列，并在下次发送时从当前位置继续发送新的波形循环
         """
-        names, data = self._pulse_name_data
-        for current, new in zip((names, data), (pulse_names, pulse_data)):  # type: list, list
-            current.clear()
-            current.extend(new)
-        if self.pulse_task and not self.pulse_task.cancelled() and not self.pulse_task.done():
-            self.pulse_task.cancel()
-        self.pulse_task = asyncio.create_task(
-            self._pulse_job(pulse_data, *channels)
-        )
-        logger.info(f"已为用户 {self.user_id} 设置波形任务，波形长度 {len(pulse_data)}")
+        self.pulse_loop = pulse_loop
+        if append and self.pulse_job:
+            if self.pulse_cursor:
+                self.pulse_cursor.switch(pulse_loop)
+            logger.info(f"已为用户 {self.user_id} 更新波形循环，波形长度 {len(pulse_loop)}")
+            return
+        self.pulse_cursor = None
+        # 旧任务正在发送的波形可能晚于新任务的清空指令到达 App，并写入新任务已清空的队列占用估计
+        self._cancel_pulse_step()
+        self.pulse_job = self._pulse_job(pulse_loop, *channels)
+        pulse_scheduler.schedule(self, self.pulse_job)
+        logger.info(f"已为用户 {self.user_id} 设置波形任务，波形长度 {len(pulse_loop)}")
+
+    def _cancel_pulse_step(self):
+        if self.pulse_step and not self.pulse_step.done():
+            self.pulse_step.cancel()
+        self.pulse_step = None
+
+    def update_waveforms(self, pulse_data: Mapping[str, PulseWaveform]) -> bool:
+        """
+        将波形循环中的波形更新为 ``pulse_data`` 中的同名波形，正在运行的波形发送任务将从当前位置继续发送新的波形循环
+
+        :return: 波形循环是否发生了变化
+        """
+        if (pulse_loop := self.pulse_loop.replaced(pulse_data)) is self.pulse_loop:
+            return False
+        self.pulse_loop = pulse_loop
+        if self.pulse_cursor:
+            self.pulse_cursor.switch(pulse_loop)
+        logger.info(f"已为用户 {self.user_id} 更新波形循环中被修改的波形，波形长度 {len(pulse_loop)}")
+        return True
+
+    def enable_pulse_trace(self, size: int = None):
+        """
+        开启波形补充追踪，只保留最近 ``size`` 条记录，已开启时保留已有的记录
+
+        :param size: 保留的记录数，为 ``None`` 时使用 ``pulse_trace_size``
+        """
+        size = size or config.dg_lab_client.pulse_trace_size
+        self.pulse_trace = deque(self.pulse_trace or (), maxlen=size)
+
+    def disable_pulse_trace(self):
+        """关闭波形补充追踪，并丢弃已有的记录"""
+        self.pulse_trace = None
+
+    async def dump_pulse_trace(self, path: Path):
+        """
+        将波形补充的追踪记录以 CSV 格式写入 ``path``
+
+        写入当前记录的副本，文件在线程中写入，不阻塞正在被追踪的波形发送
+        """
+        await asyncio.to_thread(self._write_pulse_trace, path, list(self.pulse_trace or ()))
+
+    @staticmethod
+    def _write_pulse_trace(path: Path, events: List[PulseTraceEvent]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(PulseTraceEvent._fields)
+            writer.writerows(events)
 
     async def _handle_data(self, data: Union[StrengthData, FeedbackButton, RetCode]):
         """处理消息"""
         if isinstance(data, StrengthData):
+            messages_received.inc(type="strength")
             self.last_strength = data
+            self.strength_state.reconcile(data)
         elif isinstance(data, FeedbackButton):
+            messages_received.inc(type="feedback")
             self.last_feedback = data
         elif data == RetCode.CLIENT_DISCONNECTED:
+            messages_received.inc(type="disconnect")
+            app_disconnects.inc()
             logger.info(f"终端 {self.client.client_id} 绑定的 App 已断开")
             async with self.bind_finished_lock:
                 await self.wait_for_bind(rebind=True)
@@ -134,13 +677,16 @@ class DGLabPlayClient:
     async def _serve(self):
         """建立终端连接，并不断获取和处理消息"""
         try:
-            if config.ws_server.remote_server:
+            if self.client is None:
+                connect_kwargs = await self._transport.connect_kwargs() if self._transport else {}
+                connect_kwargs.update(self._connect_kwargs)
+                connect = DGLabWSConnect(self.server_uri, config.dg_lab_client.register_timeout, **connect_kwargs)
                 try:
-                    async with DGLabWSConnect(
-                            config.ws_server.remote_server_uri,
-                            config.dg_lab_client.register_timeout
-                    ) as client:
+                    client = await open_connect(connect)
+                    try:
                         self.client = client
+                        if self._update_callback:
+                            self._update_callback(self)
                         self.register_finished_lock.release()
                         logger.success(f"终端 {client.client_id} 成功注册")
                         if not await self.wait_for_bind():
@@ -149,65 +695,424 @@ class DGLabPlayClient:
                         logger.success(f"终端 {client.client_id} 成功与 App {client.target_id} 绑定")
                         async for data in client.data_generator():
                             await self._handle_data(data)
+                    finally:
+                        await connect.__aexit__(None, None, None)
                 except asyncio.TimeoutError:
-                    logger.error(f"终端从 {config.ws_server.remote_server_uri} 获取 clientId 超时")
+                    logger.error(f"终端从 {self.server_uri} 获取 clientId 超时")
                     await self.destroy()
                     return
+                except OSError:
+                    # 缓存的地址可能已失效，下次连接时重新解析
+                    if self._transport:
+                        self._transport.invalidate()
+                    raise
             else:
-                self.register_finished_lock.release()
-                if not await self.wait_for_bind():
-                    logger.warning(f"终端 {self.client.client_id} 等待绑定超时")
-                    return
-                logger.success(f"终端 {self.client.client_id} 成功与 App {self.client.target_id} 绑定")
-                async for data in self.client.data_generator():
-                    await self._handle_data(data)
+                try:
+                    self.register_finished_lock.release()
+                    if not await self.wait_for_bind():
+                        logger.warning(f"终端 {self.client.client_id} 等待绑定超时")
+                        return
+                    logger.success(f"终端 {self.client.client_id} 成功与 App {self.client.target_id} 绑定")
+                    async for data in self.client.data_generator():
+                        await self._handle_data(data)
+                finally:
+                    if self._connect:
+                        await self._connect.__aexit__(None, None, None)
         except Exception:
-            logger.exception("终端连接出现异常，已退出")
+            if not self.is_destroyed:
+                logger.exception("终端连接出现异常，已退出")
+                await self.destroy()
+
+    async def dispatch(
+            self,
+            operation: Callable[[Channel], Awaitable[Any]],
+            *channels: Channel
+    ) -> Dict[Channel, Optional[BaseException]]:
+        """
+        对多个通道并发执行同一操作
+
+        :param operation: 对单个通道执行的操作
+        :param channels: 目标通道
+        :return: 各通道操作时出现的异常，成功则为 ``None``
+        """
+        results = await asyncio.gather(*(operation(channel) for channel in channels), return_exceptions=True)
+        return {
+            channel: result if isinstance(result, BaseException) else None
+            for channel, result in zip(channels, results)
+        }
+
+    async def set_strengths(
+            self,
+            operation_type: StrengthOperationType,
+            channel_to_value: Dict[Channel, int]
+    ) -> Dict[Channel, Optional[BaseException]]:
+        """
+        并发设置多个通道的强度
 
-    async def _pulse_job(self, pulse_data: List[PulseOperation], *channels: Channel):
+        :param operation_type: 强度变化模式
+        :param channel_to_value: 通道到强度数值的映射
+        :return: 各通道操作时出现的异常，成功则为 ``None``
+        """
+        with set_strength_latency.time():
+            return await self.dispatch(
+                lambda channel: self.client.set_strength(channel, operation_type, channel_to_value[channel]),
+                *channel_to_value.keys()
+            )
+
+    async def add_compiled_pulses(self, channel: Channel, compiled_post: str, length: int):
+        """
+        下发已编码的波形数据，跳过逐条编码
+
+        :param channel: 通道选择
+        :param compiled_post: 已编码为 JSON 数组的波形数据
+        :param length: 波形数据条数
+        :raise PulseDataTooLong: 波形操作数据过长
+        """
+        if length > PULSE_DATA_MAX_LENGTH:
+            raise PulseDataTooLong(length)
+        await self.client.ensure_bind()
+        with add_pulses_latency.time():
+            await send_compiled_pulses(self.client, channel, compiled_post)
+
+    def _raise_for_channels(self, channel_to_error: Dict[Channel, Optional[BaseException]]):
+        """记录各通道出现的异常，并抛出其中第一个"""
+        errors = [(channel, error) for channel, error in channel_to_error.items() if error]
+        for channel, error in errors:
+            logger.opt(exception=error).warning(f"用户 {self.user_id} 的通道 {channel.name} 操作失败")
+        if errors:
+            raise errors[0][1]
+
+    async def _pulse_job(self, pulse_loop: PulseLoop, *channels: Channel) -> PulseJob:
+        """波形发送任务，由 :class:`PulseScheduler` 驱动，``yield`` 的值为距离下一步的等待时间"""
         try:
-            for channel in channels:
-                await self.client.clear_pulses(channel)
-            await asyncio.sleep(config.pulse_data.sleep_after_clear)
+            self._raise_for_channels(await self.dispatch(self.client.clear_pulses, *channels))
+            self.pulse_queue.clear()
+            if not pulse_loop:
+                return
+            # 本地服务端（包括工作进程）的终端发送完毕时，清空指令已经写入了与 App 的连接，后续的波形数据不会先于它到达
+            if not isinstance(self.client, (DGLabLocalClient, WorkerClient)):
+                yield config.pulse_data.sleep_after_clear
 
-            pulse_data_duration = len(pulse_data) * 0.1
-            replay_times = int(config.pulse_data.duration_per_post // pulse_data_duration)
-            actual_duration = replay_times * pulse_data_duration
-            max_pulse_num = int(APP_PULSE_QUEUE_LEN // actual_duration)
-            pulse_data_for_post = pulse_data * replay_times
+            # 清空队列期间可能已追加了波形，使用最新的波形循环
+            cursor = self.pulse_cursor = self.pulse_loop.cursor()
+            window_length = min(round(config.pulse_data.duration_per_post * 10), PULSE_DATA_MAX_LENGTH)
 
+            # 开启追踪时，下一步的预定执行时间
+            planned_at: Optional[float] = None
             try:
-                for _ in range(max_pulse_num):
-                    for channel in channels:
-                        await self.client.add_pulses(channel, *pulse_data_for_post)
-                    await asyncio.sleep(config.pulse_data.post_interval)
-
-                # 减去上面多余的睡眠时间
-                await asyncio.sleep(abs(pulse_data_duration - config.pulse_data.post_interval))
                 while True:
-                    for channel in channels:
-                        await self.client.add_pulses(channel, *pulse_data_for_post)
-                    await asyncio.sleep(pulse_data_duration)
+                    # 只补充队列空余的部分，从上次发送结束的位置继续
+                    if post_length := min(window_length, int(self.pulse_queue.deficit() * 10)):
+                        compiled_post = json.dumps(cursor.take(post_length), separators=(",", ":"))
+                        if (pulse_trace := self.pulse_trace) is not None:
+                            started_at = time.monotonic()
+                            queue_level = self.pulse_queue.occupancy(started_at)
+                        self._raise_for_channels(
+                            await self.dispatch(
+                                lambda channel: self.add_compiled_pulses(channel, compiled_post, post_length),
+                                *channels
+                            )
+                        )
+                        self.pulse_queue.record(post_length)
+                        if pulse_trace is not None:
+                            # noinspection PyUnboundLocalVariable
+                            pulse_trace.append(PulseTraceEvent(
+                                time.time(),
+                                started_at - planned_at if planned_at is not None else None,
+                                time.monotonic() - started_at,
+                                post_length,
+                                queue_level
+                            ))
+                    delay = self.pulse_queue.refill_delay(window_length * 0.1, config.pulse_data.post_interval)
+                    planned_at = time.monotonic() + delay if self.pulse_trace is not None else None
+                    yield delay
             except PulseDataTooLong:
+                pulse_data_too_long.inc()
                 logger.exception(f"发送的波形数据过长 {config.pulse_data.duration_per_post}s，发送失败")
         except Exception:
             logger.exception("波形发送任务出现异常，已退出")
 
 
-class ClientManager:
+class WarmConnection(NamedTuple):
+    """预先连接远程服务端并完成注册的终端"""
+    connect: DGLabWSConnect
+    client: DGLabWSClient
+    created_at: float
+
+    @classmethod
+    async def open(cls, transport: RemoteTransport) -> "WarmConnection":
+        connect = DGLabWSConnect(
+            transport.uri,
+            config.dg_lab_client.register_timeout,
+            **await transport.connect_kwargs()
+        )
+        try:
+            client = await open_connect(connect)
+        except OSError:
+            transport.invalidate()
+            raise
+        return cls(connect, client, time.monotonic())
+
+    def is_usable(self, now: float = None) -> bool:
+        """连接仍然打开，且闲置时间未超过 ``remote_client_pool_max_idle``"""
+        now = time.monotonic() if now is None else now
+        return self.client.websocket.open and \
+            now - self.created_at < config.dg_lab_client.remote_client_pool_max_idle
+
+    async def close(self):
+        await self.connect.__aexit__(None, None, None)
+
+
+class ClientRegistry:
+    """
+    终端注册表
+
+    以用户 ID 为主键保存终端，并维护 终端 ID（``client_id``）、App ID（``target_id``）的二级索引，
+    在终端注册、绑定、重新绑定时通过 :meth:`update` 更新，查找均为 O(1)；
+    另维护会话到该会话中玩家终端的索引，通过 :meth:`set_session` 更新
+    """
+
     def __init__(self):
         self.user_id_to_client: Dict[str, DGLabPlayClient] = {}
+        self.client_id_to_client: Dict[UUID, DGLabPlayClient] = {}
+        self.target_id_to_client: Dict[UUID, DGLabPlayClient] = {}
+        self._user_id_to_indexed_ids: Dict[str, Tuple[Optional[UUID], Optional[UUID]]] = {}
+        """已建立索引的 ``client_id``, ``target_id``，用于在其变化时移除旧的索引"""
+        self.session_to_clients: Dict["Target", Dict[str, DGLabPlayClient]] = {}
+        """会话到在该会话中加入游戏的玩家的用户 ID 与终端的映射"""
+
+    def __len__(self) -> int:
+        return len(self.user_id_to_client)
+
+    def __iter__(self) -> Iterator[DGLabPlayClient]:
+        return iter(list(self.user_id_to_client.values()))
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.user_id_to_client
+
+    def get(self, user_id: str) -> Optional[DGLabPlayClient]:
+        return self.user_id_to_client.get(user_id)
+
+    def get_by_client_id(self, client_id: UUID) -> Optional[DGLabPlayClient]:
+        return self.client_id_to_client.get(client_id)
+
+    def get_by_target_id(self, target_id: UUID) -> Optional[DGLabPlayClient]:
+        return self.target_id_to_client.get(target_id)
+
+    def get_by_session(self, session: "Target") -> List[DGLabPlayClient]:
+        """在会话中加入游戏的所有玩家的终端"""
+        return list(self.session_to_clients.get(session, {}).values())
+
+    def add(self, play_client: DGLabPlayClient):
+        """添加终端，同一用户已有的终端将被替换"""
+        if (old_client := self.user_id_to_client.get(play_client.user_id)) and old_client is not play_client:
+            self.remove(old_client)
+        self.user_id_to_client[play_client.user_id] = play_client
+        self.update(play_client)
+        self._add_session_index(play_client)
+
+    def set_session(self, play_client: DGLabPlayClient, session: "Target"):
+        """设置终端所在的会话并更新会话索引"""
+        self._remove_session_index(play_client)
+        play_client.session = session
+        if self.user_id_to_client.get(play_client.user_id) is play_client:
+            self._add_session_index(play_client)
+
+    def update(self, play_client: DGLabPlayClient):
+        """按终端当前的 ``client_id``, ``target_id`` 更新索引"""
+        if self.user_id_to_client.get(play_client.user_id) is not play_client:
+            return
+        self._remove_index(play_client)
+        client_id = play_client.client.client_id if play_client.client else None
+        target_id = play_client.client.target_id if play_client.client else None
+        if client_id:
+            self.client_id_to_client[client_id] = play_client
+        if target_id:
+            self.target_id_to_client[target_id] = play_client
+        self._user_id_to_indexed_ids[play_client.user_id] = client_id, target_id
+
+    def remove(self, play_client: DGLabPlayClient):
+        """移除终端及其索引"""
+        if self.user_id_to_client.get(play_client.user_id) is not play_client:
+            return
+        self._remove_index(play_client)
+        self._remove_session_index(play_client)
+        self.user_id_to_client.pop(play_client.user_id)
+
+    def _remove_index(self, play_client: DGLabPlayClient):
+        client_id, target_id = self._user_id_to_indexed_ids.pop(play_client.user_id, (None, None))
+        for index, key in (self.client_id_to_client, client_id), (self.target_id_to_client, target_id):
+            if key and index.get(key) is play_client:
+                index.pop(key)
+
+    def _add_session_index(self, play_client: DGLabPlayClient):
+        if play_client.session is not None:
+            self.session_to_clients.setdefault(play_client.session, {})[play_client.user_id] = play_client
+
+    def _remove_session_index(self, play_client: DGLabPlayClient):
+        if play_client.session is None or (clients := self.session_to_clients.get(play_client.session)) is None:
+            return
+        if clients.get(play_client.user_id) is play_client:
+            clients.pop(play_client.user_id)
+        if not clients:
+            self.session_to_clients.pop(play_client.session)
+
+
+class ClientManager:
+    def __init__(self):
+        self.registry = ClientRegistry()
         self.ws_server: Optional[DGLabWSServer] = None
         self.ws_server_task: Optional[asyncio.Task] = None
+        self.workers: List[Optional[asyncio.subprocess.Process]] = []
+        """本地服务端工作进程，正在启动或重启的工作进程为 ``None``"""
+        self._worker_connections: List[Optional[WorkerConnection]] = []
+        """机器人与各工作进程的连接，该工作进程上的所有终端复用此连接"""
+        self._worker_clients: List[Set[DGLabPlayClient]] = []
+        """各工作进程上的终端"""
+        self.local_client_pool: Deque[DGLabLocalClient] = deque()
+        """预先创建并生成好二维码的本地终端"""
+        self._local_client_pool_task: Optional[asyncio.Task] = None
+        self.remote_client_pool: Deque[WarmConnection] = deque()
+        """预先连接远程服务端并完成注册的终端"""
+        self._remote_client_pool_task: Optional[asyncio.Task] = None
+        self._remote_client_pool_changed: Optional[asyncio.Event] = None
+        self.remote_transport: Optional[RemoteTransport] = RemoteTransport(
+            config.ws_server.remote_server_uri,
+            config.ws_server.remote_server_dns_cache_ttl,
+            config.ws_server.remote_server_compression
+        ) if config.ws_server.remote_server else None
+        """连接远程服务端的终端共享的传输设置"""
+
+    async def _start_worker(self, index: int) -> Tuple[asyncio.subprocess.Process, WorkerConnection]:
+        """
+        启动第 ``index`` 个本地服务端工作进程，等待其完成启动并与之连接
+
+        :return: 工作进程，以及与该工作进程的连接
+        """
+        ws_server_config = config.ws_server
+        args = [
+            "--host", ws_server_config.local_server_host,
+            "--port", str(ws_server_config.local_server_port + index)
+        ]
+        if ws_server_config.local_server_heartbeat_interval is not None:
+            args += ["--heartbeat-interval", str(ws_server_config.local_server_heartbeat_interval)]
+        if ws_server_config.local_server_secure:
+            args += ["--ssl-cert", str(ws_server_config.local_server_ssl_cert)]
+            if ws_server_config.local_server_ssl_key:
+                args += ["--ssl-key", str(ws_server_config.local_server_ssl_key)]
+        env = os.environ.copy()
+        if ws_server_config.local_server_ssl_password:
+            env[ws_worker.SSL_PASSWORD_ENV] = ws_server_config.local_server_ssl_password
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, str(Path(ws_worker.__file__)), *args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=env
+        )
+        try:
+            ready_line = await asyncio.wait_for(process.stdout.readline(), WORKER_START_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise RuntimeError(f"本地服务端工作进程 {index} 在 {WORKER_START_TIMEOUT} 秒内未完成启动") from None
+        ready, _, bot_port = ready_line.decode().strip().partition(" ")
+        if ready != ws_worker.READY_LINE:
+            raise RuntimeError(f"本地服务端工作进程 {index} 启动失败，退出码 {await process.wait()}")
+        try:
+            connection = await WorkerConnection.connect(int(bot_port))
+        except Exception:
+            process.stdin.close()
+            await process.wait()
+            raise
+        logger.success(
+            f"已在 {ws_server_config.local_server_host}:{ws_server_config.local_server_port + index}"
+            f" 上启动 DG-Lab WebSocket 服务端工作进程 {index}"
+        )
+        logger.info(f"DG-Lab App 将通过 {ws_server_config.worker_publish_uri(index)} 连接工作进程 {index}")
+        return process, connection
+
+    async def _setup_workers(self):
+        try:
+            self.workers = [None] * config.ws_server.local_server_workers
+            self._worker_connections = [None] * config.ws_server.local_server_workers
+            self._worker_clients = [set() for _ in range(config.ws_server.local_server_workers)]
+            await asyncio.gather(*map(self._run_worker, range(config.ws_server.local_server_workers)))
+        finally:
+            await self.stop_workers()
+
+    async def _run_worker(self, index: int):
+        """
+        启动并监视第 ``index`` 个工作进程，启动失败时按指数退避重试，意外退出时摧毁其上的终端并重启。
+        各工作进程相互独立，启动或重启期间该工作进程不会被分配新的终端
+        """
+        backoff = 0
+        while True:
+            try:
+                process, connection = await self._start_worker(index)
+            except Exception as e:
+                backoff = min(backoff * 2 or 1, WORKER_RESTART_MAX_BACKOFF)
+                logger.warning(f"启动本地服务端工作进程 {index} 失败：{e!r}，{backoff} 秒后重试")
+                await asyncio.sleep(backoff)
+                continue
+            if not self.workers:
+                # 已调用 stop_workers
+                await connection.close()
+                process.stdin.close()
+                return
+            self.workers[index] = process
+            self._worker_connections[index] = connection
+            backoff = 0
+            # 持续读取工作进程的标准输出，以免管道被写满后工作进程阻塞
+            return_code, _ = await asyncio.gather(process.wait(), self._log_worker_output(index, process.stdout))
+            if not self.workers:
+                return
+            self.workers[index] = None
+            self._worker_connections[index] = None
+            await connection.close()
+            logger.error(f"本地服务端工作进程 {index} 已退出，退出码 {return_code}，正在重启")
+            for play_client in list(self._worker_clients[index]):
+                await play_client.destroy()
+
+    @staticmethod
+    async def _log_worker_output(index: int, stdout: asyncio.StreamReader):
+        """
+        将工作进程在完成启动后的标准输出写入日志，直到工作进程关闭标准输出
+
+        按块读取而不是按行读取，超长的行不会导致读取出错
+        """
+        while chunk := await stdout.read(1 << 16):
+            for line in chunk.decode(errors="replace").splitlines():
+                if line.strip():
+                    logger.debug(f"本地服务端工作进程 {index}：{line}")
+
+    async def stop_workers(self):
+        """
+        结束所有本地服务端工作进程
+
+        先摧毁工作进程上的终端（App 将收到终端断开的通知）并断开与工作进程的连接，再关闭标准输入，
+        工作进程随后将逐个断开 App 的连接并退出
+        """
+        workers, self.workers = self.workers, []
+        for play_client in [play_client for clients in self._worker_clients for play_client in clients]:
+            await play_client.destroy()
+        connections, self._worker_connections = self._worker_connections, []
+        await asyncio.gather(*(connection.close() for connection in connections if connection))
+        for process in workers:
+            if process and process.returncode is None:
+                process.stdin.close()
 
     async def _setup_server(self):
         try:
-            if not config.ws_server.remote_server:
+            if not config.ws_server.remote_server and config.ws_server.local_server_workers:
+                await self._setup_workers()
+            elif not config.ws_server.remote_server:
                 async with DGLabWSServer(
                         config.ws_server.local_server_host,
                         config.ws_server.local_server_port,
                         config.ws_server.local_server_heartbeat_interval,
-                        ssl=config.ws_server.server_ssl_context
+                        ssl=config.ws_server.server_ssl_context,
+                        **({"process_request": metrics_process_request(config.ws_server.local_server_metrics_path)}
+                           if config.ws_server.local_server_metrics_path else {})
                 ) as server:
                     self.ws_server = server
                     logger.success(
@@ -216,45 +1121,212 @@ class ClientManager:
                         f" 上启动 DG-Lab WebSocket 服务端"
                     )
                     logger.info(f"DG-Lab App 将通过 {config.ws_server.local_server_publish_uri} 连接服务端")
+                    self._refill_local_client_pool()
                     await asyncio.Future()
             else:
                 logger.info(f"DG-Lab App 将通过 {config.ws_server.remote_server_uri} 连接服务端")
+                if config.dg_lab_client.remote_client_pool_size:
+                    self._remote_client_pool_task = asyncio.create_task(self._maintain_remote_client_pool())
         except Exception:
             logger.exception("运行 DG-Lab WebSocket 服务端的时候出现了异常，服务端已关闭")
 
+    @property
+    def user_id_to_client(self) -> Dict[str, DGLabPlayClient]:
+        """用户 ID 到终端的映射"""
+        return self.registry.user_id_to_client
+
     def serve(self):
         self.ws_server_task = asyncio.create_task(self._setup_server())
 
+    def _refill_local_client_pool(self):
+        """在后台补充本地终端池，已有补充任务在运行时不做处理"""
+        if config.dg_lab_client.local_client_pool_size and (
+                self._local_client_pool_task is None or self._local_client_pool_task.done()
+        ):
+            self._local_client_pool_task = asyncio.create_task(self._fill_local_client_pool())
+
+    async def _fill_local_client_pool(self):
+        try:
+            while self.ws_server and len(self.local_client_pool) < config.dg_lab_client.local_client_pool_size:
+                local_client = self.ws_server.new_local_client()
+                # 预先生成二维码，绑定时将直接命中缓存
+                await render_qrcode_async(local_client.get_qrcode(config.ws_server.local_server_publish_uri))
+                self.local_client_pool.append(local_client)
+        except Exception:
+            logger.exception("补充本地终端池的时候出现了异常")
+
+    def _take_local_client(self) -> DGLabLocalClient:
+        """从本地终端池中取出终端，池为空时直接创建"""
+        if self.local_client_pool:
+            local_client = self.local_client_pool.popleft()
+        else:
+            local_client = self.ws_server.new_local_client()
+        self._refill_local_client_pool()
+        return local_client
+
+    async def _maintain_remote_client_pool(self):
+        """
+        维持远程终端池
+
+        移除已断开或闲置过久的连接，并逐个补充新连接直到达到 ``remote_client_pool_size``，
+        连接失败时按指数退避重试，避免远程服务端不可用时反复发起连接
+        """
+        self._remote_client_pool_changed = asyncio.Event()
+        backoff = 0
+        while True:
+            try:
+                now = time.monotonic()
+                for warm_connection in [c for c in self.remote_client_pool if not c.is_usable(now)]:
+                    self.remote_client_pool.remove(warm_connection)
+                    await warm_connection.close()
+                if len(self.remote_client_pool) >= config.dg_lab_client.remote_client_pool_size:
+                    self._remote_client_pool_changed.clear()
+                    timeout = self.remote_client_pool[0].created_at + \
+                        config.dg_lab_client.remote_client_pool_max_idle - now
+                    try:
+                        await asyncio.wait_for(self._remote_client_pool_changed.wait(), max(timeout, 0))
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                self.remote_client_pool.append(await WarmConnection.open(self.remote_transport))
+                backoff = 0
+            except Exception as e:
+                # 任何异常都不应使补充任务退出，否则远程终端池将不再被补充
+                backoff = min(backoff * 2 or 1, config.dg_lab_client.remote_client_pool_max_backoff)
+                logger.warning(f"维持远程终端池时出现异常：{e!r}，{backoff} 秒后重试")
+                await asyncio.sleep(backoff)
+
+    def _take_warm_connection(self) -> Optional[WarmConnection]:
+        """从远程终端池中取出可用的连接，没有则返回 ``None``"""
+        warm_connection = None
+        while self.remote_client_pool:
+            if (candidate := self.remote_client_pool.popleft()).is_usable():
+                warm_connection = candidate
+                break
+            asyncio.create_task(candidate.close())
+        if self._remote_client_pool_changed:
+            self._remote_client_pool_changed.set()
+        return warm_connection
+
+    async def close_remote_client_pool(self):
+        """停止补充远程终端池，并关闭池中的连接"""
+        if self._remote_client_pool_task:
+            self._remote_client_pool_task.cancel()
+        while self.remote_client_pool:
+            await self.remote_client_pool.popleft().close()
+
+    @staticmethod
+    async def broadcast(
+            play_clients: Iterable[DGLabPlayClient],
+            operation: Callable[[DGLabPlayClient], Awaitable[_T]]
+    ) -> List[Union[_T, BaseException]]:
+        """
+        对多个终端执行同一操作，同时执行的操作数不超过 ``broadcast_concurrency``
+
+        :param play_clients: 目标终端
+        :param operation: 对单个终端执行的操作
+        :return: 各终端的操作结果，出现异常时为异常对象，顺序与 ``play_clients`` 一致
+        """
+        semaphore = asyncio.Semaphore(config.dg_lab_client.broadcast_concurrency)
+
+        async def run(play_client: DGLabPlayClient) -> _T:
+            async with semaphore:
+                return await operation(play_client)
+
+        return await asyncio.gather(*map(run, play_clients), return_exceptions=True)
+
+    async def _new_worker_client(self, user_id: str) -> Optional[DGLabPlayClient]:
+        """在连接的终端最少的可用工作进程上创建终端，创建失败时返回 ``None``"""
+        index = min(
+            (i for i, connection in enumerate(self._worker_connections) if connection),
+            key=lambda i: len(self._worker_clients[i])
+        )
+        try:
+            client = await self._worker_connections[index].new_client()
+        except (ConnectionError, WorkerError):
+            logger.exception(f"在工作进程 {index} 上创建终端失败")
+            return None
+
+        def destroy_callback(play_client: DGLabPlayClient):
+            self._worker_clients[index].discard(play_client)
+            self.registry.remove(play_client)
+
+        async with DGLabPlayClient(
+                user_id,
+                destroy_callback,
+                client,
+                self.registry.update,
+                publish_uri=config.ws_server.worker_publish_uri(index)
+        ) as play_client:
+            self._worker_clients[index].add(play_client)
+        return play_client
+
     async def new_client(self, user_id: str) -> Optional[DGLabPlayClient]:
-        if not config.ws_server.remote_server:
+        if not config.ws_server.remote_server and config.ws_server.local_server_workers:
+            if not any(self._worker_connections):
+                return None
+            if not (play_client := await self._new_worker_client(user_id)) or play_client.is_destroyed:
+                return None
+            self.registry.add(play_client)
+            logger.info(f"用户 {user_id} 在工作进程上创建了终端")
+            return play_client
+        elif not config.ws_server.remote_server:
             if self.ws_server:
                 async with DGLabPlayClient(
                         user_id,
-                        lambda x: self.user_id_to_client.pop(x.user_id),
-                        self.ws_server.new_local_client()
+                        self.registry.remove,
+                        self._take_local_client(),
+                        self.registry.update
                 ) as play_client:
                     pass
-                self.user_id_to_client[user_id] = play_client
+                self.registry.add(play_client)
                 logger.info(f"用户 {user_id} 创建了 WebSocket 终端")
                 return play_client
             else:
                 return None
         else:
+            if warm_connection := self._take_warm_connection():
+                client, connect = warm_connection.client, warm_connection.connect
+            else:
+                client = connect = None
             async with DGLabPlayClient(
                     user_id,
-                    lambda x: self.user_id_to_client.pop(x.user_id)
+                    self.registry.remove,
+                    client,
+                    self.registry.update,
+                    connect=connect,
+                    transport=self.remote_transport
             ) as play_client:
                 pass
             async with play_client.register_finished_lock:
                 pass
-            self.user_id_to_client[user_id] = play_client
+            if play_client.is_destroyed:
+                return None
+            self.registry.add(play_client)
             logger.info(f"用户 {user_id} 创建了本地终端")
             return play_client
 
 
 client_manager = ClientManager()
+active_clients.set_function(client_manager.registry.__len__)
+
+
+@custom_pulse_data_reloader.on_reload
+def update_client_waveforms(pulse_data: Mapping[str, PulseWaveform]):
+    for play_client in client_manager.registry:
+        play_client.update_waveforms(pulse_data)
 
 
 @driver.on_startup
 async def setup_ws_server():
     client_manager.serve()
+
+
+@driver.on_shutdown
+async def stop_ws_server_workers():
+    await client_manager.stop_workers()
+
+
+@driver.on_shutdown
+async def close_remote_client_pool():
+    await client_manager.close_remote_client_pool()
@@ -1,6 +1,9 @@
+from .broadcast import *
 from .players import *
 from .pulse_control import *
+from .pulse_trace import *
 from .query_status import *
+from .show_metrics import *
 from .show_pulses import *
 from .strength_control import *
 from .usage import *
@@ -0,0 +1,249 @@
+import random
+from typing import Tuple, Union, Dict, Optional, List, Callable, Awaitable, Literal
+
+from arclet.alconna import Alconna, Args, MultiVar
+from loguru import logger
+from nonebot.plugin import get_plugin_config
+from nonebot_plugin_alconna import on_alconna, At, AtAll, Match, MsgTarget, Target
+from nonebot_plugin_saa import MessageFactory, Mention, Text
+from pydglab_ws import StrengthOperationType
+
+from .pulse_control import apply_pulse
+from .strength_control import apply_strength, strength_success_text
+from ..client_manager import client_manager, DGLabPlayClient
+from ..config import Config
+from ..model import get_custom_pulse_data
+from ..utils import get_command_start_list
+
+__all__ = [
+    "broadcast_increase_strength",
+    "broadcast_decrease_strength",
+    "broadcast_random_strength",
+    "broadcast_append_pulse",
+    "broadcast_reset_pulse",
+    "broadcast_random_pulse"
+]
+
+config = get_plugin_config(Config).dg_lab_play
+
+Targets = Tuple[Union[At, AtAll], ...]
+"""全体命令的目标，@全体成员 时为在当前会话中加入游戏的所有玩家"""
+
+# 多个目标只能作为最后一个参数解析，因此全体命令的参数顺序为：强度或波形名称，目标
+TARGETS_ARG = Args["targets?", MultiVar(Union[At, AtAll])]
+
+
+def resolve_targets(targets: Targets, session: Target) -> Dict[str, Optional[DGLabPlayClient]]:
+    """
+    用户 ID 到其终端的映射，@ 的用户没有终端时为 ``None``
+
+    @全体成员 时为在 ``session`` 中加入游戏的所有玩家
+    """
+    if any(isinstance(target, AtAll) for target in targets):
+        return {play_client.user_id: play_client for play_client in client_manager.registry.get_by_session(session)}
+    return {target.target: client_manager.user_id_to_client.get(target.target) for target in targets}
+
+
+async def broadcast(
+        targets: Match[Targets],
+        session: Target,
+        operation: Callable[[DGLabPlayClient], Awaitable[Optional[str]]],
+        success_text: str
+):
+    """
+    对多个玩家执行同一操作，并以一条消息回复结果
+
+    :param targets: 目标
+    :param session: 命令所在的会话
+    :param operation: 对单个玩家执行的操作，返回失败的原因，成功则为 ``None``
+    :param success_text: 操作成功时的回复
+    """
+    if not targets.available:
+        await MessageFactory(
+            config.reply_text.please_at_target
+        ).finish(at_sender=True)
+    elif any(isinstance(target, At) and target.flag != "user" for target in targets.result):
+        await MessageFactory(
+            config.reply_text.broadcast_invalid_mention
+        ).finish(at_sender=True)
+    user_id_to_client = resolve_targets(targets.result, session)
+    if not user_id_to_client:
+        await MessageFactory(
+            config.reply_text.no_player
+        ).finish(at_sender=True)
+    play_clients = [play_client for play_client in user_id_to_client.values() if play_client]
+    results = await client_manager.broadcast(play_clients, operation)
+
+    reason_to_user_ids: Dict[str, List[str]] = {}
+    for user_id, play_client in user_id_to_client.items():
+        if not play_client:
+            reason_to_user_ids.setdefault(config.reply_text.invalid_target, []).append(user_id)
+    for play_client, result in zip(play_clients, results):
+        if isinstance(result, BaseException):
+            logger.opt(exception=result).error(f"对用户 {play_client.user_id} 执行全体命令时出现异常")
+            result = config.reply_text.broadcast_error
+        if result:
+            reason_to_user_ids.setdefault(result, []).append(play_client.user_id)
+
+    failed_count = sum(map(len, reason_to_user_ids.values()))
+    segments = [Text(config.reply_text.broadcast_result.format(len(user_id_to_client) - failed_count, success_text))]
+    for reason, user_ids in reason_to_user_ids.items():
+        segments.append(Text("\n" + config.reply_text.broadcast_failed.format(reason)))
+        segments.extend(Mention(user_id) for user_id in user_ids)
+    await MessageFactory(segments).finish(at_sender=True)
+
+
+async def broadcast_strength_control(
+        mode: StrengthOperationType,
+        targets: Match[Targets],
+        session: Target,
+        percentage_value: Match[float]
+):
+    if not percentage_value.available or not 0 < percentage_value.result <= 100:
+        await MessageFactory(
+            config.reply_text.invalid_strength_param
+        ).finish(at_sender=True)
+    if success_text := strength_success_text(mode, percentage_value.result):
+        await broadcast(
+            targets,
+            session,
+            # 不等待各玩家的强度合并窗口，避免占用并发名额
+            lambda play_client: apply_strength(play_client, mode, percentage_value.result, coalesce=False),
+            success_text
+        )
+
+
+broadcast_increase_strength = on_alconna(
+    Alconna(
+        get_command_start_list(),
+        config.command_text.broadcast_increase_strength,
+        Args["percentage_value?", float],
+        TARGETS_ARG
+    ),
+    block=True
+)
+
+
+@broadcast_increase_strength.handle()
+async def handle_broadcast_increase_strength(
+        targets: Match[Targets],
+        session: MsgTarget,
+        percentage_value: Match[float]
+):
+    await broadcast_strength_control(StrengthOperationType.INCREASE, targets, session, percentage_value)
+
+
+broadcast_decrease_strength = on_alconna(
+    Alconna(
+        get_command_start_list(),
+        config.command_text.broadcast_decrease_strength,
+        Args["percentage_value?", float],
+        TARGETS_ARG
+    ),
+    block=True
+)
+
+
+@broadcast_decrease_strength.handle()
+async def handle_broadcast_decrease_strength(
+        targets: Match[Targets],
+        session: MsgTarget,
+        percentage_value: Match[float]
+):
+    await broadcast_strength_control(StrengthOperationType.DECREASE, targets, session, percentage_value)
+
+
+broadcast_random_strength = on_alconna(
+    Alconna(
+        get_command_start_list(),
+        config.command_text.broadcast_random_strength,
+        TARGETS_ARG
+    ),
+    block=True
+)
+
+
+@broadcast_random_strength.handle()
+async def handle_broadcast_random_strength(targets: Match[Targets], session: MsgTarget):
+    random_strength_value = float(random.randint(0, 100))
+    await broadcast_strength_control(
+        StrengthOperationType.SET_TO,
+        targets,
+        session,
+        Match(random_strength_value, True)
+    )
+
+
+async def broadcast_pulse_control(
+        mode: Literal["reset", "append"],
+        targets: Match[Targets],
+        session: Target,
+        pulse_name: Match[str]
+):
+    if not pulse_name.available or not (pulse_data := get_custom_pulse_data().root.get(pulse_name.result)):
+        await MessageFactory(
+            config.reply_text.invalid_pulse_param
+        ).finish(at_sender=True)
+
+    async def operation(play_client: DGLabPlayClient) -> Optional[str]:
+        return apply_pulse(play_client, mode, pulse_name.result, pulse_data)
+
+    await broadcast(
+        targets,
+        session,
+        operation,
+        config.reply_text.successfully_set_pulse.format(pulse_name.result) if mode == "reset" else
+        config.reply_text.successfully_appended_pulse.format(pulse_name.result)
+    )
+
+
+broadcast_append_pulse = on_alconna(
+    Alconna(
+        get_command_start_list(),
+        config.command_text.broadcast_append_pulse,
+        Args["pulse_name?", str],
+        TARGETS_ARG
+    ),
+    block=True
+)
+
+
+@broadcast_append_pulse.handle()
+async def handle_broadcast_append_pulse(targets: Match[Targets], session: MsgTarget, pulse_name: Match[str]):
+    await broadcast_pulse_control("append", targets, session, pulse_name)
+
+
+broadcast_reset_pulse = on_alconna(
+    Alconna(
+        get_command_start_list(),
+        config.command_text.broadcast_reset_pulse,
+        Args["pulse_name?", str],
+        TARGETS_ARG
+    ),
+    block=True
+)
+
+
+@broadcast_reset_pulse.handle()
+async def handle_broadcast_reset_pulse(targets: Match[Targets], session: MsgTarget, pulse_name: Match[str]):
+    await broadcast_pulse_control("reset", targets, session, pulse_name)
+
+
+broadcast_random_pulse = on_alconna(
+    Alconna(
+        get_command_start_list(),
+        config.command_text.broadcast_random_pulse,
+        TARGETS_ARG
+    ),
+    block=True
+)
+
+
+@broadcast_random_pulse.handle()
+async def handle_broadcast_random_pulse(targets: Match[Targets], session: MsgTarget):
+    available_pulse_names = list(get_custom_pulse_data().root.keys())
+    if not available_pulse_names:
+        await MessageFactory(
+            config.reply_text.no_available_pulse
+        ).finish(at_sender=True)
+    await broadcast_pulse_control("reset", targets, session, Match(random.choice(available_pulse_names), True))
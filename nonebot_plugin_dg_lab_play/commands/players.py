@@ -1,15 +1,12 @@
-import io
-
-import qrcode
 from arclet.alconna import Alconna
 from nonebot.internal.adapter import Event
 from nonebot.plugin import get_plugin_config
-from nonebot_plugin_alconna import on_alconna
+from nonebot_plugin_alconna import on_alconna, MsgTarget
 from nonebot_plugin_saa import MessageFactory, Image, Text, Mention
 
 from ..client_manager import client_manager
 from ..config import Config
-from ..utils import get_command_start_list
+from ..utils import get_command_start_list, render_qrcode_async
 
 __all__ = ["dg_lab_device_join", "show_players", "exit_game"]
 
@@ -22,7 +19,7 @@ dg_lab_device_join = on_alconna(
 
 
 @dg_lab_device_join.handle()
-async def handle_dg_lab_device_join(event: Event):
+async def handle_dg_lab_device_join(event: Event, session: MsgTarget):
     play_client = client_manager.user_id_to_client.get(event.get_user_id()) or await client_manager.new_client(
         event.get_user_id()
     )
@@ -30,11 +27,10 @@ async def handle_dg_lab_device_join(event: Event):
         await MessageFactory(
             config.reply_text.failed_to_create_client
         ).finish(at_sender=True)
-    qrcode_data = play_client.qrcode
-    qrcode_img_bytes_io = io.BytesIO()
-    qrcode.make(qrcode_data).save(qrcode_img_bytes_io, "JPEG")
+    client_manager.registry.set_session(play_client, session)
+    qrcode_img = await render_qrcode_async(play_client.qrcode)
     msg_builder = MessageFactory([
-        Image(qrcode_img_bytes_io),
+        Image(qrcode_img),
         Text(config.reply_text.please_scan_qrcode)
     ])
     await msg_builder.send(at_sender=True)
@@ -1,5 +1,5 @@
 import random
-from typing import Literal
+from typing import Literal, Optional
 
 from arclet.alconna import Alconna, Args
 from loguru import logger
@@ -8,9 +8,9 @@ from nonebot_plugin_alconna import on_alconna, At, Match
 from nonebot_plugin_saa import MessageFactory
 from pydglab_ws import Channel
 
-from ..client_manager import client_manager
+from ..client_manager import client_manager, DGLabPlayClient
 from ..config import Config
-from ..model import custom_pulse_data
+from ..model import get_custom_pulse_data, PulseLoop, PulseWaveform
 from ..utils import get_command_start_list
 
 __all__ = ["append_pulse", "reset_pulse", "random_pulse"]
@@ -18,6 +18,29 @@ __all__ = ["append_pulse", "reset_pulse", "random_pulse"]
 config = get_plugin_config(Config).dg_lab_play
 
 
+def apply_pulse(
+        play_client: DGLabPlayClient,
+        mode: Literal["reset", "append"],
+        pulse_name: str,
+        pulse_data: PulseWaveform
+) -> Optional[str]:
+    """
+    重设单个玩家的波形循环，或在其末尾追加波形
+
+    :return: 失败时回复的原因，成功则为 ``None``
+    """
+    if mode == "reset":
+        play_client.setup_pulse_job(PulseLoop.of(pulse_name, pulse_data), Channel.A, Channel.B)
+    elif mode == "append":
+        pulse_loop = play_client.pulse_loop.appended(pulse_name, pulse_data)
+        if pulse_loop.duration > config.pulse_data.max_loop_duration:
+            return config.reply_text.pulse_loop_too_long.format(config.pulse_data.max_loop_duration)
+        play_client.setup_pulse_job(pulse_loop, Channel.A, Channel.B, append=True)
+    else:
+        logger.error("pulse_control - mode 参数不正确")
+    return None
+
+
 async def pulse_control(
         mode: Literal["reset", "append"],
         at: Match[At],
@@ -28,22 +51,11 @@ async def pulse_control(
             config.reply_text.please_at_target
         ).finish(at_sender=True)
     elif pulse_name.available:
-        if pulse_data := custom_pulse_data.root.get(pulse_name.result):
+        if pulse_data := get_custom_pulse_data().root.get(pulse_name.result):
             target_user_id = at.result.target
             if play_client := client_manager.user_id_to_client.get(target_user_id):
-                if mode == "reset":
-                    play_client.setup_pulse_job([pulse_name.result], pulse_data, Channel.A, Channel.B)
-                elif mode == "append":
-                    play_client.setup_pulse_job(
-                        play_client.pulse_names + [pulse_name.result],
-                        play_client.pulse_data + pulse_data,
-                        Channel.A,
-                        Channel.B
-                    )
-                else:
-                    logger.error("strength_control - mode 参数不正确")
-                    return
                 await MessageFactory(
+                    apply_pulse(play_client, mode, pulse_name.result, pulse_data) or
                     config.reply_text.successfully_set_pulse.format(
                         "-".join(play_client.pulse_names)
                     )
@@ -106,7 +118,7 @@ random_pulse = on_alconna(
 
 @random_pulse.handle()
 async def handle_random_pulse(at: Match[At]):
-    available_pulse_names = list(custom_pulse_data.root.keys())
+    available_pulse_names = list(get_custom_pulse_data().root.keys())
     if not available_pulse_names:
         await MessageFactory(
             config.reply_text.no_available_pulse
@@ -0,0 +1,80 @@
+import time
+from datetime import datetime
+
+from arclet.alconna import Alconna, Args
+from nonebot.permission import SUPERUSER
+from nonebot.plugin import get_plugin_config
+from nonebot_plugin_alconna import on_alconna, At, Match
+from nonebot_plugin_saa import MessageFactory
+
+from ..client_manager import client_manager, PulseTraceEvent
+from ..config import Config, DG_LAB_PLAY_DATA_LOCATION
+from ..utils import get_command_start_list
+
+__all__ = ["pulse_trace"]
+
+config = get_plugin_config(Config).dg_lab_play
+
+PULSE_TRACE_LOCATION = DG_LAB_PLAY_DATA_LOCATION / "pulse_traces"
+ENABLE_ACTIONS = ("开启", "on")
+DISABLE_ACTIONS = ("关闭", "off")
+REPLY_EVENTS = 10
+"""回复中展示的最近记录数，完整记录写入文件"""
+
+pulse_trace = on_alconna(
+    Alconna(
+        get_command_start_list(),
+        config.command_text.pulse_trace,
+        Args["at?", At],
+        Args["action?", str]
+    ),
+    permission=SUPERUSER,
+    block=True
+)
+
+
+def format_event(event: PulseTraceEvent) -> str:
+    lag = f"{event.lag * 1000:.1f}ms" if event.lag is not None else "-"
+    return (
+        f"{datetime.fromtimestamp(event.timestamp).strftime('%H:%M:%S.%f')[:-3]} "
+        f"延迟 {lag} 发送 {event.send_duration * 1000:.1f}ms {event.frames} 条 队列 {event.queue_level:.1f}s"
+    )
+
+
+@pulse_trace.handle()
+async def handle_pulse_trace(at: Match[At], action: Match[str]):
+    if not at.available:
+        await MessageFactory(
+            config.reply_text.please_at_target
+        ).finish(at_sender=True)
+    if not (play_client := client_manager.user_id_to_client.get(at.result.target)):
+        await MessageFactory(
+            config.reply_text.invalid_target
+        ).finish(at_sender=True)
+    if action.available and action.result in ENABLE_ACTIONS:
+        play_client.enable_pulse_trace()
+        await MessageFactory(
+            config.reply_text.pulse_trace_enabled.format(play_client.pulse_trace.maxlen)
+        ).finish(at_sender=True)
+    elif action.available and action.result in DISABLE_ACTIONS:
+        play_client.disable_pulse_trace()
+        await MessageFactory(
+            config.reply_text.pulse_trace_disabled
+        ).finish(at_sender=True)
+    elif play_client.pulse_trace is None:
+        await MessageFactory(
+            config.reply_text.pulse_trace_not_enabled
+        ).finish(at_sender=True)
+    elif not play_client.pulse_trace:
+        await MessageFactory(
+            config.reply_text.pulse_trace_empty
+        ).finish(at_sender=True)
+    path = PULSE_TRACE_LOCATION / f"{play_client.user_id}-{int(time.time())}.csv"
+    count, events = len(play_client.pulse_trace), list(play_client.pulse_trace)[-REPLY_EVENTS:]
+    await play_client.dump_pulse_trace(path)
+    await MessageFactory(
+        "\n".join([
+            config.reply_text.pulse_trace_dumped.format(count, path),
+            *map(format_event, events)
+        ])
+    ).finish(at_sender=True)
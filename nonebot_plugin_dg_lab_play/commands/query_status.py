@@ -29,13 +29,13 @@ async def handle_current_strength(at: Match[At]):
         ).finish(at_sender=True)
     target_user_id = at.result.target
     if play_client := client_manager.user_id_to_client.get(target_user_id):
-        if play_client.last_strength:
+        if strength := play_client.strength:
             await MessageFactory(
                 config.reply_text.current_strength.format(
-                    play_client.last_strength.a,
-                    play_client.last_strength.a_limit,
-                    play_client.last_strength.b,
-                    play_client.last_strength.b_limit,
+                    strength.a,
+                    strength.a_limit,
+                    strength.b,
+                    strength.b_limit,
                 )
             ).finish(at_sender=True)
         else:
@@ -0,0 +1,48 @@
+import time
+
+from arclet.alconna import Alconna
+from nonebot.matcher import Matcher
+from nonebot.message import run_preprocessor, run_postprocessor
+from nonebot.permission import SUPERUSER
+from nonebot.plugin import get_plugin_config
+from nonebot_plugin_alconna import on_alconna
+from nonebot_plugin_saa import MessageFactory
+
+from ..config import Config
+from ..metrics import metrics, command_latency
+from ..utils import get_command_start_list
+
+__all__ = ["show_metrics"]
+
+config = get_plugin_config(Config).dg_lab_play
+
+COMMAND_START_TIME_KEY = "_dg_lab_play_command_start_time"
+
+show_metrics = on_alconna(
+    Alconna(get_command_start_list(), config.command_text.show_metrics),
+    permission=SUPERUSER,
+    block=True
+)
+
+
+@show_metrics.handle()
+async def handle_show_metrics():
+    await MessageFactory(
+        metrics.summary()
+    ).finish()
+
+
+def _is_plugin_command(matcher: Matcher) -> bool:
+    return bool(matcher.module_name) and matcher.module_name.startswith(__package__)
+
+
+@run_preprocessor
+async def start_command_timer(matcher: Matcher):
+    if _is_plugin_command(matcher):
+        matcher.state[COMMAND_START_TIME_KEY] = time.perf_counter()
+
+
+@run_postprocessor
+async def record_command_latency(matcher: Matcher):
+    if _is_plugin_command(matcher) and (start_time := matcher.state.get(COMMAND_START_TIME_KEY)) is not None:
+        command_latency.observe(time.perf_counter() - start_time, handler=matcher.handlers[0].call.__name__)
@@ -4,7 +4,7 @@ from nonebot_plugin_alconna import on_alconna
 from nonebot_plugin_saa import MessageFactory
 
 from ..config import Config
-from ..model import custom_pulse_data
+from ..model import get_custom_pulse_data
 from ..utils import get_command_start_list
 
 __all__ = ["show_pulses"]
@@ -19,9 +19,9 @@ show_pulses = on_alconna(
 
 @show_pulses.handle()
 async def handle_show_pulses():
-    if custom_pulse_data.root:
+    if pulse_data := get_custom_pulse_data().root:
         await MessageFactory(
-            "、".join(custom_pulse_data.root.keys())
+            "、".join(pulse_data.keys())
         ).finish(at_sender=True)
     else:
         await MessageFactory(
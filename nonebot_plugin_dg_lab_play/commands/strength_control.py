@@ -1,4 +1,5 @@
 import random
+from typing import Optional
 
 from arclet.alconna import Alconna, Args
 from loguru import logger
@@ -7,7 +8,7 @@ from nonebot_plugin_alconna import on_alconna, At, Match
 from nonebot_plugin_saa import MessageFactory
 from pydglab_ws import Channel, StrengthOperationType
 
-from ..client_manager import client_manager
+from ..client_manager import client_manager, DGLabPlayClient
 from ..config import Config
 from ..utils import get_command_start_list
 
@@ -16,6 +17,53 @@ __all__ = ["increase_strength", "decrease_strength", "random_strength"]
 config = get_plugin_config(Config).dg_lab_play
 
 
+def strength_success_text(mode: StrengthOperationType, percentage: float) -> Optional[str]:
+    """强度控制成功时的回复，``mode`` 不正确时为 ``None``"""
+    if mode == StrengthOperationType.INCREASE:
+        return config.reply_text.successfully_increased.format(round(percentage))
+    elif mode == StrengthOperationType.DECREASE:
+        return config.reply_text.successfully_decreased.format(round(percentage))
+    elif mode == StrengthOperationType.SET_TO:
+        return config.reply_text.successfully_set_to_strength.format(round(percentage))
+    else:
+        logger.error("strength_control - mode 参数不正确")
+        return None
+
+
+async def apply_strength(
+        play_client: DGLabPlayClient,
+        mode: StrengthOperationType,
+        percentage: float,
+        coalesce: bool = True
+) -> Optional[str]:
+    """
+    按强度上限的百分比控制单个玩家的强度
+
+    :param coalesce: 是否与该玩家的其他强度指令合并发送，见 :meth:`StrengthAggregator.submit`
+    :return: 失败时回复的原因，成功则为 ``None``
+    """
+    if not play_client.pulse_loop:
+        return config.reply_text.please_set_pulse_first.format(
+            f"{get_command_start_list()[0]}{config.command_text.random_pulse}"
+        )
+    elif not (strength := play_client.strength):
+        return config.reply_text.failed_to_fetch_strength_limit
+    a_value = round(strength.a_limit * (percentage / 100))
+    b_value = round(strength.b_limit * (percentage / 100))
+    channel_to_error = await play_client.strength_aggregator.submit(
+        mode,
+        {Channel.A: a_value, Channel.B: b_value},
+        coalesce
+    )
+    if failed_channels := [channel for channel, error in channel_to_error.items() if error]:
+        for channel in failed_channels:
+            logger.opt(exception=channel_to_error[channel]).error(f"通道 {channel.name} 强度设置失败")
+        return config.reply_text.failed_to_set_strength.format(
+            "、".join(channel.name for channel in failed_channels)
+        )
+    return None
+
+
 async def strength_control(
         mode: StrengthOperationType,
         at: Match[At],
@@ -31,39 +79,11 @@ async def strength_control(
         ).finish(at_sender=True)
     target_user_id = at.result.target
     if play_client := client_manager.user_id_to_client.get(target_user_id):
-        if not play_client.pulse_data:
-            await MessageFactory(
-                config.reply_text.please_set_pulse_first.format(
-                    f"{get_command_start_list()[0]}{config.command_text.random_pulse}"
-                )
-            ).finish(at_sender=True)
-        elif play_client.last_strength:
-            a_value = round(play_client.last_strength.a_limit * (percentage_value.result / 100))
-            b_value = round(play_client.last_strength.b_limit * (percentage_value.result / 100))
-            await play_client.client.set_strength(
-                Channel.A,
-                mode,
-                a_value
-            )
-            await play_client.client.set_strength(
-                Channel.B,
-                mode,
-                b_value
-            )
-            if mode == StrengthOperationType.INCREASE:
-                success_text = config.reply_text.successfully_increased.format(round(percentage_value.result))
-            elif mode == StrengthOperationType.DECREASE:
-                success_text = config.reply_text.successfully_decreased.format(round(percentage_value.result))
-            elif mode == StrengthOperationType.SET_TO:
-                success_text = config.reply_text.successfully_set_to_strength.format(round(percentage_value.result))
-            else:
-                logger.error("strength_control - mode 参数不正确")
-                return
-            await MessageFactory(success_text).finish(at_sender=True)
-        else:
-            await MessageFactory(
-                config.reply_text.failed_to_fetch_strength_limit
-            ).finish(at_sender=True)
+        if not (success_text := strength_success_text(mode, percentage_value.result)):
+            return
+        await MessageFactory(
+            await apply_strength(play_client, mode, percentage_value.result) or success_text
+        ).finish(at_sender=True)
     else:
         await MessageFactory(
             config.reply_text.invalid_target
@@ -30,6 +30,14 @@ USAGE_TEXT = f"""\
 📈显示当前波形：{fist_command_start}{config.command_text.current_pulse} <At用户>
 🎲重设为随机波形：{fist_command_start}{config.command_text.random_pulse} <At用户>
 
+📢全体命令（@全体成员 时对在本群加入游戏的所有玩家生效）：
+🔺{fist_command_start}{config.command_text.broadcast_increase_strength} <百分比> <At用户...>
+🔻{fist_command_start}{config.command_text.broadcast_decrease_strength} <百分比> <At用户...>
+🎲{fist_command_start}{config.command_text.broadcast_random_strength} <At用户...>
+⤴️{fist_command_start}{config.command_text.broadcast_append_pulse} <波形名称> <At用户...>
+🔄️{fist_command_start}{config.command_text.broadcast_reset_pulse} <波形名称> <At用户...>
+🎲{fist_command_start}{config.command_text.broadcast_random_pulse} <At用户...>
+
 🔗项目链接：https://github.com/Ljzd-PRO/nonebot-plugin-dg-lab-play
 """
 
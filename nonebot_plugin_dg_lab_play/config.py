@@ -1,7 +1,8 @@
 import ssl
 from functools import cached_property
 from pathlib import Path
-from typing import Optional, Any, TYPE_CHECKING
+from typing import Optional, Any, List, TYPE_CHECKING
+from urllib.parse import urlsplit
 
 if TYPE_CHECKING:
     from typing import Self
@@ -35,6 +36,9 @@ class WSServerConfig(BaseModel):
 
     :ivar remote_server: 是否连接到远程 WebSocket 服务端
     :ivar remote_server_uri: 远程服务端 URI
+    :ivar remote_server_dns_cache_ttl: 远程服务端域名解析结果的缓存时间（秒），为 ``0`` 时每次连接都重新解析
+    :ivar remote_server_compression: 连接远程服务端时是否启用 ``permessage-deflate`` 压缩，\
+        关闭可减少每个终端连接占用的内存
     :ivar local_server_host: 本地搭建的服务端 host
     :ivar local_server_port: 本地搭建的服务端监听端口
     :ivar local_server_publish_uri: 生成二维码时，使用的本地服务端 URI（需要郊狼用户能够连接）
@@ -43,9 +47,22 @@ class WSServerConfig(BaseModel):
     :ivar local_server_ssl_cert: SSL 证书文件路径
     :ivar local_server_ssl_key: SSL 私钥路径
     :ivar local_server_ssl_password: SSL 私钥密码
+    :ivar local_server_workers: 本地服务端工作进程数，为 ``0`` 时在机器人进程内运行服务端。\
+        大于 ``0`` 时，将启动对应数量的子进程运行服务端，第 ``i`` 个进程监听 ``local_server_port + i`` 端口，\
+        机器人的终端是工作进程中的本地终端，机器人通过工作进程在本机回环地址上另外监听的明文端口，\
+        以一个连接操作该工作进程上的所有终端，不经过 App 连接的端口与 SSL。\
+        工作进程启动失败或意外退出时将按指数退避重试，意外退出的工作进程上的终端将被摧毁
+    :ivar local_server_worker_publish_uris: 生成二维码时，各个工作进程使用的服务端 URI，\
+        为 ``None`` 时将 ``local_server_publish_uri`` 的端口替换为各个工作进程的监听端口
+    :ivar local_server_metrics_path: 本地服务端上以 Prometheus 文本格式输出运行指标的 HTTP 路径，例如 ``/metrics``，\
+        为 ``None``（默认）时不启用。启用工作进程或连接远程服务端时不可用，可由超级用户通过命令查看。\
+        该路径与 App 连接的 WebSocket 服务端共用同一端口且不做身份验证，任何能访问该端口的人都可以读取指标，\
+        服务端暴露在公网时应通过防火墙或反向代理限制访问
     """
     remote_server: bool = False
     remote_server_uri: Optional[str] = None
+    remote_server_dns_cache_ttl: float = 300
+    remote_server_compression: bool = False
     local_server_host: Optional[str] = "0.0.0.0"
     local_server_port: Optional[int] = 4567
     local_server_publish_uri: Optional[str] = "ws://127.0.0.1:4567"
@@ -54,6 +71,9 @@ class WSServerConfig(BaseModel):
     local_server_ssl_cert: Optional[Path] = None
     local_server_ssl_key: Optional[Path] = None
     local_server_ssl_password: Optional[str] = None
+    local_server_workers: int = 0
+    local_server_worker_publish_uris: Optional[List[str]] = None
+    local_server_metrics_path: Optional[str] = None
 
     @cached_property
     def server_ssl_context(self) -> Optional[ssl.SSLContext]:
@@ -98,8 +118,20 @@ class WSServerConfig(BaseModel):
                     logger.error(
                         "启用了本地服务端安全连接 local_server_secure，但没有指定证书文件 local_server_ssl_cert 或文件不存在")
                     raise PydanticCustomError
+            if (self.local_server_workers and self.local_server_worker_publish_uris is not None
+                    and len(self.local_server_worker_publish_uris) != self.local_server_workers):
+                logger.error("local_server_worker_publish_uris 的数量与工作进程数 local_server_workers 不一致")
+                raise PydanticCustomError
         return self
 
+    def worker_publish_uri(self, index: int) -> str:
+        """生成二维码时，第 ``index`` 个工作进程使用的服务端 URI"""
+        if self.local_server_worker_publish_uris:
+            return self.local_server_worker_publish_uris[index]
+        parsed = urlsplit(self.local_server_publish_uri)
+        host = parsed.netloc.rsplit(":", 1)[0] if parsed.port else parsed.netloc
+        return parsed._replace(netloc=f"{host}:{(parsed.port or self.local_server_port) + index}").geturl()
+
     def validate_local_server_publish_uri(self) -> "Self":
         if (not self.remote_server and
                 self.local_server_publish_uri == self.model_fields["local_server_publish_uri"].default):
@@ -114,9 +146,31 @@ class DGLabClientConfig(BaseModel):
 
     :ivar bind_timeout: 绑定超时时间（秒）
     :ivar register_timeout: 终端注册（获取 ``clientId``）超时时间（秒）
+    :ivar qrcode_cache_size: 已生成的二维码图片的缓存数量，相同内容的二维码不会重复生成
+    :ivar local_client_pool_size: 使用本地服务端时，预先创建并生成好二维码的终端数量，
+        绑定时直接从中取出，为 ``0`` 时不启用
+    :ivar remote_client_pool_size: 使用远程服务端时，预先连接并完成注册的终端数量，
+        绑定时直接从中取出，为 ``0`` 时不启用
+    :ivar remote_client_pool_max_idle: 预先注册的终端最长闲置时间（秒），超过后将断开并重新注册
+    :ivar remote_client_pool_max_backoff: 预先注册终端失败后的最长重试间隔（秒），重试间隔从 1 秒开始逐次翻倍
+    :ivar pulse_trace_size: 开启波形追踪时，每个终端保留的最近波形补充记录数
+    :ivar strength_coalesce_window: 合并强度指令的时间窗口（秒），同一玩家的强度指令在上一次发送后的窗口内到达时，\
+        将在窗口结束时按顺序合并为每个通道一条设置强度的消息，窗口外的指令立即发送，为 ``0`` 时不合并
+    :ivar strength_confirm_timeout: 已发送的强度变化等待 App 反馈确认的最长时间（秒）。\
+        在此之前，强度控制与查询按已发送的强度计算，超时未确认则以 App 反馈的强度为准
+    :ivar broadcast_concurrency: 全体命令同时控制的最大玩家数
     """
     bind_timeout: float = 90
     register_timeout: float = 30
+    qrcode_cache_size: int = 128
+    local_client_pool_size: int = 0
+    remote_client_pool_size: int = 0
+    remote_client_pool_max_idle: float = 300
+    remote_client_pool_max_backoff: float = 60
+    pulse_trace_size: int = 256
+    strength_coalesce_window: float = 0.2
+    strength_confirm_timeout: float = 3
+    broadcast_concurrency: int = 16
 
 
 class PulseDataConfig(BaseModel):
@@ -125,21 +179,41 @@ class PulseDataConfig(BaseModel):
 
     此处时间单位均为 秒。
 
-    DG-Lab App 波形队列最大长度为 50s，波形发送任务会先清空 App 波形队列，然后数次发送 最大为 ``duration_per_post`` 时长的波形，
-    直到 App 队列无法继续放入。随后将会等待直到队列空出一段 最大为 ``duration_per_post`` 时长的空间，
-    此时再发送一段 最大为 ``duration_per_post`` 时长的波形，然后再等待空间空出，再发送，如此循环。
+    DG-Lab App 波形队列最大长度为 50s，波形发送任务会先清空 App 波形队列，然后按单调时钟记录每次发送的时间与波形长度，
+    以此估计 App 队列当前的占用。每次只补充队列空出的部分（最大为 ``duration_per_post`` 时长），
+    波形循环会从上次发送结束的位置继续，不需要与每次发送的时长对齐。
+    队列填满（达到 ``queue_duration``）后，等待队列空出一段 ``duration_per_post`` 时长（最多为 ``queue_duration`` 的一半）的空间再发送，
+    如此循环。
+
+    增加波形时不会清空 App 波形队列，新的波形循环将在队列中已有的波形播放完毕后接上。
 
     :ivar custom_pulse_data: 自定义波形的文件路径，\
         JSON 格式为 波形名称 -> 波形数据（``Array<Array<Number, Number, Number, Number>>``)
-    :ivar duration_per_post: 每次发送的波形最大持续时长，**必须小于等于 8.6**。实际时长将会是 **设定的波形的时长** 的整数倍，倍数向下取整。\
-        在此持续时间内，设定的波形会被重复播放
+    :ivar compiled_pulse_data: 编译后的波形库文件路径，文件存在时代替 ``custom_pulse_data`` 读取。\
+        波形库通过 ``mmap`` 按需读取，适合包含大量波形的情况，\
+        可使用 ``python scripts/compile_pulse_library.py customPulseData.json`` 从自定义波形文件编译
+    :ivar reload_interval: 检查波形文件是否发生变化的间隔时间，变化后将自动重新读取，\
+        正在播放的波形循环中被修改的波形也会随之更新，为 ``0`` 时不启用
+    :ivar lazy_load: 是否延迟读取自定义波形，启用后不在机器人启动时读取，而是在首次使用波形时读取，可加快启动速度
+    :ivar duration_per_post: 每次发送的波形最大持续时长，**必须小于等于 8.6**
     :ivar post_interval: 波形发送间隔时间，应尽量小
-    :ivar sleep_after_clear: 清除波形后的睡眠时间（避免由于网络波动等原因导致 清空队列指令晚于波形数据执行造成波形数据丢失 的情况）
+    :ivar sleep_after_clear: 清除波形后的睡眠时间（避免由于网络波动等原因导致 清空队列指令晚于波形数据执行造成波形数据丢失 的情况），\
+        仅在连接远程服务端时使用，本地服务端的清空指令发送完毕时即已送达 App 的连接
+    :ivar queue_duration: 预先填入 App 波形队列的最大时长，越小则增加波形后越快播放到新的波形，但更容易因网络波动出现断续。\
+        小于 ``duration_per_post`` 时，``duration_per_post`` 将被减小为 ``queue_duration``
+    :ivar queue_margin: 估计 App 波形队列占用时预留的余量，用于抵消网络延迟等原因造成的估计误差，避免波形数据溢出被丢弃
+    :ivar max_loop_duration: 波形循环的最大时长，超出时将无法继续增加波形
     """
     custom_pulse_data: Path = DG_LAB_PLAY_DATA_LOCATION / "customPulseData.json"
+    compiled_pulse_data: Optional[Path] = None
+    lazy_load: bool = False
+    reload_interval: float = 0
     duration_per_post: float = 8
     post_interval: float = 1
     sleep_after_clear: float = 0.5
+    queue_duration: float = 20
+    queue_margin: float = 1
+    max_loop_duration: float = 60
 
     # noinspection PyNestedDecorators
     @field_validator("duration_per_post")
@@ -151,10 +225,26 @@ class PulseDataConfig(BaseModel):
         else:
             return value
 
+    @model_validator(mode="after")
+    def validate_queue_duration(self) -> "Self":
+        if self.queue_duration < self.duration_per_post:
+            logger.warning(
+                f"PulseDataConfig.queue_duration 小于 duration_per_post，"
+                f"每次发送的波形时长将减小为 {self.queue_duration}"
+            )
+            self.duration_per_post = self.queue_duration
+        return self
+
 
 class CommandTextConfig(BaseModel):
     """命令触发文本设置"""
     append_pulse: str = "增加波形"
+    broadcast_append_pulse: str = "全体增加波形"
+    broadcast_decrease_strength: str = "全体减小强度"
+    broadcast_increase_strength: str = "全体加大强度"
+    broadcast_random_pulse: str = "全体随机波形"
+    broadcast_random_strength: str = "全体随机强度"
+    broadcast_reset_pulse: str = "全体重置波形"
     current_pulse: str = "当前波形"
     current_strength: str = "当前强度"
     decrease_strength: str = "减小强度"
@@ -166,6 +256,8 @@ class CommandTextConfig(BaseModel):
     reset_pulse: str = "重置波形"
     show_players: str = "当前玩家"
     show_pulses: str = "可用波形"
+    show_metrics: str = "郊狼指标"
+    pulse_trace: str = "波形追踪"
     usage: str = "郊狼玩法"
 
 
@@ -173,12 +265,17 @@ class ReplyTextConfig(BaseModel):
     """命令响应文本设置"""
 
     bind_timeout: str = "绑定超时"
+    broadcast_error: str = "出现异常"
+    broadcast_failed: str = "{}："
+    broadcast_invalid_mention: str = "全体命令只能 @ 玩家或 @全体成员"
+    broadcast_result: str = "已对 {0} 名玩家生效：{1}"
     current_players: str = "当前玩家："
     current_pulse: str = "当前波形循环为：【{}】"
     current_strength: str = "A通道：{0}/{1} B通道：{2}/{3}"
     failed_to_create_client: str = "创建 DG-Lab 控制终端失败"
     failed_to_fetch_strength_info: str = "获取通道强度状态失败"
     failed_to_fetch_strength_limit: str = "获取通道强度上限失败，控制失败"
+    failed_to_set_strength: str = "{} 通道强度设置失败"
     game_exited: str = "已退出游戏"
     invalid_pulse_param: str = "波形参数错误，控制失败"
     invalid_strength_param: str = "强度参数错误，控制失败"
@@ -189,7 +286,14 @@ class ReplyTextConfig(BaseModel):
     please_at_target: str = "使用命令的同时请 @ 想要控制的玩家"
     please_scan_qrcode: str = "请用 DG-Lab App 扫描二维码以连接"
     please_set_pulse_first: str = "请先设置郊狼波形：{}"
+    pulse_loop_too_long: str = "波形循环最长为 {} 秒，无法继续增加波形"
     pulses_empty: str = "当前波形循环为空"
+    pulse_trace_disabled: str = "已关闭波形追踪"
+    pulse_trace_dumped: str = "共 {0} 条波形补充记录已写入 {1}，最近的记录如下："
+    pulse_trace_empty: str = "暂无波形补充记录"
+    pulse_trace_enabled: str = "已开启波形追踪，最多保留 {} 条记录"
+    pulse_trace_not_enabled: str = "该玩家未开启波形追踪"
+    successfully_appended_pulse: str = "已将【{}】添加到郊狼波形循环！"
     successfully_bind: str = "绑定成功，可以开始色色了！"
     successfully_decreased: str = "郊狼强度减小了 {}%"
     successfully_increased: str = "郊狼强度加强了 {}%！"
@@ -0,0 +1,267 @@
+"""
+运行指标
+
+计数器、仪表与直方图均保存在内存中，以 Prometheus 文本格式输出，用于估算主机容量、发现事件循环饱和等问题。
+可通过本地服务端的 ``local_server_metrics_path`` 获取，或由超级用户通过命令查看。
+"""
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from http import HTTPStatus
+from typing import Dict, Tuple, Callable, Iterator, List, Optional, Sequence, Awaitable
+from urllib.parse import urlsplit
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "metrics",
+    "metrics_process_request",
+    "active_clients",
+    "scheduled_pulse_jobs",
+    "pulse_backlog",
+    "binds",
+    "app_disconnects",
+    "messages_received",
+    "pulse_refill_lag",
+    "add_pulses_latency",
+    "set_strength_latency",
+    "pulse_data_too_long",
+    "command_latency"
+]
+
+METRICS_PREFIX = "dg_lab_play_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+"""直方图默认的分桶上界（秒）"""
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric(ABC):
+    """
+    指标基础类
+
+    :param name: 指标名称，输出时会加上 ``dg_lab_play_`` 前缀，计数器还会加上 ``_total`` 后缀
+    :param documentation: 指标说明
+    :param label_names: 标签名称
+    """
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = METRICS_PREFIX + name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _format_labels(self, values: LabelValues, extra: Sequence[Tuple[str, str]] = ()) -> str:
+        pairs = [*zip(self.label_names, values), *extra]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+    @abstractmethod
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        """产出 指标名称后缀，标签，数值"""
+
+    def summary(self) -> Iterator[str]:
+        """产出适合在聊天中发送的简要数值"""
+        for suffix, labels, value in self.samples():
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(f"{self.name}{suffix}{labels} {_format_value(value)}" for suffix, labels, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    """只增不减的计数器"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(f"{name}_total", documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        if not self.label_names and not self._values:
+            yield "", "", 0
+        for key, value in self._values.items():
+            yield "", self._format_labels(key), value
+
+
+class Gauge(Metric):
+    """
+    可增可减的仪表
+
+    :param function: 输出时调用以获取当前值的函数，设置后 :meth:`set` 的值将被忽略
+    """
+    type_name = "gauge"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            label_names: Sequence[str] = (),
+            function: Callable[[], float] = None
+    ):
+        super().__init__(name, documentation, label_names)
+        self.function = function
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        if self.function:
+            yield "", "", self.function()
+            return
+        for key, value in self._values.items():
+            yield "", self._format_labels(key), value
+
+
+class Histogram(Metric):
+    """
+    直方图，按分桶统计观测值的分布
+
+    :param buckets: 分桶上界，升序排列
+    """
+    type_name = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            label_names: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        """各分桶中的观测次数（不累计），最后一个为超出所有分桶的次数"""
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        if (counts := self._counts.get(key)) is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """记录代码块的执行耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                yield "_bucket", self._format_labels(key, [("le", _format_value(bound))]), cumulative
+            yield "_sum", self._format_labels(key), self._sums[key]
+            yield "_count", self._format_labels(key), cumulative
+
+    def summary(self) -> Iterator[str]:
+        for key, counts in self._counts.items():
+            count = sum(counts)
+            yield f"{self.name}{self._format_labels(key)} 次数 {count}，平均 {self._sums[key] / count * 1000:.2f}ms"
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标 {metric.name} 已存在")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, function: Callable[[], float] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, function=function))
+
+    def histogram(
+            self,
+            name: str,
+            documentation: str,
+            label_names: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        """以 Prometheus 文本格式输出所有指标"""
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+    def summary(self) -> str:
+        """所有指标的简要数值，直方图只输出观测次数与平均值"""
+        return "\n".join(line for metric in self._metrics.values() for line in metric.summary())
+
+
+metrics = MetricsRegistry()
+
+active_clients = metrics.gauge("active_clients", "当前的终端数")
+scheduled_pulse_jobs = metrics.gauge("scheduled_pulse_jobs", "波形发送调度器中的任务数，包括已失效、等待到期后丢弃的任务")
+pulse_backlog = metrics.gauge("pulse_backlog", "已到期但还未开始执行的波形发送任务数，持续大于 0 说明事件循环已饱和")
+binds = metrics.counter("binds", "终端与 App 的绑定次数", ["kind", "result"])
+app_disconnects = metrics.counter("app_disconnects", "已绑定的 App 断开连接的次数，断开后终端将等待重新绑定")
+messages_received = metrics.counter("messages_received", "终端收到的 App 消息数", ["type"])
+pulse_refill_lag = metrics.histogram(
+    "pulse_refill_lag_seconds",
+    "波形发送任务实际执行时间相对于预定时间的延迟，持续增大说明事件循环已饱和",
+    buckets=(0.0005, *DEFAULT_BUCKETS)
+)
+add_pulses_latency = metrics.histogram("add_pulses_seconds", "单个通道下发波形数据的耗时")
+set_strength_latency = metrics.histogram("set_strength_seconds", "设置强度（所有目标通道）的耗时")
+pulse_data_too_long = metrics.counter("pulse_data_too_long", "因波形数据过长而发送失败的次数")
+command_latency = metrics.histogram("command_seconds", "命令处理耗时", ["handler"])
+
+
+def metrics_process_request(
+        metrics_path: str
+) -> Callable[[str, object], Awaitable[Optional[Tuple[HTTPStatus, list, bytes]]]]:
+    """
+    创建 :func:`websockets.server.serve` 的 ``process_request`` 参数，
+    对 ``metrics_path`` 的 HTTP 请求返回文本格式的指标（忽略查询参数），其他请求照常进行 WebSocket 握手。
+    该路径不做身份验证
+    """
+
+    async def process_request(path: str, _):
+        if urlsplit(path).path == metrics_path:
+            return HTTPStatus.OK, [("Content-Type", CONTENT_TYPE)], metrics.render().encode("utf-8")
+        return None
+
+    return process_request
@@ -1,16 +1,37 @@
+import asyncio
 import json
-from typing import Dict, List, Any
+import mmap
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple, Union, Callable, Iterable, Iterator, Sequence, Mapping, NamedTuple, \
+    overload
 
 from loguru import logger
 from nonebot import get_plugin_config, get_driver
-from pydantic import RootModel
+from pydantic import RootModel, GetCoreSchemaHandler, ConfigDict, Field
+from pydantic_core import core_schema
 from pydglab_ws import PulseOperation
 
+from . import pulse_library_format
 from .config import Config, DG_LAB_PLAY_DATA_LOCATION
 
-__all__ = ["CustomPulseData", "custom_pulse_data"]
+__all__ = [
+    "PulseWaveform",
+    "PulseLoopSegment",
+    "PulseLoop",
+    "PulseLoopCursor",
+    "PulseLibrary",
+    "CustomPulseData",
+    "custom_pulse_data",
+    "CustomPulseDataReloader",
+    "custom_pulse_data_reloader",
+    "load_custom_pulse_data",
+    "get_custom_pulse_data"
+]
 
 CUSTOM_PULSE_DATA_SCHEMA_FILENAME = "custom-pulse-data-schema.json"
+DEFAULT_PULSE_DATA_PATH = Path(__file__).parent / "data" / "default_pulse_data.json"
+"""插件自带的 DG-Lab App 内置波形数据文件"""
 
 config = get_plugin_config(Config).dg_lab_play
 driver = get_driver()
@@ -33,148 +54,443 @@ class CustomPulseDataJSONEncoder(json.JSONEncoder):
             return super().encode(o)
 
 
+class PulseWaveform(Sequence[PulseOperation]):
+    """
+    紧凑存储的波形数据
+
+    每条波形操作数据（100ms）按 4 个频率值、4 个强度值的顺序存储为 8 字节，与下发时的编码一致。
+    切片返回共享同一块内存的视图，不会复制数据。
+
+    :param data: 波形数据的字节，长度必须为 :attr:`FRAME_SIZE` 的整数倍
+    """
+
+    __slots__ = ("_buffer", "_hex_frames")
+
+    FRAME_SIZE = pulse_library_format.FRAME_SIZE
+    """每条波形操作数据的字节数"""
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview] = b""):
+        buffer = memoryview(data).cast("B")
+        if len(buffer) % self.FRAME_SIZE:
+            raise ValueError(f"波形数据长度 {len(buffer)} 不是 {self.FRAME_SIZE} 的整数倍")
+        self._buffer = buffer
+        self._hex_frames: Optional[Tuple[str, ...]] = None
+
+    @classmethod
+    def from_operations(cls, pulses: Iterable[PulseOperation]) -> "PulseWaveform":
+        """
+        从波形操作数据生成
+
+        :raise ValueError: 数值超出 [0, 255]
+        """
+        return cls(bytes(value for pulse in pulses for operation in pulse for value in operation))
+
+    def __len__(self) -> int:
+        return len(self._buffer) // self.FRAME_SIZE
+
+    @overload
+    def __getitem__(self, index: int) -> PulseOperation:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "PulseWaveform":
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[PulseOperation, "PulseWaveform"]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("PulseWaveform 切片不支持步长")
+            return PulseWaveform(self._buffer[start * self.FRAME_SIZE:max(start, stop) * self.FRAME_SIZE])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PulseWaveform index out of range")
+        frame = self._buffer[index * self.FRAME_SIZE:(index + 1) * self.FRAME_SIZE]
+        return tuple(frame[:4]), tuple(frame[4:])
+
+    def __iter__(self) -> Iterator[PulseOperation]:
+        for i in range(0, len(self._buffer), self.FRAME_SIZE):
+            yield tuple(self._buffer[i:i + 4]), tuple(self._buffer[i + 4:i + self.FRAME_SIZE])
+
+    def __add__(self, other: "PulseWaveform") -> "PulseWaveform":
+        if not isinstance(other, PulseWaveform):
+            return NotImplemented
+        return PulseWaveform(bytes(self._buffer) + bytes(other._buffer))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, PulseWaveform):
+            return self._buffer == other._buffer
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(bytes(self._buffer))
+
+    def __repr__(self) -> str:
+        return f"PulseWaveform({len(self)} frames)"
+
+    @property
+    def nbytes(self) -> int:
+        """占用的数据字节数"""
+        return len(self._buffer)
+
+    def hex_frames(self) -> Tuple[str, ...]:
+        """每条波形操作数据下发时的十六进制字符串，首次调用后缓存，由使用该波形的所有终端共享"""
+        if self._hex_frames is None:
+            hex_data = self._buffer.hex()
+            step = self.FRAME_SIZE * 2
+            self._hex_frames = tuple(hex_data[i:i + step] for i in range(0, len(hex_data), step))
+        return self._hex_frames
+
+    def to_operations(self) -> List[PulseOperation]:
+        """转换为波形操作数据列表"""
+        return list(self)
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        from_operations_schema = core_schema.no_info_after_validator_function(
+            cls.from_operations,
+            handler.generate_schema(List[PulseOperation])
+        )
+        return core_schema.json_or_python_schema(
+            json_schema=from_operations_schema,
+            python_schema=core_schema.union_schema([
+                core_schema.is_instance_schema(cls),
+                from_operations_schema
+            ]),
+            serialization=core_schema.plain_serializer_function_ser_schema(cls.to_operations)
+        )
+
+
+class PulseLoopSegment(NamedTuple):
+    """波形循环中的一段，即重复 ``repeat`` 次的同一波形"""
+    name: str
+    waveform: PulseWaveform
+    repeat: int = 1
+
+
+class PulseLoop:
+    """
+    波形循环
+
+    按 :class:`PulseLoopSegment` 分段存储，连续追加同一波形只会增加该段的重复次数，
+    只有在生成下发的波形数据时才会展开
+
+    :param segments: 波形循环的各段
+    """
+
+    __slots__ = ("segments",)
+
+    def __init__(self, segments: Iterable[PulseLoopSegment] = ()):
+        self.segments: Tuple[PulseLoopSegment, ...] = tuple(segments)
+
+    @classmethod
+    def of(cls, name: str, waveform: PulseWaveform) -> "PulseLoop":
+        """只包含一个波形的波形循环"""
+        return cls((PulseLoopSegment(name, waveform),))
+
+    def appended(self, name: str, waveform: PulseWaveform) -> "PulseLoop":
+        """返回在末尾追加了波形后的新波形循环"""
+        if self.segments and (last := self.segments[-1]).name == name and last.waveform is waveform:
+            return PulseLoop(self.segments[:-1] + (last._replace(repeat=last.repeat + 1),))
+        return PulseLoop(self.segments + (PulseLoopSegment(name, waveform),))
+
+    def replaced(self, pulse_data: Mapping[str, PulseWaveform]) -> "PulseLoop":
+        """
+        返回将各段波形替换为 ``pulse_data`` 中同名波形后的新波形循环，``pulse_data`` 中不存在的波形保持不变
+
+        :return: 没有波形发生变化时返回自身
+        """
+        segments = tuple(
+            segment._replace(waveform=waveform)
+            if (waveform := pulse_data.get(segment.name)) is not None
+            and waveform is not segment.waveform and waveform != segment.waveform
+            else segment
+            for segment in self.segments
+        )
+        if all(new is old for new, old in zip(segments, self.segments)):
+            return self
+        return PulseLoop(segments)
+
+    def __len__(self) -> int:
+        return sum(len(segment.waveform) * segment.repeat for segment in self.segments)
+
+    @property
+    def duration(self) -> float:
+        """波形循环的时长（秒）"""
+        return len(self) * 0.1
+
+    @property
+    def names(self) -> List[str]:
+        """按播放顺序排列的波形名称"""
+        return [segment.name for segment in self.segments for _ in range(segment.repeat)]
+
+    def cursor(self, position: int = 0) -> "PulseLoopCursor":
+        """从第 ``position`` 条波形数据开始循环读取的游标"""
+        return PulseLoopCursor(self, position)
+
+
+class PulseLoopCursor:
+    """
+    波形循环的游标，循环读取下发时的十六进制字符串，每次读取都从上次结束的位置继续
+
+    :param pulse_loop: 波形循环
+    :param position: 起始位置，即从第几条波形数据开始
+    """
+
+    __slots__ = ("pulse_loop", "_segment", "_repeat", "_offset")
+
+    def __init__(self, pulse_loop: PulseLoop, position: int = 0):
+        self.pulse_loop = pulse_loop
+        self._segment = self._repeat = self._offset = 0
+        if pulse_loop:
+            self.skip(position % len(pulse_loop))
+
+    @property
+    def position(self) -> int:
+        """当前位于波形循环中的第几条波形数据"""
+        segments = self.pulse_loop.segments
+        return (
+                sum(len(segment.waveform) * segment.repeat for segment in segments[:self._segment])
+                + (len(segments[self._segment].waveform) * self._repeat + self._offset if segments else 0)
+        )
+
+    def switch(self, pulse_loop: PulseLoop):
+        """
+        切换到另一个波形循环，并保持当前位置，适合切换到在当前波形循环末尾追加了波形后的新波形循环
+
+        :param pulse_loop: 新的波形循环
+        """
+        position = self.position
+        self.__init__(pulse_loop, position)
+
+    def skip(self, count: int):
+        """跳过 ``count`` 条波形数据"""
+        self.take(count)
+
+    def take(self, count: int) -> List[str]:
+        """
+        读取 ``count`` 条波形数据，到达波形循环末尾时从头继续
+
+        :param count: 读取的条数
+        :return: 下发时的十六进制字符串，波形循环为空时返回空列表
+        """
+        frames: List[str] = []
+        segments = self.pulse_loop.segments
+        if not self.pulse_loop:
+            return frames
+        while len(frames) < count:
+            segment = segments[self._segment]
+            hex_frames = segment.waveform.hex_frames()
+            end = min(len(hex_frames), self._offset + count - len(frames))
+            frames.extend(hex_frames[self._offset:end])
+            self._offset = end
+            if self._offset == len(hex_frames):
+                self._offset = 0
+                self._repeat += 1
+                if self._repeat >= segment.repeat:
+                    self._repeat = 0
+                    self._segment = (self._segment + 1) % len(segments)
+        return frames
+
+
+class PulseLibrary(Mapping[str, PulseWaveform]):
+    """
+    编译后的波形库，通过 ``mmap`` 读取，可由 ``scripts/compile_pulse_library.py`` 从自定义波形文件编译
+
+    打开时只读取索引，波形数据在按名称取用时才从映射的文件中读取，得到的 :class:`PulseWaveform` 直接引用映射的内存，
+    不会复制数据，因此启动时间和内存占用不会随波形库的大小增长。
+
+    文件格式见 :mod:`nonebot_plugin_dg_lab_play.pulse_library_format`，波形数据与 :class:`PulseWaveform` 的存储格式一致。
+
+    :param path: 波形库文件路径
+    :raise ValueError: 文件格式错误
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._waveforms: Dict[str, PulseWaveform] = {}
+        try:
+            self._read_index()
+        except Exception:
+            # 文件格式错误时不会再使用该映射，立即释放，而不是等待垃圾回收
+            self._view.release()
+            self._mmap.close()
+            raise
+
+    def _read_index(self):
+        if len(self._mmap) < pulse_library_format.HEADER.size:
+            raise ValueError(f"{self.path} 不是有效的波形库文件")
+        magic, version, _, count = pulse_library_format.HEADER.unpack_from(self._mmap)
+        if magic != pulse_library_format.MAGIC or version != pulse_library_format.VERSION:
+            raise ValueError(f"{self.path} 不是有效的波形库文件，或版本不受支持")
+        position = pulse_library_format.HEADER.size
+        for _ in range(count):
+            if position + pulse_library_format.INDEX_ENTRY.size > len(self._mmap):
+                raise ValueError(f"{self.path} 的索引不完整")
+            offset, frames, name_length = pulse_library_format.INDEX_ENTRY.unpack_from(self._mmap, position)
+            position += pulse_library_format.INDEX_ENTRY.size
+            name = bytes(self._view[position:position + name_length]).decode("utf-8")
+            position += name_length
+            if offset + frames * PulseWaveform.FRAME_SIZE > len(self._mmap):
+                raise ValueError(f"{self.path} 中的波形 {name} 超出了文件范围")
+            self._index[name] = offset, frames
+
+    def __getitem__(self, name: str) -> PulseWaveform:
+        if (waveform := self._waveforms.get(name)) is None:
+            offset, frames = self._index[name]
+            waveform = self._waveforms[name] = PulseWaveform(
+                self._view[offset:offset + frames * PulseWaveform.FRAME_SIZE]
+            )
+        return waveform
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __contains__(self, name: Any) -> bool:
+        return name in self._index
+
+
+def load_default_pulse_data() -> Dict[str, List[PulseOperation]]:
+    """从插件自带的数据文件中读取 DG-Lab App 内置波形"""
+    with DEFAULT_PULSE_DATA_PATH.open(encoding="utf-8") as f:
+        return json.load(f)
+
+
 class CustomPulseData(RootModel):
     """自定义波形，默认包含 DG-Lab App 内置波形"""
 
-    root: Dict[str, List[PulseOperation]] = {
-        '呼吸': [
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 5, 10, 20)),
-            ((10, 10, 10, 10), (20, 25, 30, 40)), ((10, 10, 10, 10), (40, 45, 50, 60)),
-            ((10, 10, 10, 10), (60, 65, 70, 80)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((0, 0, 0, 0), (0, 0, 0, 0)), ((0, 0, 0, 0), (0, 0, 0, 0)), ((0, 0, 0, 0), (0, 0, 0, 0))
-        ],
-        '潮汐': [
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 4, 8, 17)),
-            ((10, 10, 10, 10), (17, 21, 25, 33)), ((10, 10, 10, 10), (50, 50, 50, 50)),
-            ((10, 10, 10, 10), (50, 54, 58, 67)), ((10, 10, 10, 10), (67, 71, 75, 83)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (100, 98, 96, 92)),
-            ((10, 10, 10, 10), (92, 90, 88, 84)), ((10, 10, 10, 10), (84, 82, 80, 76)),
-            ((10, 10, 10, 10), (68, 68, 68, 68))
-        ],
-        '连击': [
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (100, 92, 84, 67)),
-            ((10, 10, 10, 10), (67, 58, 50, 33)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((10, 10, 10, 10), (0, 0, 0, 1)), ((10, 10, 10, 10), (2, 2, 2, 2))
-        ],
-        '快速按捏': [
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((0, 0, 0, 0), (0, 0, 0, 0))
-        ],
-        '按捏渐强': [
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (29, 29, 29, 29)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (52, 52, 52, 52)),
-            ((10, 10, 10, 10), (2, 2, 2, 2)), ((10, 10, 10, 10), (73, 73, 73, 73)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (87, 87, 87, 87)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (0, 0, 0, 0))
-        ],
-        '心跳节奏': [
-            ((110, 110, 110, 110), (100, 100, 100, 100)), ((110, 110, 110, 110), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (75, 75, 75, 75)),
-            ((10, 10, 10, 10), (75, 77, 79, 83)), ((10, 10, 10, 10), (83, 85, 88, 92)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 0, 0, 0))
-        ],
-        '压缩': [
-            ((25, 25, 24, 24), (100, 100, 100, 100)), ((24, 23, 23, 23), (100, 100, 100, 100)),
-            ((22, 22, 22, 21), (100, 100, 100, 100)), ((21, 21, 20, 20), (100, 100, 100, 100)),
-            ((20, 19, 19, 19), (100, 100, 100, 100)), ((18, 18, 18, 17), (100, 100, 100, 100)),
-            ((17, 16, 16, 16), (100, 100, 100, 100)), ((15, 15, 15, 14), (100, 100, 100, 100)),
-            ((14, 14, 13, 13), (100, 100, 100, 100)), ((13, 12, 12, 12), (100, 100, 100, 100)),
-            ((11, 11, 11, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (100, 100, 100, 100))
-        ],
-        '节奏步伐': [
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 5, 10, 20)),
-            ((10, 10, 10, 10), (20, 25, 30, 40)), ((10, 10, 10, 10), (40, 45, 50, 60)),
-            ((10, 10, 10, 10), (60, 65, 70, 80)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 6, 12, 25)),
-            ((10, 10, 10, 10), (25, 31, 38, 50)), ((10, 10, 10, 10), (50, 56, 62, 75)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((10, 10, 10, 10), (0, 8, 16, 33)), ((10, 10, 10, 10), (33, 42, 50, 67)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((10, 10, 10, 10), (0, 12, 25, 50)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (100, 100, 100, 100))
-        ],
-        '颗粒摩擦': [
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (0, 0, 0, 0))
-        ],
-        '渐变弹跳': [
-            ((10, 10, 10, 10), (1, 1, 1, 1)), ((10, 10, 10, 10), (1, 9, 18, 34)),
-            ((10, 10, 10, 10), (34, 42, 50, 67)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((0, 0, 0, 0), (0, 0, 0, 0)), ((0, 0, 0, 0), (0, 0, 0, 0))
-        ],
-        '波浪涟漪': [
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 12, 25, 50)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (73, 73, 73, 73))
-        ],
-        '雨水冲刷': [
-            ((10, 10, 10, 10), (34, 34, 34, 34)), ((10, 10, 10, 10), (34, 42, 50, 67)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((0, 0, 0, 0), (0, 0, 0, 0)),
-            ((0, 0, 0, 0), (0, 0, 0, 0))
-        ],
-        '变速敲击': [
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((110, 110, 110, 110), (100, 100, 100, 100)),
-            ((110, 110, 110, 110), (100, 100, 100, 100)), ((110, 110, 110, 110), (100, 100, 100, 100)),
-            ((110, 110, 110, 110), (100, 100, 100, 100)), ((0, 0, 0, 0), (0, 0, 0, 0))
-        ],
-        '信号灯': [
-            ((197, 197, 197, 197), (100, 100, 100, 100)), ((197, 197, 197, 197), (100, 100, 100, 100)),
-            ((197, 197, 197, 197), (100, 100, 100, 100)), ((197, 197, 197, 197), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 8, 16, 33)),
-            ((10, 10, 10, 10), (33, 42, 50, 67)), ((10, 10, 10, 10), (100, 100, 100, 100))
-        ],
-        '挑逗1': [
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 6, 12, 25)),
-            ((10, 10, 10, 10), (25, 31, 38, 50)), ((10, 10, 10, 10), (50, 56, 62, 75)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 0, 0, 0)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((10, 10, 10, 10), (100, 100, 100, 100))
-        ],
-        '挑逗2': [
-            ((10, 10, 10, 10), (1, 1, 1, 1)), ((10, 10, 10, 10), (1, 4, 6, 12)),
-            ((10, 10, 10, 10), (12, 15, 18, 23)), ((10, 10, 10, 10), (23, 26, 28, 34)),
-            ((10, 10, 10, 10), (34, 37, 40, 45)), ((10, 10, 10, 10), (45, 48, 50, 56)),
-            ((10, 10, 10, 10), (56, 59, 62, 67)), ((10, 10, 10, 10), (67, 70, 72, 78)),
-            ((10, 10, 10, 10), (78, 81, 84, 89)), ((10, 10, 10, 10), (100, 100, 100, 100)),
-            ((10, 10, 10, 10), (100, 100, 100, 100)), ((10, 10, 10, 10), (0, 0, 0, 0)),
-            ((0, 0, 0, 0), (0, 0, 0, 0))
-        ]
-    }
-
-
-custom_pulse_data = CustomPulseData()
+    model_config = ConfigDict(validate_default=True)
 
+    root: Mapping[str, PulseWaveform] = Field(default_factory=load_default_pulse_data)
 
-@driver.on_startup
-def load_custom_pulse_data():
-    if not config.pulse_data.custom_pulse_data.is_file():
-        with config.pulse_data.custom_pulse_data.open("w", encoding="utf-8") as f:
-            json.dump(
-                custom_pulse_data.root,
-                f,
-                indent=4,
-                ensure_ascii=False,
-                cls=CustomPulseDataJSONEncoder
+
+custom_pulse_data = CustomPulseData({})
+_custom_pulse_data_loaded = False
+
+
+def _file_stat(path: Path) -> Optional[Tuple[int, int]]:
+    """文件的修改时间与大小，文件不存在时为 ``None``"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CustomPulseDataReloader:
+    """
+    自定义波形热重载
+
+    按 ``reload_interval`` 轮询当前波形文件的修改时间与大小，文件变化后在线程池中重新读取：
+    自定义波形文件只重新校验内容发生变化的波形，未变化的波形沿用原有的 :class:`PulseWaveform` 对象；
+    波形库文件则重新映射。读取成功后整体替换 ``custom_pulse_data.root``，并调用通过 :meth:`on_reload` 注册的回调函数，
+    读取失败时保留原有的波形数据。
+    """
+
+    def __init__(self):
+        self.source: Optional[Path] = None
+        """当前读取的波形文件"""
+        self.task: Optional[asyncio.Task] = None
+        self._stat: Optional[Tuple[int, int]] = None
+        self._raw: Dict[str, Any] = {}
+        self._callbacks: List[Callable[[Mapping[str, PulseWaveform]], Any]] = []
+
+    def track(self, source: Path, raw: Dict[str, Any] = None):
+        """
+        记录当前读取的波形文件
+
+        :param source: 波形文件路径
+        :param raw: 自定义波形文件中未经校验的波形数据，用于重新读取时比较各个波形是否变化，波形库文件为 ``None``
+        """
+        self.source = source
+        self._stat = _file_stat(source)
+        self._raw = raw or {}
+
+    def on_reload(self, func: Callable[[Mapping[str, PulseWaveform]], Any]):
+        """注册重新读取波形后的回调函数，参数为新的波形数据"""
+        self._callbacks.append(func)
+        return func
+
+    def _load_changes(self, source: Path) -> Tuple[Mapping[str, PulseWaveform], Dict[str, Any], Optional[int]]:
+        """
+        重新读取波形文件
+
+        :return: 新的波形数据，自定义波形文件中未经校验的波形数据，发生变化的波形数量（波形库文件为 ``None``）
+        """
+        old_root = custom_pulse_data.root
+        if isinstance(old_root, PulseLibrary):
+            # 波形库按需读取，不逐个比较波形，以免读取整个文件
+            return PulseLibrary(source), {}, None
+        with source.open(encoding="utf-8") as f:
+            raw = json.load(f)
+        changed = {
+            name: value for name, value in raw.items()
+            if name not in old_root or self._raw.get(name) != value
+        }
+        validated = CustomPulseData.model_validate(changed).root
+        root = {name: validated[name] if name in changed else old_root[name] for name in raw}
+        return root, raw, len(changed)
+
+    async def reload(self) -> bool:
+        """
+        波形文件发生变化时重新读取
+
+        :return: 是否重新读取了波形数据
+        """
+        if self.source is None or (stat := _file_stat(self.source)) is None or stat == self._stat:
+            return False
+        self._stat = stat
+        try:
+            root, raw, changed = await asyncio.to_thread(self._load_changes, self.source)
+        except Exception as e:
+            logger.error(f"重新读取波形文件失败，继续使用原有的波形数据 - {self.source}\n{e}")
+            return False
+        removed = sum(name not in root for name in custom_pulse_data.root)
+        custom_pulse_data.root = root
+        self._raw = raw
+        if changed is None:
+            logger.success(f"已重新读取波形库文件 - {self.source}，共 {len(root)} 个波形，{removed} 个删除")
+        else:
+            logger.success(
+                f"已重新读取自定义波形文件 - {self.source}，共 {len(root)} 个波形，{changed} 个新增或修改，{removed} 个删除"
             )
+        for callback in self._callbacks:
+            try:
+                callback(root)
+            except Exception:
+                logger.exception("调用重新读取波形后的回调函数时出现了异常")
+        return True
+
+    async def watch(self):
+        """持续轮询波形文件"""
+        while True:
+            await asyncio.sleep(config.pulse_data.reload_interval)
+            await self.reload()
+
+
+custom_pulse_data_reloader = CustomPulseDataReloader()
+
+
+def load_custom_pulse_data():
+    """读取自定义波形文件，文件不存在时写入内置波形，设置了编译后的波形库时优先读取波形库"""
+    global _custom_pulse_data_loaded
+    if (compiled_pulse_data := config.pulse_data.compiled_pulse_data) and compiled_pulse_data.is_file():
+        custom_pulse_data.root = PulseLibrary(compiled_pulse_data)
+        custom_pulse_data_reloader.track(compiled_pulse_data)
+        logger.success(f"成功读取波形库文件 - {compiled_pulse_data}，共 {len(custom_pulse_data.root)} 个波形")
+    elif not config.pulse_data.custom_pulse_data.is_file():
+        raw = load_default_pulse_data()
+        custom_pulse_data.root = CustomPulseData(raw).root
+        shutil.copyfile(DEFAULT_PULSE_DATA_PATH, config.pulse_data.custom_pulse_data)
+        custom_pulse_data_reloader.track(config.pulse_data.custom_pulse_data, raw)
         logger.success(f"储存自定义波形的文件不存在，已创建，并写入了内置波形 - {config.pulse_data.custom_pulse_data}")
         with (DG_LAB_PLAY_DATA_LOCATION / CUSTOM_PULSE_DATA_SCHEMA_FILENAME).open("w", encoding="utf-8") as f:
             json.dump(
@@ -188,5 +504,27 @@ def load_custom_pulse_data():
                        f"{DG_LAB_PLAY_DATA_LOCATION / CUSTOM_PULSE_DATA_SCHEMA_FILENAME}")
     else:
         with config.pulse_data.custom_pulse_data.open(encoding="utf-8") as f:
-            custom_pulse_data.root = CustomPulseData.model_validate(json.load(f)).root
+            raw = json.load(f)
+        custom_pulse_data.root = CustomPulseData.model_validate(raw).root
+        custom_pulse_data_reloader.track(config.pulse_data.custom_pulse_data, raw)
         logger.success(f"成功读取自定义波形文件 - {config.pulse_data.custom_pulse_data}")
+    _custom_pulse_data_loaded = True
+
+
+def get_custom_pulse_data() -> CustomPulseData:
+    """获取自定义波形，尚未读取时先读取自定义波形文件"""
+    if not _custom_pulse_data_loaded:
+        load_custom_pulse_data()
+    return custom_pulse_data
+
+
+@driver.on_startup
+def preload_custom_pulse_data():
+    if not config.pulse_data.lazy_load:
+        load_custom_pulse_data()
+
+
+@driver.on_startup
+async def start_custom_pulse_data_reloader():
+    if config.pulse_data.reload_interval:
+        custom_pulse_data_reloader.task = asyncio.create_task(custom_pulse_data_reloader.watch())
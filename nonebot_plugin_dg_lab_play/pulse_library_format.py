@@ -0,0 +1,23 @@
+"""
+波形库文件格式
+
+由插件的 :class:`nonebot_plugin_dg_lab_play.model.PulseLibrary` 与 ``scripts/compile_pulse_library.py`` 共用。
+此模块不依赖 nonebot 与插件本身，以便脚本在不加载插件的情况下导入。
+
+文件格式（小端序）：
+
+- 文件头：``magic (4s) | version (H) | reserved (H) | count (I)``
+- 索引：``count`` 项，每项为 ``offset (Q) | frames (I) | name_length (H)``，后接 UTF-8 编码的波形名称
+- 波形数据：每条波形操作数据 8 字节（4 个频率值，4 个强度值），``offset`` 为相对文件开头的字节偏移
+"""
+import struct
+
+__all__ = ["MAGIC", "VERSION", "HEADER", "INDEX_ENTRY", "FRAME_SIZE"]
+
+MAGIC = b"DGPL"
+VERSION = 1
+"""文件格式版本，格式发生变化时递增"""
+HEADER = struct.Struct("<4sHHI")
+INDEX_ENTRY = struct.Struct("<QIH")
+FRAME_SIZE = 8
+"""每条波形操作数据的字节数"""
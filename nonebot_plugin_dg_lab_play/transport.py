@@ -0,0 +1,91 @@
+"""
+远程服务端连接的共享传输层
+
+DG-Lab WebSocket 协议中，服务端在连接建立时为每个 WebSocket 连接分配一个 ``clientId``，
+终端与 App 的绑定和消息转发都以连接为单位，因此无法将多个终端复用到同一个上游连接上。
+
+这里改为让所有连接远程服务端的终端共享建立连接所需的资源：
+
+- 共享同一个 :class:`ssl.SSLContext`，不再为每个连接重复加载 CA 证书
+- 缓存服务端域名的 DNS 解析结果，在 ``remote_server_dns_cache_ttl`` 内不再重复解析；
+  缓存全部解析出的地址，连接失败时轮换到下一个地址，避免一直连接无法访问的地址（如仅支持 IPv4 的主机上的 IPv6 地址）
+- 可关闭 ``permessage-deflate`` 压缩，减少每个连接占用的压缩缓冲区内存
+"""
+import asyncio
+import socket
+import ssl
+import time
+from functools import cached_property
+from typing import Optional, Dict, Any, List
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+__all__ = ["RemoteTransport"]
+
+
+class RemoteTransport:
+    """
+    远程服务端连接的共享传输设置
+
+    :param uri: 远程服务端 URI
+    :param dns_cache_ttl: DNS 解析结果的缓存时间（秒），为 ``0`` 时不缓存
+    :param compression: 是否启用 ``permessage-deflate`` 压缩
+    """
+
+    def __init__(self, uri: str, dns_cache_ttl: float = 300, compression: bool = False):
+        self.uri = uri
+        self.dns_cache_ttl = dns_cache_ttl
+        self.compression = compression
+        url = urlsplit(uri)
+        self.secure = url.scheme == "wss"
+        self.hostname = url.hostname
+        self.port = url.port or (443 if self.secure else 80)
+        self._addresses: List[str] = []
+        """缓存的服务端地址，第一个为当前使用的地址"""
+        self._resolved_at: float = 0
+        self._resolve_lock: Optional[asyncio.Lock] = None
+
+    @cached_property
+    def ssl_context(self) -> Optional[ssl.SSLContext]:
+        """所有连接共享的 SSL 上下文"""
+        return ssl.create_default_context() if self.secure else None
+
+    async def resolve(self) -> Optional[str]:
+        """
+        解析远程服务端的地址，全部地址在 ``dns_cache_ttl`` 内被缓存
+
+        :return: 当前使用的服务端 IP 地址，解析失败时为 ``None``
+        """
+        if self._resolve_lock is None:
+            self._resolve_lock = asyncio.Lock()
+        async with self._resolve_lock:
+            if self._addresses and time.monotonic() - self._resolved_at < self.dns_cache_ttl:
+                return self._addresses[0]
+            try:
+                address_info = await asyncio.get_running_loop().getaddrinfo(
+                    self.hostname, self.port, type=socket.SOCK_STREAM
+                )
+            except OSError as e:
+                logger.warning(f"解析远程服务端 {self.hostname} 的地址失败：{e!r}")
+                self._addresses = []
+                return None
+            self._addresses = list(dict.fromkeys(info[4][0] for info in address_info))
+            self._resolved_at = time.monotonic()
+            return self._addresses[0]
+
+    def invalidate(self):
+        """丢弃当前使用的地址，在连接失败后调用。之后使用缓存中的下一个地址，全部地址都已丢弃时重新解析"""
+        if self._addresses:
+            self._addresses.pop(0)
+
+    async def connect_kwargs(self) -> Dict[str, Any]:
+        """连接远程服务端时 :class:`pydglab_ws.DGLabWSConnect` 的参数"""
+        kwargs: Dict[str, Any] = {} if self.compression else {"compression": None}
+        if self.ssl_context:
+            kwargs["ssl"] = self.ssl_context
+            kwargs["server_hostname"] = self.hostname
+        if self.dns_cache_ttl and (address := await self.resolve()):
+            kwargs["host"] = address
+            kwargs["port"] = self.port
+        return kwargs
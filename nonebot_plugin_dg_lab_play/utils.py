@@ -1,11 +1,34 @@
+import asyncio
+import io
+from functools import lru_cache
 from typing import List
 
 import nonebot
+from nonebot.plugin import get_plugin_config
 
-__all__ = ["get_command_start_list"]
+from .config import Config
+
+__all__ = ["get_command_start_list", "render_qrcode", "render_qrcode_async"]
 
 nonebot_config = nonebot.get_driver().config
+config = get_plugin_config(Config).dg_lab_play
 
 
 def get_command_start_list() -> List[str]:
     return list(nonebot_config.command_start)
+
+
+@lru_cache(maxsize=config.dg_lab_client.qrcode_cache_size)
+def render_qrcode(data: str) -> bytes:
+    """生成二维码 JPEG 图片，结果按二维码内容缓存"""
+    # qrcode 与 PIL 导入较慢，在首次生成二维码时再导入
+    import qrcode
+
+    qrcode_img_bytes_io = io.BytesIO()
+    qrcode.make(data).save(qrcode_img_bytes_io, "JPEG")
+    return qrcode_img_bytes_io.getvalue()
+
+
+async def render_qrcode_async(data: str) -> bytes:
+    """在线程池中生成二维码图片，避免 PIL 编码阻塞事件循环"""
+    return await asyncio.to_thread(render_qrcode, data)
@@ -0,0 +1,480 @@
+"""
+DG-Lab WebSocket 服务端工作进程
+
+启用 ``WSServerConfig.local_server_workers`` 后，插件会以独立进程运行此脚本，每个进程运行一个
+``DGLabWSServer``，使 App 的 WebSocket 流量，以及发往 App 的消息的编码与转发不再与机器人的消息处理争抢同一个事件循环。
+
+机器人的终端是工作进程中的本地终端（``DGLabLocalClient``），机器人通过 :class:`WorkerConnection`
+以一个连接操作同一工作进程上的所有终端，而不是每个终端各自建立 WebSocket 连接。
+该连接位于工作进程在本机回环地址的随机端口上另外监听的明文、不压缩的 WebSocket 服务，不经过面向 App 的（可能启用了 SSL 的）端口。
+
+连接上的每条消息为一个 JSON 对象：
+
+- 机器人发送的请求 ``{"id": 请求 ID, "op": 操作, "client_id": 终端 ID, ...参数}``，
+  工作进程执行完毕后回复 ``{"id": 请求 ID, "result": 结果}``，出现异常时回复 ``{"id": 请求 ID, "error": 异常}``
+- 工作进程推送的终端事件 ``{"client_id": 终端 ID, "event": 事件, ...数据}``，包括终端与 App 完成绑定（``bind``）、
+  App 反馈的强度（``strength``）与按钮（``feedback``）、响应码（``ret_code``，如 App 断开），
+  以及终端因异常不再接收数据（``error``）
+
+此脚本不依赖 nonebot 与插件本身，启动完成后会向标准输出写入一行 ``READY <机器人连接端口>``，
+并在标准输入关闭（插件进程退出）时依次断开所有连接后退出。SSL 私钥密码通过环境变量 ``DG_LAB_PLAY_WORKER_SSL_PASSWORD`` 传入。
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import ssl
+import sys
+from pathlib import Path
+from typing import Optional, Dict, Any, Set, List, AsyncGenerator, Union
+from uuid import UUID
+
+from pydglab_ws import DGLabWSServer, DGLabLocalClient, StrengthData, FeedbackButton, RetCode, Channel, \
+    StrengthOperationType, PulseOperation, PulseDataTooLong, PULSE_DATA_MAX_LENGTH, dump_pulse_operation, \
+    dg_lab_client_qrcode
+from websockets.client import connect as ws_connect, WebSocketClientProtocol
+from websockets.exceptions import ConnectionClosed, ConnectionClosedError
+from websockets.server import serve as ws_serve, WebSocketServerProtocol
+
+__all__ = ["WorkerError", "WorkerConnection", "WorkerClient"]
+
+SSL_PASSWORD_ENV = "DG_LAB_PLAY_WORKER_SSL_PASSWORD"
+READY_LINE = "READY"
+BOT_HOST = "127.0.0.1"
+"""机器人连接工作进程时使用的地址"""
+CLOSE_TIMEOUT = 1
+"""退出时等待服务端处理完每个连接断开的最长时间（秒）"""
+
+
+class WorkerError(Exception):
+    """工作进程处理请求或终端接收数据时出现的异常"""
+
+
+def dump_data(data: Union[StrengthData, FeedbackButton, RetCode]) -> Dict[str, Any]:
+    """将终端收到的数据转换为终端事件"""
+    if isinstance(data, StrengthData):
+        return {"event": "strength", **data.model_dump()}
+    elif isinstance(data, FeedbackButton):
+        return {"event": "feedback", "value": data.value}
+    else:
+        return {"event": "ret_code", "value": data.value}
+
+
+def load_data(event: Dict[str, Any]) -> Union[StrengthData, FeedbackButton, RetCode]:
+    """将终端事件转换为终端收到的数据"""
+    if event["event"] == "strength":
+        return StrengthData(a=event["a"], b=event["b"], a_limit=event["a_limit"], b_limit=event["b_limit"])
+    elif event["event"] == "feedback":
+        return FeedbackButton(event["value"])
+    else:
+        return RetCode(event["value"])
+
+
+def load_pulses(compiled_post: str) -> List[PulseOperation]:
+    """将已编码为 JSON 数组的波形数据解码为波形操作数据"""
+    frames = [bytes.fromhex(frame) for frame in json.loads(compiled_post)]
+    return [(tuple(frame[:4]), tuple(frame[4:])) for frame in frames]
+
+
+class BotSession:
+    """
+    工作进程中机器人的一个连接，以及通过该连接创建的本地终端
+
+    :param server: 工作进程的服务端
+    :param websocket: 与机器人的连接
+    """
+
+    def __init__(self, server: DGLabWSServer, websocket: WebSocketServerProtocol):
+        self.server = server
+        self.websocket = websocket
+        self.clients: Dict[UUID, DGLabLocalClient] = {}
+        self._forward_tasks: Dict[UUID, asyncio.Task] = {}
+        self._request_tasks: Set[asyncio.Task] = set()
+
+    async def serve(self):
+        """处理机器人的请求，连接断开后移除所有终端"""
+        try:
+            async for frame in self.websocket:
+                task = asyncio.create_task(self._handle_request(json.loads(frame)))
+                self._request_tasks.add(task)
+                task.add_done_callback(self._request_tasks.discard)
+        except ConnectionClosedError:
+            pass
+        finally:
+            await self.close()
+
+    async def close(self):
+        """停止处理请求并移除所有终端，与终端绑定的 App 将收到终端断开的通知"""
+        for task in list(self._request_tasks):
+            task.cancel()
+        for client_id in list(self.clients):
+            await self._remove(client_id)
+
+    async def _send(self, message: Dict[str, Any]):
+        try:
+            await self.websocket.send(json.dumps(message, separators=(",", ":")))
+        except ConnectionClosed:
+            # 机器人已断开，终端将在 serve 结束时被移除
+            pass
+
+    async def _handle_request(self, request: Dict[str, Any]):
+        try:
+            client_id = UUID(request["client_id"]) if request.get("client_id") else None
+            operation = request["op"]
+            if operation == "new":
+                result = str(self._new())
+            elif operation == "remove":
+                result = await self._remove(client_id)
+            elif operation == "strength":
+                await self._bound_client(client_id).set_strength(
+                    Channel(request["channel"]),
+                    StrengthOperationType(request["operation_type"]),
+                    request["value"]
+                )
+                result = None
+            elif operation == "clear":
+                await self._bound_client(client_id).clear_pulses(Channel(request["channel"]))
+                result = None
+            elif operation == "pulses":
+                await self._bound_client(client_id).add_pulses(
+                    Channel(request["channel"]),
+                    *load_pulses(request["pulses"])
+                )
+                result = None
+            else:
+                raise ValueError(f"未知的操作 {operation}")
+        except Exception as e:
+            await self._send({"id": request.get("id"), "error": repr(e)})
+        else:
+            await self._send({"id": request.get("id"), "result": result})
+
+    def _new(self) -> UUID:
+        local_client = self.server.new_local_client()
+        self.clients[local_client.client_id] = local_client
+        self._forward_tasks[local_client.client_id] = asyncio.create_task(
+            self._forward(local_client.client_id, local_client)
+        )
+        return local_client.client_id
+
+    async def _remove(self, client_id: UUID) -> bool:
+        if task := self._forward_tasks.pop(client_id, None):
+            task.cancel()
+        if self.clients.pop(client_id, None) is None:
+            return False
+        try:
+            await self.server.remove_local_client(client_id)
+        except ConnectionClosed:
+            # App 的连接正在关闭，无需通知
+            pass
+        return True
+
+    def _bound_client(self, client_id: UUID) -> DGLabLocalClient:
+        """
+        已与 App 绑定的终端
+
+        终端未绑定时，其 ``set_strength`` 等方法会等待绑定并与转发任务争抢消息队列，因此直接拒绝请求
+        """
+        if (local_client := self.clients.get(client_id)) is None:
+            raise KeyError(f"终端 {client_id} 不存在")
+        if local_client.not_bind:
+            raise RuntimeError(f"终端 {client_id} 未与 App 绑定")
+        return local_client
+
+    async def _forward(self, client_id: UUID, local_client: DGLabLocalClient):
+        """向机器人转发终端的绑定与收到的数据，App 断开后重新等待绑定"""
+        try:
+            await local_client.ensure_bind()
+            while True:
+                await self._send({"client_id": str(client_id), "event": "bind", "target_id": str(local_client.target_id)})
+                while (data := await local_client.recv_data()) != RetCode.CLIENT_DISCONNECTED:
+                    await self._send({"client_id": str(client_id), **dump_data(data)})
+                await self._send({"client_id": str(client_id), **dump_data(data)})
+                await local_client.rebind()
+                await local_client.ensure_bind()
+        except Exception as e:
+            await self._send({"client_id": str(client_id), "event": "error", "message": repr(e)})
+
+
+async def close_connections(server: DGLabWSServer):
+    """
+    逐个断开服务端上的 WebSocket 连接，并等待服务端处理完每个连接的断开，
+    避免服务端向同时正在关闭的另一个连接发送掉线通知
+    """
+    disconnected: Dict[UUID, asyncio.Event] = {}
+
+    def on_disconnect(uuid: UUID, _):
+        if event := disconnected.get(uuid):
+            event.set()
+
+    server.add_connection_callback("disconnect", on_disconnect)
+    for uuid in server.uuid_to_ws:
+        if (websocket := server.uuid_to_ws.get(uuid)) is None:
+            continue
+        disconnected[uuid] = event = asyncio.Event()
+        await websocket.close()
+        try:
+            await asyncio.wait_for(event.wait(), CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+
+
+class WorkerConnection:
+    """
+    机器人与一个工作进程之间的连接，该工作进程上的所有终端复用此连接
+
+    :param websocket: 与工作进程的 WebSocket 连接
+    """
+
+    def __init__(self, websocket: WebSocketClientProtocol):
+        self.websocket = websocket
+        self._request_ids = itertools.count()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._event_queues: Dict[UUID, asyncio.Queue] = {}
+        """各终端尚未处理的事件，连接断开后放入 ``None``"""
+        self._receive_task = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, port: int) -> "WorkerConnection":
+        """连接工作进程在本机回环地址上监听的端口"""
+        return cls(await ws_connect(f"ws://{BOT_HOST}:{port}", compression=None, max_size=None))
+
+    @property
+    def closed(self) -> bool:
+        """与工作进程的连接是否已断开"""
+        return self._receive_task.done()
+
+    async def request(self, operation: str, client_id: UUID = None, **kwargs) -> Any:
+        """
+        请求工作进程执行操作，并等待其结果
+
+        :raise WorkerError: 工作进程执行操作时出现异常
+        :raise ConnectionError: 与工作进程的连接已断开
+        """
+        if self.closed:
+            raise ConnectionError("与工作进程的连接已断开")
+        request_id = next(self._request_ids)
+        self._pending[request_id] = future = asyncio.get_running_loop().create_future()
+        try:
+            await self.websocket.send(json.dumps(
+                {"id": request_id, "op": operation, "client_id": str(client_id) if client_id else None, **kwargs},
+                separators=(",", ":")
+            ))
+            return await future
+        except ConnectionClosed as e:
+            raise ConnectionError("与工作进程的连接已断开") from e
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def new_client(self) -> "WorkerClient":
+        """在工作进程上创建终端"""
+        client_id = UUID(await self.request("new"))
+        return WorkerClient(self, client_id, self._event_queues.setdefault(client_id, asyncio.Queue()))
+
+    async def remove_client(self, client_id: UUID):
+        """移除工作进程上的终端，与终端绑定的 App 将收到终端断开的通知"""
+        try:
+            await self.request("remove", client_id)
+        finally:
+            self._event_queues.pop(client_id, None)
+
+    async def close(self):
+        """断开与工作进程的连接，工作进程将移除通过此连接创建的所有终端"""
+        await self.websocket.close()
+        await asyncio.gather(self._receive_task, return_exceptions=True)
+
+    async def _receive(self):
+        try:
+            async for frame in self.websocket:
+                message = json.loads(frame)
+                if "id" in message:
+                    if (future := self._pending.get(message["id"])) and not future.done():
+                        if message.get("error") is not None:
+                            future.set_exception(WorkerError(message["error"]))
+                        else:
+                            future.set_result(message.get("result"))
+                else:
+                    # 终端事件可能先于创建终端的回复被处理
+                    self._event_queues.setdefault(UUID(message["client_id"]), asyncio.Queue()).put_nowait(message)
+        except ConnectionClosed:
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("与工作进程的连接已断开"))
+            for queue in self._event_queues.values():
+                queue.put_nowait(None)
+
+
+class WorkerClient:
+    """
+    工作进程上的本地终端在机器人进程中的代理，接口与 ``DGLabClient`` 一致，
+    另外可以通过 :meth:`add_compiled_pulses` 直接下发已编码的波形数据，由工作进程解码后发送
+
+    :param connection: 与终端所在工作进程的连接
+    :param client_id: 终端 ID
+    :param events: 终端事件队列
+    """
+
+    def __init__(self, connection: WorkerConnection, client_id: UUID, events: asyncio.Queue):
+        self.connection = connection
+        self._client_id = client_id
+        self._target_id: Optional[UUID] = None
+        self._events = events
+
+    @property
+    def client_id(self) -> UUID:
+        return self._client_id
+
+    @property
+    def target_id(self) -> Optional[UUID]:
+        return self._target_id
+
+    @property
+    def not_registered(self) -> bool:
+        return False
+
+    @property
+    def not_bind(self) -> bool:
+        return self._target_id is None
+
+    def get_qrcode(self, uri: str) -> Optional[str]:
+        return dg_lab_client_qrcode(uri, self._client_id) if uri is not None else None
+
+    async def _next_event(self) -> Dict[str, Any]:
+        """
+        取出下一个终端事件，绑定事件将更新 ``target_id``
+
+        :raise WorkerError: 终端在工作进程中因异常不再接收数据
+        :raise ConnectionError: 与工作进程的连接已断开
+        """
+        event = await self._events.get()
+        if event is None:
+            # 使之后的调用同样得知连接已断开
+            self._events.put_nowait(None)
+            raise ConnectionError("与工作进程的连接已断开")
+        if event["event"] == "error":
+            raise WorkerError(event["message"])
+        if event["event"] == "bind":
+            self._target_id = UUID(event["target_id"])
+        return event
+
+    async def ensure_bind(self):
+        """确保终端已完成与 App 的绑定"""
+        await self.bind()
+
+    async def bind(self) -> RetCode:
+        """等待与 DG-Lab App 的关系绑定"""
+        while self.not_bind:
+            await self._next_event()
+        return RetCode.SUCCESS
+
+    async def rebind(self) -> RetCode:
+        """清除 ``target_id``，重新等待与 DG-Lab App 的关系绑定"""
+        self._target_id = None
+        return await self.bind()
+
+    async def recv_data(self) -> Union[StrengthData, FeedbackButton, RetCode]:
+        """获取终端收到的数据"""
+        await self.ensure_bind()
+        while (event := await self._next_event())["event"] == "bind":
+            pass
+        return load_data(event)
+
+    async def data_generator(self) -> AsyncGenerator[Union[StrengthData, FeedbackButton, RetCode], Any]:
+        while True:
+            yield await self.recv_data()
+
+    async def set_strength(self, channel: Channel, operation_type: StrengthOperationType, value: int):
+        await self.ensure_bind()
+        await self.connection.request(
+            "strength",
+            self._client_id,
+            channel=channel.value,
+            operation_type=operation_type.value,
+            value=value
+        )
+
+    async def add_pulses(self, channel: Channel, *pulses: PulseOperation):
+        if len(pulses) > PULSE_DATA_MAX_LENGTH:
+            raise PulseDataTooLong(len(pulses))
+        await self.add_compiled_pulses(
+            channel,
+            json.dumps([dump_pulse_operation(pulse) for pulse in pulses], separators=(",", ":"))
+        )
+
+    async def add_compiled_pulses(self, channel: Channel, compiled_post: str):
+        """
+        下发已编码为 JSON 数组的波形数据
+
+        :param channel: 通道选择
+        :param compiled_post: 已编码为 JSON 数组的波形数据
+        """
+        await self.ensure_bind()
+        await self.connection.request("pulses", self._client_id, channel=channel.value, pulses=compiled_post)
+
+    async def clear_pulses(self, channel: Channel):
+        await self.ensure_bind()
+        await self.connection.request("clear", self._client_id, channel=channel.value)
+
+    async def close(self):
+        """移除工作进程上的终端，连接已断开时工作进程已移除了终端"""
+        try:
+            await self.connection.remove_client(self._client_id)
+        except ConnectionError:
+            pass
+
+
+def create_ssl_context(cert: Optional[Path], key: Optional[Path]) -> Optional[ssl.SSLContext]:
+    if not cert:
+        return None
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(
+        certfile=str(cert),
+        keyfile=str(key) if key else None,
+        password=os.environ.get(SSL_PASSWORD_ENV)
+    )
+    return context
+
+
+async def serve(args: argparse.Namespace):
+    loop = asyncio.get_running_loop()
+    async with DGLabWSServer(
+            args.host,
+            args.port,
+            args.heartbeat_interval,
+            ssl=create_ssl_context(args.ssl_cert, args.ssl_key)
+    ) as server:
+        sessions: Set[BotSession] = set()
+
+        async def handle_bot(websocket: WebSocketServerProtocol):
+            session = BotSession(server, websocket)
+            sessions.add(session)
+            try:
+                await session.serve()
+            finally:
+                sessions.discard(session)
+
+        async with ws_serve(handle_bot, BOT_HOST, 0, compression=None, max_size=None) as bot_server:
+            print(f"{READY_LINE} {bot_server.sockets[0].getsockname()[1]}", flush=True)
+            # 插件进程退出时标准输入将被关闭
+            await loop.run_in_executor(None, sys.stdin.read)
+            # 先移除机器人的终端并通知 App，再逐个断开连接，避免服务端关闭时向已关闭的连接发送掉线通知
+            for session in list(sessions):
+                await session.close()
+                await session.websocket.close()
+            await close_connections(server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DG-Lab WebSocket 服务端工作进程")
+    parser.add_argument("--host", required=True)
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--heartbeat-interval", type=float, default=None)
+    parser.add_argument("--ssl-cert", type=Path, default=None)
+    parser.add_argument("--ssl-key", type=Path, default=None)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
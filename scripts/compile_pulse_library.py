@@ -0,0 +1,75 @@
+"""
+将自定义波形文件（``customPulseData.json``）编译为波形库文件
+
+编译后的波形库可通过 ``PulseDataConfig.compiled_pulse_data`` 配置，插件将通过 ``mmap`` 按需读取其中的波形，
+文件格式见 ``nonebot_plugin_dg_lab_play.pulse_library_format``。
+
+用法：``python scripts/compile_pulse_library.py customPulseData.json [-o customPulseData.dgpl]``
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Any
+
+from pydantic import TypeAdapter
+from pydglab_ws import PulseOperation
+
+# 直接导入格式定义模块，而不是通过插件包导入，以免加载插件本身
+sys.path.insert(0, str(Path(__file__).parent.parent / "nonebot_plugin_dg_lab_play"))
+from pulse_library_format import MAGIC, VERSION, HEADER, INDEX_ENTRY, FRAME_SIZE  # noqa: E402
+
+_pulse_operations_adapter = TypeAdapter(List[PulseOperation])
+"""与插件读取 JSON 格式的自定义波形时相同的校验：每条波形操作数据为 4 个频率值与 4 个强度值"""
+
+
+def pack_waveform(name: str, pulses: List[Any]) -> bytes:
+    """
+    校验波形操作数据，并打包为每条 8 字节的二进制数据
+
+    :raise ValueError: 波形操作数据不是 4 个频率值与 4 个强度值，或数值超出 [0, 255]
+    """
+    try:
+        operations = _pulse_operations_adapter.validate_python(pulses)
+        return bytes(value for pulse in operations for operation in pulse for value in operation)
+    except ValueError as e:
+        raise ValueError(f"波形 {name} 的数据格式错误：{e}") from e
+
+
+def compile_pulse_library(custom_pulse_data: Dict[str, List[Any]]) -> bytes:
+    """
+    编译波形库
+
+    :param custom_pulse_data: 波形名称 -> 波形操作数据
+    :return: 波形库文件的内容
+    """
+    names = [name.encode("utf-8") for name in custom_pulse_data]
+    waveforms = [pack_waveform(name, pulses) for name, pulses in custom_pulse_data.items()]
+
+    offset = HEADER.size + sum(INDEX_ENTRY.size + len(name) for name in names)
+    index = bytearray()
+    for name, waveform in zip(names, waveforms):
+        index += INDEX_ENTRY.pack(offset, len(waveform) // FRAME_SIZE, len(name)) + name
+        offset += len(waveform)
+    return HEADER.pack(MAGIC, VERSION, 0, len(names)) + bytes(index) + b"".join(waveforms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将自定义波形文件编译为波形库文件")
+    parser.add_argument("input", type=Path, help="自定义波形文件")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="输出的波形库文件，默认为输入文件的 .dgpl 后缀版本")
+    args = parser.parse_args()
+
+    with args.input.open(encoding="utf-8") as f:
+        custom_pulse_data = json.load(f)
+    output: Path = args.output or args.input.with_suffix(".dgpl")
+    # 先写入临时文件再替换，插件正在映射的旧文件不会被截断
+    temp_output = output.with_name(f"{output.name}.tmp")
+    temp_output.write_bytes(compile_pulse_library(custom_pulse_data))
+    os.replace(temp_output, output)
+    print(f"已将 {len(custom_pulse_data)} 个波形编译到 {output}")
+
+
+if __name__ == "__main__":
+    main()
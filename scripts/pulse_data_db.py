@@ -1,9 +1,22 @@
+"""
+将 DG-Lab App 导出的波形数据（``appPulseData.json``）转换为插件的自定义波形数据
+
+转换使用 NumPy 批量完成，运行前需要安装 ``scripts`` 依赖组：``poetry install --with scripts``
+
+用法：``python scripts/pulse_data_db.py [文件或目录 ...] [-o customPulseData.json] [-j 进程数] [--split-dir 目录]``
+"""
+import argparse
+import hashlib
 import itertools
 import json
 import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
 from pathlib import Path
-from typing import List, Tuple, Any
+from typing import List, Tuple, Any, Iterable, Iterator, Deque, Dict, Set, Optional, TextIO
 
+import numpy as np
 from pydantic import BaseModel, RootModel, field_validator
 
 
@@ -74,58 +87,143 @@ class PulseDataTable(RootModel):
     root: List[PulseData]
 
 
-class CustomPulseDataJSONEncoder(json.JSONEncoder):
-    def iterencode(self, obj, *args, **kwargs):
-        if isinstance(obj, dict):
-            items = []
-            for key, value in obj.items():
-                items.append(f"\n{' ' * self.indent}{self.encode(key)}: {self.encode(value)}")
-            return '{' + ','.join(items) + '\n}'
-        else:
-            return super().iterencode(obj, *args, **kwargs)
+POINTS_FIELDS = ("BG_points1", "BG_points2", "BG_points3")
+"""以 JSON 字符串形式嵌套在波形中的节点数据字段"""
 
-    def encode(self, o: Any):
-        if isinstance(o, list) or isinstance(o, tuple):
-            return '[' + ', '.join(self.encode(element) for element in o) + ']'
-        else:
-            return super().encode(o)
+_JSON_WHITESPACE = " \t\n\r"
 
 
-def read_pulse_data_from_json(path: Path) -> List[PulseData]:
+def _decode_points(obj: Dict[str, Any]) -> Dict[str, Any]:
+    for field in POINTS_FIELDS:
+        if isinstance(value := obj.get(field), str):
+            obj[field] = json.loads(value)
+    return obj
+
+
+_pulse_data_decoder = json.JSONDecoder(object_hook=_decode_points)
+
+
+def iter_json_array(file: TextIO, decoder: json.JSONDecoder = _pulse_data_decoder, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    逐个解析并产出 JSON 文件顶层数组中的元素
+
+    文件按块读取，缓冲区中只保留尚未解析完的部分，占用的内存取决于单个元素的大小而非整个文件
+
+    :param file: JSON 文件
+    :param decoder: 解析元素使用的解码器
+    :param chunk_size: 每次读取的字符数，单个元素超出缓冲区时读取量将逐次翻倍
+    """
+    buffer, pos, eof = "", 0, False
+    read_size = chunk_size
+    expect_value = True
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = file.read(read_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+        return not eof
+
+    def skip_whitespace() -> Optional[str]:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _JSON_WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                return None
+
+    if skip_whitespace() != "[":
+        raise ValueError(f"{getattr(file, 'name', file)} 不是 JSON 数组")
+    pos += 1
+    if skip_whitespace() == "]":
+        return
+    while True:
+        if expect_value:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # 元素被截断在缓冲区末尾，读取更多数据后重试
+                if not fill():
+                    raise
+                read_size *= 2
+                continue
+            if not eof and (end == len(buffer) or buffer[end] in ".eE"):
+                # 数字在缓冲区末尾被截断后仍可能解析出一部分（如 "4." 或 "4.5e" 只解析出前面的整数或小数），
+                # 读取更多数据后重试
+                if fill():
+                    continue
+            pos, read_size, expect_value = end, chunk_size, False
+            yield value
+        separator = skip_whitespace()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"{getattr(file, 'name', file)} 的数组元素之间缺少分隔符或数组不完整")
+        pos += 1
+        skip_whitespace()
+        expect_value = True
+
+
+def iter_pulse_datas_from_json(path: Path) -> Iterator[PulseData]:
+    """逐个解析并产出 App 导出文件中的波形，节点数据在同一次解析中解码"""
     with path.open(encoding="utf-8") as f:
-        return PulseDataTable.model_validate_json(f.read()).root
+        for item in iter_json_array(f):
+            yield PulseData.model_validate(item)
+
+
+def read_pulse_data_from_json(path: Path) -> List[PulseData]:
+    return list(iter_pulse_datas_from_json(path))
+
+
+FREQUENCY_SECTIONS = ((40, 1), (15, 2), (4, 5), (10, 10), (6, 100 / 3), (4, 50), (4, 100))
+"""App 脉冲频率参数的各段：段内参数个数，每个参数对应的毫秒数"""
+
+_SECTION_BOUNDARIES = np.cumsum([count for count, _ in FREQUENCY_SECTIONS])
+_SECTION_VALUES = np.cumsum([count * multiple for count, multiple in FREQUENCY_SECTIONS])
+_SECTION_STEPS = np.array([count for count, _ in FREQUENCY_SECTIONS])
+
+MS_TO_FREQUENCY_RANGES = ((10, 100, 10, 1, 10), (101, 600, 100, 5, 100), (601, 1000, 200, 10, 600))
+"""毫秒到频率值的换算表：区间起点，区间终点，频率起点，每个频率值对应的毫秒数，毫秒起点"""
+
+
+def ms_to_frequency_array(data: np.ndarray) -> np.ndarray:
+    conditions = [(data >= low) & (data <= high) for low, high, _, _, _ in MS_TO_FREQUENCY_RANGES]
+    choices = [np.round((data - ms_start) / ms_per_value + frequency_start)
+               for _, _, frequency_start, ms_per_value, ms_start in MS_TO_FREQUENCY_RANGES]
+    return np.select(conditions, choices, 10).astype(np.int64)
+
+
+def parse_frequency_array(data: np.ndarray) -> np.ndarray:
+    section = np.minimum(np.searchsorted(_SECTION_BOUNDARIES, data, side="left"), len(FREQUENCY_SECTIONS) - 1)
+    return np.round(
+        _SECTION_VALUES[section] - (_SECTION_BOUNDARIES[section] - data) * _SECTION_STEPS[section]
+    ).astype(np.int64)
+
+
+FREQUENCY_TABLE = ms_to_frequency_array(parse_frequency_array(np.arange(_SECTION_BOUNDARIES[-1] + 1)))
+"""App 脉冲频率参数（0-83）到频率值的查找表"""
 
 
 def ms_to_frequency(data: int) -> int:
-    if 10 <= data <= 100:
-        return data
-    elif 101 <= data <= 600:
-        return round((data - 100) / 5 + 100)
-    elif 601 <= data <= 1000:
-        return round((data - 600) / 10 + 200)
-    else:
-        return 10
+    return int(ms_to_frequency_array(np.array(data)))
 
 
 def parse_frequency(data: int) -> int:
-    boundary_multiple_pair = ((40, 1), (15, 2), (4, 5), (10, 10), (6, 100 / 3), (4, 50), (4, 100))
-
-    accumulate, frequency_value, multiple = 0, 0, 0
-    for accumulate, frequency_value, multiple in zip(
-            itertools.accumulate(
-                map(lambda x: x[0], boundary_multiple_pair)
-            ),
-            itertools.accumulate(
-                map(lambda x: x[0] * x[1], boundary_multiple_pair)
-            ),
-            map(lambda x: x[0], boundary_multiple_pair)
-    ):
-        accumulate: int
-        frequency_value: float
-        multiple: float
-        if accumulate >= data:
-            break
-    return round(frequency_value - (accumulate - data) * multiple)
+    return int(parse_frequency_array(np.array(data)))
+
+
+def frequency_of(data: np.ndarray) -> np.ndarray:
+    """App 脉冲频率参数对应的频率值"""
+    in_table = (data >= 0) & (data < len(FREQUENCY_TABLE))
+    return np.where(
+        in_table,
+        FREQUENCY_TABLE[np.where(in_table, data, 0)],
+        ms_to_frequency_array(parse_frequency_array(data))
+    )
 
 
 def parse_part_time(data: int) -> int:
@@ -156,203 +254,289 @@ def parse_sleep_time(data: int) -> float:
     return (data // 10) / 10
 
 
-def parse_strength_data(data: float) -> int:
-    return round((100 / 20) * data)
+def parse_strength_data(data: np.ndarray) -> np.ndarray:
+    return np.round((100 / 20) * data).astype(np.int64)
 
 
-def get_each_x_y(x_range: Tuple[int, int], y_range: Tuple[float, float]) -> List[Tuple[int, float]]:
-    x_start, x_end = x_range
-    y_start, y_end = y_range
+Operation = Tuple[Tuple[int, ...], Tuple[int, ...]]
 
-    results = {}
-    for x in range(x_end - 1):
-        y = y_start + (y_end - y_start) * (x - x_start) / (x_end - x_start)
-        results[x] = y
-    results[x_end - 1] = y_end
 
-    return list(results.items())
+def rows_to_tuples(array: np.ndarray) -> List[Tuple[int, ...]]:
+    """将二维数组的每一行转换为元组，相同的行共享同一个元组对象，避免为每一行创建新的对象"""
+    if not len(array):
+        return []
+    low, base = array.min(), array.max() - array.min() + 1
+    if int(base) ** array.shape[1] < 2 ** 62:
+        # 将每一行编码为一个整数，比按行去重快得多
+        keys = ((array - low) * base ** np.arange(array.shape[1])).sum(axis=1)
+        _, index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        unique = array[index]
+    else:
+        unique, inverse = np.unique(array, axis=0, return_inverse=True)
+    rows = [tuple(row) for row in unique.tolist()]
+    return list(map(rows.__getitem__, inverse.ravel().tolist()))
 
 
-def generate_static_frequency(point_num: int, ax: int, _: int, __: int) -> List[Tuple[int, ...]]:
-    frequency = ms_to_frequency(parse_frequency(ax))
+def generate_operations_from_sleep(sleep_time: float) -> List[Operation]:
     return [
-        tuple(frequency for _ in range(4)) for __ in range(point_num)
+        ((0, 0, 0, 0), (0, 0, 0, 0)) for _ in range(
+            round(sleep_time * 1000 / 100)
+        )
     ]
 
 
-def generate_part_frequency(point_num: int, ax: int, bx: int, _: int) -> List[Tuple[int, ...]]:
-    frequency_a = ms_to_frequency(parse_frequency(ax))
-    frequency_b = ms_to_frequency(parse_frequency(bx))
-    frequencies = list(
-        map(
-            lambda x: round(x[1]),
-            get_each_x_y(
-                (0, point_num * 4),
-                (frequency_a, frequency_b)
-            )
-        )
-    )
-    return [
-        tuple(frequencies[i:i + 4]) for i in range(0, len(frequencies), 4)
-    ]
+def generate_frequency(
+        pcx: np.ndarray,
+        point_num: np.ndarray,
+        ax: np.ndarray,
+        bx: np.ndarray,
+        cx: np.ndarray,
+        section_of_point: np.ndarray,
+        index_in_section: np.ndarray
+) -> np.ndarray:
+    """
+    批量生成所有小节中各个点的频率
 
+    ``pcx`` 等参数为每个小节一项，``section_of_point``, ``index_in_section`` 为每个点一项。
+    脉冲频率变化规律 ``pcx``：1 固定，2 节内渐变，3 元内渐变，4 元间渐变，
+    均为从 ``ax`` 的频率线性插值到 ``bx``（节内渐变）或 ``cx`` 的频率，最后一个值固定为终点频率。
 
-def generate_inside_point_frequency(point_num: int, ax: int, _: int, cx: int) -> List[Tuple[int, ...]]:
-    frequency_a = ms_to_frequency(parse_frequency(ax))
-    frequency_c = ms_to_frequency(parse_frequency(cx))
-    frequencies_inside_point = list(
-        map(
-            lambda x: round(x[1]),
-            get_each_x_y(
-                (0, 4),
-                (frequency_a, frequency_c)
-            )
-        )
-    )
-    return [
-        tuple(frequency for frequency in frequencies_inside_point) for __ in range(point_num)
-    ]
+    :return: 形状为 ``(点数, 4)`` 的数组
+    """
+    if not np.isin(pcx, (1, 2, 3, 4)).all():
+        raise KeyError(f"未知的脉冲频率变化规律 {pcx[~np.isin(pcx, (1, 2, 3, 4))]}")
+    mode = pcx[section_of_point][:, np.newaxis]
+    n = point_num[section_of_point][:, np.newaxis]
+    i = index_in_section[:, np.newaxis]
+    j = np.arange(4)[np.newaxis, :]
+    start = frequency_of(ax)[section_of_point][:, np.newaxis]
+    end = np.where(mode == 1, start, frequency_of(np.where(pcx == 2, bx, cx))[section_of_point][:, np.newaxis])
+
+    # 插值的位置与插值的总数
+    k = np.select([mode == 2, mode == 3, mode == 4], [i * 4 + j, j + 0 * i, i + 0 * j], 0)
+    count = np.select([mode == 2, mode == 3, mode == 4], [n * 4, 4 + 0 * n, n], 1)
+    return np.where(k == count - 1, end, np.round(start + (end - start) * k / count)).astype(np.int64)
+
+
+def generate_strength(
+        x: np.ndarray,
+        y: np.ndarray,
+        anchor: np.ndarray,
+        previous: np.ndarray
+) -> Tuple[List[Tuple[int, ...]], np.ndarray]:
+    """
+    批量生成所有点的强度
 
+    锚点为 4 个相同的强度值；非锚点从上一个点（小节中第一个点的上一个点为最后一个点）的强度插值，每个 x 单位 4 个值，
+    x 未增加的非锚点只有一个强度值
 
-def generate_point_each_frequency(point_num: int, ax: int, _: int, cx: int) -> List[Tuple[int, ...]]:
-    frequency_a = ms_to_frequency(parse_frequency(ax))
-    frequency_c = ms_to_frequency(parse_frequency(cx))
-    frequencies_for_points = list(
-        map(
-            lambda x: round(x[1]),
-            get_each_x_y(
-                (0, point_num),
-                (frequency_a, frequency_c)
-            )
-        )
-    )
-    return [
-        tuple(frequency for _ in range(4)) for frequency in frequencies_for_points
+    :param previous: 每个点的上一个点的下标
+    :return: 强度数据，以及每个点生成的强度数据条数
+    """
+    strength = parse_strength_data(y)
+    span = (x - x[previous]) * 4
+    counts = np.where(anchor, 4, np.maximum(span, 1))
+
+    owner = np.repeat(np.arange(len(x)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    start, end = strength[previous][owner], strength[owner]
+    is_end = anchor[owner] | (offsets == counts[owner] - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.where(is_end, end, np.round(start + (end - start) * offsets / span[owner])).astype(np.int64)
+
+    frames_per_point = (counts + 3) // 4
+    if not (counts % 4).any():
+        return rows_to_tuples(values.reshape(-1, 4)), frames_per_point
+    strength_data = []
+    for point_values in np.split(values, np.cumsum(counts)[:-1]):
+        strength_data.extend(tuple(point_values[i:i + 4].tolist()) for i in range(0, len(point_values), 4))
+    return strength_data, frames_per_point
+
+
+def generate_results_from_pulse_datas(pulse_datas: List[PulseData]) -> List[List[Operation]]:
+    """将多个 App 波形转换为波形操作数据，所有小节的所有点在同一批数组运算中完成插值"""
+    sections = [
+        (index, getattr(pulse_data, f"BG_A{i}"), getattr(pulse_data, f"BG_B{i}"), getattr(pulse_data, f"BG_C{i}"),
+         getattr(pulse_data, f"BG_PC{i}"), getattr(pulse_data, f"BG_J{i}"), getattr(pulse_data, f"BG_points{i + 1}"))
+        for index, pulse_data in enumerate(pulse_datas)
+        for i in range(3)
+        if i == 0 or getattr(pulse_data, f"BG_JIE{i}")
     ]
+    results: List[List[Operation]] = [[] for _ in pulse_datas]
+    if not sections:
+        return results
+    ax, bx, cx, pcx = (np.array(column, dtype=np.int64) for column in list(zip(*sections))[1:5])
+    point_num = np.array([len(section[6]) for section in sections], dtype=np.int64)
+    section_of_point = np.repeat(np.arange(len(sections)), point_num)
+    point_start = np.cumsum(point_num) - point_num
+    index_in_section = np.arange(point_num.sum()) - point_start[section_of_point]
+
+    points = [point for section in sections for point in section[6]]
+    x = np.array([point.x for point in points], dtype=np.int64)
+    y = np.array([point.y for point in points], dtype=np.float64)
+    anchor = np.array([point.anchor for point in points], dtype=bool)
+    previous = np.arange(len(points)) - 1
+    not_empty = point_num > 0
+    previous[point_start[not_empty]] = (point_start + point_num - 1)[not_empty]
+
+    frequencies = rows_to_tuples(generate_frequency(pcx, point_num, ax, bx, cx, section_of_point, index_in_section))
+    strength, frames_per_point = generate_strength(x, y, anchor, previous)
+    strength_start = np.concatenate(([0], np.cumsum(frames_per_point)))[point_start].tolist()
+    strength_end = np.concatenate(([0], np.cumsum(frames_per_point)))[point_start + point_num].tolist()
+
+    for (index, _, _, _, _, jx, point_datas), first_point, strength_first, strength_last in zip(
+            sections, point_start.tolist(), strength_start, strength_end
+    ):
+        operations = list(zip(
+            frequencies[first_point:first_point + len(point_datas)],
+            strength[strength_first:strength_last]
+        ))
+        repeat = math.ceil(parse_part_time(jx) / len(point_datas) * 0.1)
+        results[index].extend(operations * repeat)
+    for pulse_data, result in zip(pulse_datas, results):
+        result.extend(generate_operations_from_sleep(parse_sleep_time(pulse_data.BG_L)))
+    return results
 
 
-def generate_frequency(pcx: int, point_num: int, ax: int, bx: int, cx: int) -> List[Tuple[int, ...]]:
-    type_to_func = {
-        1: generate_static_frequency,
-        2: generate_part_frequency,
-        3: generate_inside_point_frequency,
-        4: generate_point_each_frequency
-    }
-    return type_to_func[pcx](point_num, ax, bx, cx)
-
+def generate_result_from_pulse_data(pulse_data: PulseData) -> List[Operation]:
+    return generate_results_from_pulse_datas([pulse_data])[0]
 
-def generate_strength_from_strength(strength: List[int]) -> List[Tuple[int, ...]]:
-    return [
-        tuple(strength[i:i + 4]) for i in range(0, len(strength), 4)
-    ]
 
+def iter_input_files(paths: Iterable[Path], exclude: Iterable[Path] = ()) -> Iterator[Path]:
+    """
+    展开输入路径，目录将递归查找其中的 ``.json`` 文件
 
-def generate_strength(point_datas: List[PointData]) -> List[Tuple[int, ...]]:
-    strength_data = []
-    for index, point in enumerate(point_datas):
-        index: int
-        point: PointData
-        current_strength = parse_strength_data(point.y)
-        if point.anchor:
-            strength_data.append(
-                tuple(current_strength for _ in range(4))
+    :param exclude: 查找目录时跳过的文件或目录，用于排除脚本自身的输出
+    """
+    exclude = [path.resolve() for path in exclude]
+    for path in paths:
+        if path.is_dir():
+            yield from (
+                file for file in sorted(path.rglob("*.json"))
+                if not any(file.resolve() == excluded or excluded in file.resolve().parents for excluded in exclude)
             )
         else:
-            last_point = point_datas[index - 1]
-            last_strength = parse_strength_data(last_point.y)
-            strength_data.extend(
-                generate_strength_from_strength(
-                    list(
-                        map(
-                            lambda x: round(x[1]),
-                            get_each_x_y(
-                                (0, (point.x - last_point.x) * 4),
-                                (last_strength, current_strength)
-                            )
-                        )
-                    )
-                )
-            )
-    return strength_data
+            yield path
+
+
+def iter_raw_pulse_datas(paths: Iterable[Path], exclude: Iterable[Path] = ()) -> Iterator[Dict[str, Any]]:
+    """逐个产出输入文件中未经校验的 App 波形，校验交由转换进程完成"""
+    for path in iter_input_files(paths, exclude):
+        with path.open(encoding="utf-8") as f:
+            yield from iter_json_array(f)
 
 
-def generate_operations_from_sleep(sleep_time: float) -> List[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+def iter_batches(items: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def convert_batch(items: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """校验并转换一批 App 波形，返回波形名称与 JSON 编码后的转换结果"""
+    pulse_datas = PulseDataTable.model_validate(items).root
     return [
-        ((0, 0, 0, 0), (0, 0, 0, 0)) for _ in range(
-            round(sleep_time * 1000 / 100)
-        )
+        (pulse_data.BG_waveName, json.dumps(result))
+        for pulse_data, result in zip(pulse_datas, generate_results_from_pulse_datas(pulse_datas))
     ]
 
 
-def generate_operations_from_part(
-        ax: int,
-        bx: int,
-        cx: int,
-        pcx: int,
-        jx: int,
-        point_datas: List[PointData]
-) -> List[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
-    frequencies = generate_frequency(pcx, len(point_datas), ax, bx, cx)
-    strength = generate_strength(point_datas)
-    operations = list(zip(frequencies, strength))
-    repeat = math.ceil(parse_part_time(jx) / len(point_datas) * 0.1)
-    return operations * repeat
-
-
-def generate_result_from_pulse_data(pulse_data: PulseData) -> List[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
-    operations = generate_operations_from_part(
-        pulse_data.BG_A0,
-        pulse_data.BG_B0,
-        pulse_data.BG_C0,
-        pulse_data.BG_PC0,
-        pulse_data.BG_J0,
-        pulse_data.BG_points1
-    )
-    if pulse_data.BG_JIE1:
-        operations.extend(
-            generate_operations_from_part(
-                pulse_data.BG_A1,
-                pulse_data.BG_B1,
-                pulse_data.BG_C1,
-                pulse_data.BG_PC1,
-                pulse_data.BG_J1,
-                pulse_data.BG_points2
-            )
-        )
-    if pulse_data.BG_JIE2:
-        operations.extend(
-            generate_operations_from_part(
-                pulse_data.BG_A2,
-                pulse_data.BG_B2,
-                pulse_data.BG_C2,
-                pulse_data.BG_PC2,
-                pulse_data.BG_J2,
-                pulse_data.BG_points3
-            )
-        )
-    operations.extend(
-        generate_operations_from_sleep(
-            parse_sleep_time(pulse_data.BG_L)
-        )
-    )
-    return operations
+def iter_converted(items: Iterable[Dict[str, Any]], jobs: int, batch_size: int) -> Iterator[Tuple[str, str]]:
+    """
+    分批校验并转换波形，``jobs`` 大于 1 时使用进程池并行转换
 
+    同时提交的批次不超过 ``jobs * 2`` 个，结果按输入顺序逐个产出
+    """
+    batches = iter_batches(items, batch_size)
+    if jobs <= 1:
+        for batch in batches:
+            yield from convert_batch(batch)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending: Deque[Future] = deque()
+        for batch in itertools.chain(batches, [None]):
+            if batch is not None:
+                pending.append(executor.submit(convert_batch, batch))
+            while pending and (batch is None or len(pending) >= jobs * 2):
+                yield from pending.popleft().result()
+
+
+class CustomPulseDataWriter:
+    """
+    逐个写入波形的自定义波形文件，每个波形占一行，与插件写入的自定义波形文件格式一致
 
-def main():
-    pulse_datas = read_pulse_data_from_json(
-        Path("appPulseData.json")
-    )
-    custom_pulse_data = {}
-    for pulse_data in pulse_datas:
-        result = generate_result_from_pulse_data(pulse_data)
-        with Path(f"{pulse_data.BG_waveName}.json").open("w", encoding="utf-8") as file:
-            json.dump(result, file)
-        custom_pulse_data[pulse_data.BG_waveName] = result
+    波形按转换结果的内容哈希去重，内容相同的波形只保留第一个；名称相同但内容不同的波形将添加 ``-2``, ``-3`` 等后缀
+    """
+
+    def __init__(self, file: TextIO, indent: int = 4):
+        self.file = file
+        self.indent = indent
+        self.hash_to_name: Dict[str, str] = {}
+        self.names: Set[str] = set()
+        self.duplicates = 0
+
+    def __enter__(self) -> "CustomPulseDataWriter":
+        self.file.write("{")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.file.write("\n}")
+
+    def write(self, name: str, encoded: str) -> Optional[str]:
+        """
+        写入波形
+
+        :param name: 波形名称
+        :param encoded: JSON 编码后的波形操作数据
+        :return: 写入时使用的名称，内容重复而未写入时为 ``None``
+        """
+        digest = hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+        if digest in self.hash_to_name:
+            self.duplicates += 1
+            return None
+        unique_name, suffix = name, 1
+        while unique_name in self.names:
+            suffix += 1
+            unique_name = f"{name}-{suffix}"
+        separator = "," if self.names else ""
+        self.file.write(f"{separator}\n{' ' * self.indent}{json.dumps(unique_name, ensure_ascii=False)}: {encoded}")
+        self.hash_to_name[digest] = unique_name
+        self.names.add(unique_name)
+        return unique_name
 
-    with Path("customPulseData.json").open("w", encoding="utf-8") as f:
-        json.dump(custom_pulse_data, f, indent=4, ensure_ascii=False, cls=CustomPulseDataJSONEncoder)
 
-    print(custom_pulse_data)
+def main():
+    parser = argparse.ArgumentParser(description="将 DG-Lab App 导出的波形数据转换为插件的自定义波形数据")
+    parser.add_argument(
+        "inputs", type=Path, nargs="*", default=[Path("appPulseData.json")],
+        help="App 导出的波形数据文件或包含这些文件的目录，默认为 appPulseData.json"
+    )
+    parser.add_argument("-o", "--output", type=Path, default=Path("customPulseData.json"), help="合并后的自定义波形文件")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="并行转换的进程数")
+    parser.add_argument("--batch-size", type=int, default=256, help="每个进程每次转换的波形数量")
+    parser.add_argument("--split-dir", type=Path, default=None, help="同时将每个波形写入此目录下的单独文件")
+    args = parser.parse_args()
+
+    if args.split_dir:
+        args.split_dir.mkdir(parents=True, exist_ok=True)
+    raw_pulse_datas = iter_raw_pulse_datas(args.inputs, [args.output, *filter(None, [args.split_dir])])
+    # 先写入临时文件，全部转换成功后再替换，转换失败时不会留下不完整的输出文件
+    temp_output = args.output.with_name(f"{args.output.name}.tmp")
+    try:
+        with temp_output.open("w", encoding="utf-8") as f, CustomPulseDataWriter(f) as writer:
+            for name, encoded in iter_converted(raw_pulse_datas, args.jobs, args.batch_size):
+                if (name := writer.write(name, encoded)) and args.split_dir:
+                    (args.split_dir / f"{name}.json").write_text(encoded, encoding="utf-8")
+        os.replace(temp_output, args.output)
+    finally:
+        temp_output.unlink(missing_ok=True)
+
+    print(f"已将 {len(writer.names)} 个波形写入 {args.output}，跳过了 {writer.duplicates} 个内容重复的波形")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,506 @@
+"""性能基准测试
+
+模拟大量已绑定 App 的终端，测量波形发送任务、强度控制指令与波形转换脚本的性能，用于在发布新版本前发现性能退化。
+
+默认情况下终端使用 ``DGLabLocalClient``，下发的消息直接交给模拟的 App（:class:`LocalFakeApp`）处理，不经过网络与 WebSocket 服务端。
+指定 ``--server`` 时，将按插件配置启动本地服务端（机器人进程内，或 ``local_server_workers`` 个工作进程），
+模拟的 App（:class:`WebSocketFakeApp`）在独立的进程中扫描终端的二维码并通过 WebSocket 连接服务端，
+用于对比两种服务端运行方式下机器人进程的负载。
+模拟的 App 按每秒 10 条的速度消耗各通道的波形队列，记录队列在两次补充之间被播放完（欠载）和超出 50 秒被丢弃（溢出）的情况。
+
+输出的指标：
+
+- 内存：创建终端并设置波形任务后平均每个终端增加的内存
+- ``setup_pulse_job``：设置波形任务的耗时
+- 波形补充抖动：波形发送任务实际执行时间相对于预定时间的延迟
+- 队列欠载、溢出次数，以及每秒下发的消息数
+- 指令延迟：``strength_control`` 从调用到回复的耗时分位数
+- 机器人进程 CPU 占用：测量期间机器人进程占用的 CPU 时间与经过时间之比，不包括工作进程与 ``--server`` 时模拟的 App 进程
+- 波形转换：``scripts/pulse_data_db.py`` 每秒转换的 App 波形数，未安装 numpy 时跳过
+
+用法：``python tests/benchmark.py [-n 终端数] [-t 持续时间] [--command-rate 每秒指令数] [--server] [--json 结果文件]``
+
+插件配置可通过环境变量调整，例如 ``DG_LAB_PLAY__PULSE_DATA__QUEUE_DURATION=5``。
+对比工作进程与机器人进程内的服务端时，分别运行
+``python tests/benchmark.py --server`` 与 ``DG_LAB_PLAY__WS_SERVER__LOCAL_SERVER_WORKERS=2 python tests/benchmark.py --server``。
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import multiprocessing
+import random
+import ssl
+import statistics
+import sys
+import time
+import tracemalloc
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import List, Dict, Optional, Any
+from uuid import uuid4, UUID
+
+import nonebot
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+nonebot.init(driver="~none", log_level="WARNING")
+nonebot.load_plugin("nonebot_plugin_dg_lab_play")
+
+from nonebot.exception import FinishedException  # noqa: E402
+from nonebot_plugin_alconna import At, Match  # noqa: E402
+from pydglab_ws import DGLabLocalClient, Channel, StrengthOperationType, MessageType, RetCode, \
+    MessageDataHead  # noqa: E402
+from pydglab_ws.models import WebSocketMessage  # noqa: E402
+from websockets.client import connect as ws_connect, WebSocketClientProtocol  # noqa: E402
+from websockets.exceptions import ConnectionClosed  # noqa: E402
+
+from nonebot_plugin_dg_lab_play.client_manager import client_manager, DGLabPlayClient, \
+    APP_PULSE_QUEUE_LEN  # noqa: E402
+from nonebot_plugin_dg_lab_play.model import CustomPulseData, PulseLoop  # noqa: E402
+
+client_manager_module = importlib.import_module("nonebot_plugin_dg_lab_play.client_manager")
+strength_control_module = importlib.import_module("nonebot_plugin_dg_lab_play.commands.strength_control")
+
+STRENGTH_LIMIT = 100
+
+
+class BenchmarkStats:
+    """模拟的 App 共同记录的统计数据"""
+
+    def __init__(self):
+        self.messages = 0
+        self.posts = 0
+        self.underruns = 0
+        self.underrun_time: float = 0
+        self.overflow_frames = 0
+        self.lags: List[float] = []
+
+    def reset(self):
+        self.__init__()
+
+    def app_stats(self) -> Dict[str, Any]:
+        """由模拟的 App 记录的统计数据，``--server`` 时由模拟的 App 进程传回"""
+        return {key: value for key, value in vars(self).items() if key != "lags"}
+
+
+class FakeApp:
+    """
+    模拟的 DG-Lab App，由子类实现与终端之间的消息传递
+
+    :param stats: 统计数据
+    """
+
+    def __init__(self, stats: BenchmarkStats):
+        self.stats = stats
+        self.client_id: Optional[UUID] = None
+        self.target_id: Optional[UUID] = None
+        self.strength = {Channel.A: 0, Channel.B: 0}
+        self.drain_time: Dict[Channel, float] = {}
+        """各通道波形队列预计被播放完毕的时间，队列被清空后没有记录"""
+
+    async def send(self, message: WebSocketMessage):
+        """向终端发送消息"""
+        raise NotImplementedError
+
+    def _message(self, msg_type: MessageType, message: Any) -> WebSocketMessage:
+        return WebSocketMessage(type=msg_type, client_id=self.client_id, target_id=self.target_id, message=message)
+
+    def _strength_message(self) -> WebSocketMessage:
+        return self._message(
+            MessageType.MSG,
+            f"{MessageDataHead.STRENGTH.value}-{self.strength[Channel.A]}+{self.strength[Channel.B]}"
+            f"+{STRENGTH_LIMIT}+{STRENGTH_LIMIT}"
+        )
+
+    async def receive(self, message: WebSocketMessage):
+        self.stats.messages += 1
+        head, _, data = message.message.partition("-")
+        if head == MessageDataHead.PULSE.value:
+            self._receive_pulses(Channel[data[0]], data.count(",") + 1)
+        elif head == MessageDataHead.CLEAR.value:
+            self.drain_time.pop(Channel(int(data)), None)
+        elif head == MessageDataHead.STRENGTH.value:
+            channel, operation_type, value = map(int, data.split("+"))
+            channel = Channel(channel)
+            if operation_type == StrengthOperationType.DECREASE:
+                value = self.strength[channel] - value
+            elif operation_type == StrengthOperationType.INCREASE:
+                value = self.strength[channel] + value
+            self.strength[channel] = min(max(value, 0), STRENGTH_LIMIT)
+            await self.send(self._strength_message())
+
+    def _receive_pulses(self, channel: Channel, length: int):
+        now = time.monotonic()
+        self.stats.posts += 1
+        drain_time = self.drain_time.get(channel)
+        if drain_time is not None and drain_time < now:
+            self.stats.underruns += 1
+            self.stats.underrun_time += now - drain_time
+        drain_time = max(now, drain_time or now) + length * 0.1
+        if drain_time - now > APP_PULSE_QUEUE_LEN:
+            self.stats.overflow_frames += round((drain_time - now - APP_PULSE_QUEUE_LEN) * 10)
+            drain_time = now + APP_PULSE_QUEUE_LEN
+        self.drain_time[channel] = drain_time
+
+
+class LocalFakeApp(FakeApp):
+    """与一个本地终端直接交换消息的模拟 App，不经过网络与 WebSocket 服务端"""
+
+    def __init__(self, stats: BenchmarkStats):
+        super().__init__(stats)
+        self.client_id = uuid4()
+        self.target_id = uuid4()
+        self.queue: Optional[asyncio.Queue] = None
+        self.client = DGLabLocalClient(self.client_id, self.receive, self._set_queue)
+        self.queue.put_nowait(self._message(MessageType.BIND, RetCode.SUCCESS))
+        self.queue.put_nowait(self._strength_message())
+
+    def _set_queue(self, _, queue: asyncio.Queue):
+        self.queue = queue
+
+    async def send(self, message: WebSocketMessage):
+        await self.queue.put(message)
+
+
+class WebSocketFakeApp(FakeApp):
+    """扫描终端的二维码，通过 WebSocket 连接服务端并与终端绑定的模拟 App"""
+
+    def __init__(self, stats: BenchmarkStats):
+        super().__init__(stats)
+        self.websocket: Optional[WebSocketClientProtocol] = None
+        self.receive_task: Optional[asyncio.Task] = None
+
+    async def connect(self, qrcode: str):
+        # 二维码内容的最后一段为 服务端 URI/终端 ID
+        uri = qrcode.rsplit("#", 1)[1]
+        self.client_id = UUID(uri.rsplit("/", 1)[1])
+        ssl_context = None
+        if uri.startswith("wss://"):
+            # 测试时服务端通常使用自签名证书
+            ssl_context = ssl.create_default_context()
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+        self.websocket = await ws_connect(uri, ssl=ssl_context)
+        # 服务端首先下发 App 自身的 ID
+        self.target_id = WebSocketMessage.model_validate_json(await self.websocket.recv()).client_id
+        await self.send(self._message(MessageType.BIND, MessageDataHead.DG_LAB))
+        self.receive_task = asyncio.create_task(self._receive_forever())
+
+    async def _receive_forever(self):
+        try:
+            async for data in self.websocket:
+                message = WebSocketMessage.model_validate_json(data)
+                if message.type == MessageType.BIND and message.message == RetCode.SUCCESS:
+                    await self.send(self._strength_message())
+                elif message.type == MessageType.MSG and isinstance(message.message, str):
+                    await self.receive(message)
+        except ConnectionClosed:
+            # 测试结束时终端先被摧毁
+            pass
+
+    async def send(self, message: WebSocketMessage):
+        await self.websocket.send(message.model_dump_json(by_alias=True))
+
+    async def close(self):
+        await self.websocket.close()
+        await self.receive_task
+
+
+async def serve_fake_apps(connection: Connection):
+    """
+    模拟的 App 进程：依次接收各终端的二维码并连接服务端，完成后回复 ``None``；
+    再次收到消息时开始统计，第三次收到消息时回复统计数据并退出
+    """
+    loop = asyncio.get_running_loop()
+    stats = BenchmarkStats()
+    apps = []
+    for qrcode in await loop.run_in_executor(None, connection.recv):
+        app = WebSocketFakeApp(stats)
+        await app.connect(qrcode)
+        apps.append(app)
+    connection.send(None)
+    await loop.run_in_executor(None, connection.recv)
+    stats.reset()
+    await loop.run_in_executor(None, connection.recv)
+    connection.send(stats.app_stats())
+    for app in apps:
+        await app.close()
+
+
+def run_fake_apps(connection: Connection):
+    asyncio.run(serve_fake_apps(connection))
+
+
+class FakeMessageFactory:
+    """代替 ``MessageFactory``，不实际发送回复"""
+
+    def __init__(self, message: str):
+        self.message = message
+
+    async def finish(self, **_):
+        raise FinishedException
+
+
+def percentiles(data: List[float]) -> Dict[str, float]:
+    if len(data) < 2:
+        data = data * 2 or [0, 0]
+    quantiles = statistics.quantiles(data, n=100, method="inclusive")
+    return {"p50": quantiles[49], "p90": quantiles[89], "p99": quantiles[98], "max": max(data)}
+
+
+def format_ms(values: Dict[str, float]) -> str:
+    return ", ".join(f"{key} {value * 1000:.2f}ms" for key, value in values.items())
+
+
+async def bind_client(user_id: str, stats: BenchmarkStats) -> DGLabPlayClient:
+    """与 ``ClientManager.new_client`` 相同的方式创建终端，并等待其与模拟的 App 完成绑定"""
+    async with DGLabPlayClient(
+            user_id,
+            client_manager.registry.remove,
+            LocalFakeApp(stats).client,
+            client_manager.registry.update
+    ) as play_client:
+        pass
+    client_manager.registry.add(play_client)
+    async with play_client.bind_finished_lock:
+        pass
+    return play_client
+
+
+def random_pulse_loop(pulse_data: Dict[str, Any]) -> PulseLoop:
+    name = random.choice(list(pulse_data))
+    return PulseLoop.of(name, pulse_data[name])
+
+
+async def setup_clients(count: int, stats: BenchmarkStats, pulse_data: Dict[str, Any]) -> List[DGLabPlayClient]:
+    play_clients = list(await asyncio.gather(*(bind_client(f"user{i}", stats) for i in range(count))))
+    for play_client in play_clients:
+        play_client.setup_pulse_job(random_pulse_loop(pulse_data), Channel.A, Channel.B)
+    return play_clients
+
+
+async def destroy_clients(play_clients: List[DGLabPlayClient]):
+    for play_client in play_clients:
+        await play_client.destroy()
+    # 等待调度器丢弃已失效的任务
+    await asyncio.sleep(0.1)
+
+
+async def benchmark_memory(count: int, pulse_data: Dict[str, Any]) -> Dict[str, float]:
+    """创建终端并设置波形任务，按 tracemalloc 统计平均每个终端增加的内存"""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    play_clients = await setup_clients(count, BenchmarkStats(), pulse_data)
+    # 等待首次波形发送完成
+    await asyncio.sleep(0.5)
+    per_client = (tracemalloc.get_traced_memory()[0] - base) / count
+    tracemalloc.stop()
+    await destroy_clients(play_clients)
+    return {"bytes_per_client": per_client}
+
+
+def benchmark_setup_pulse_job(play_clients: List[DGLabPlayClient], pulse_data: Dict[str, Any]) -> List[float]:
+    durations = []
+    for play_client in play_clients:
+        pulse_loop = random_pulse_loop(pulse_data)
+        start = time.perf_counter()
+        play_client.setup_pulse_job(pulse_loop, Channel.A, Channel.B)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+async def run_commands(play_clients: List[DGLabPlayClient], rate: float, duration: float) -> List[float]:
+    """以固定速率对随机终端执行强度控制指令，返回各指令的耗时"""
+    latencies: List[float] = []
+    modes = [StrengthOperationType.INCREASE, StrengthOperationType.DECREASE, StrengthOperationType.SET_TO]
+
+    async def command(play_client: DGLabPlayClient):
+        start = time.perf_counter()
+        try:
+            await strength_control_module.strength_control(
+                random.choice(modes),
+                Match(At("user", play_client.user_id), True),
+                Match(float(random.randint(1, 100)), True)
+            )
+        except FinishedException:
+            pass
+        latencies.append(time.perf_counter() - start)
+
+    tasks = []
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for i in range(int(rate * duration)):
+        await asyncio.sleep(max(0.0, start + i / rate - loop.time()))
+        tasks.append(asyncio.create_task(command(random.choice(play_clients))))
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+def record_refill_lags(lags: List[float]):
+    """记录波形发送调度器每批任务相对于到期时间的延迟"""
+    histogram = client_manager_module.pulse_refill_lag
+    observe = histogram.observe
+
+    def record(value: float, **labels: str):
+        lags.append(value)
+        observe(value, **labels)
+
+    histogram.observe = record
+
+
+async def start_server() -> str:
+    """按插件配置启动本地服务端，等待其能够创建终端，返回服务端的运行方式"""
+    client_manager.serve()
+    while not client_manager.ws_server and not (client_manager.workers and all(client_manager.workers)):
+        if client_manager.ws_server_task.done():
+            raise RuntimeError("本地服务端启动失败")
+        await asyncio.sleep(0.1)
+    return f"{len(client_manager.workers)} 个工作进程" if client_manager.workers else "机器人进程内"
+
+
+async def stop_server():
+    workers = [process for process in client_manager.workers if process]
+    await client_manager.stop_workers()
+    # 等待工作进程退出，以免事件循环关闭后才回收子进程
+    await asyncio.gather(*(process.wait() for process in workers))
+    client_manager.ws_server_task.cancel()
+    await asyncio.gather(client_manager.ws_server_task, return_exceptions=True)
+
+
+async def setup_server_clients(count: int, connection: Connection, pulse_data: Dict[str, Any]) -> List[DGLabPlayClient]:
+    """通过服务端创建终端，由模拟的 App 进程扫描二维码完成绑定"""
+    play_clients = []
+    for i in range(count):
+        if not (play_client := await client_manager.new_client(f"user{i}")):
+            raise RuntimeError("创建终端失败")
+        play_clients.append(play_client)
+    connection.send([play_client.qrcode for play_client in play_clients])
+    await asyncio.get_running_loop().run_in_executor(None, connection.recv)
+    for play_client in play_clients:
+        async with play_client.bind_finished_lock:
+            pass
+        play_client.setup_pulse_job(random_pulse_loop(pulse_data), Channel.A, Channel.B)
+    return play_clients
+
+
+async def benchmark_clients(args: argparse.Namespace) -> Dict[str, Any]:
+    pulse_data = dict(CustomPulseData().root)
+    strength_control_module.MessageFactory = FakeMessageFactory
+    lags: List[float] = []
+    record_refill_lags(lags)
+
+    connection = None
+    if args.server:
+        server = await start_server()
+        print(f"已启动本地服务端（{server}），在独立进程中运行模拟的 App...")
+        connection, child_connection = multiprocessing.Pipe()
+        app_process = multiprocessing.get_context("spawn").Process(target=run_fake_apps, args=(child_connection,))
+        app_process.start()
+        memory = None
+        stats = BenchmarkStats()
+        play_clients = await setup_server_clients(args.clients, connection, pulse_data)
+    else:
+        server = None
+        print(f"创建 {args.clients} 个终端统计内存...")
+        memory = await benchmark_memory(args.clients, pulse_data)
+        stats = BenchmarkStats()
+        play_clients = await setup_clients(args.clients, stats, pulse_data)
+    setup_durations = benchmark_setup_pulse_job(play_clients, pulse_data)
+    # 排除创建终端与首次设置波形任务的统计
+    await asyncio.sleep(1)
+    stats.reset()
+    lags.clear()
+    if connection:
+        connection.send(None)
+
+    print(f"运行 {args.duration} 秒，每秒 {args.command_rate} 条强度控制指令...")
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    latencies = await run_commands(play_clients, args.command_rate, args.duration)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - start_cpu
+    refill_lag = percentiles(lags)
+    if connection:
+        connection.send(None)
+        app_stats = await asyncio.get_running_loop().run_in_executor(None, connection.recv)
+    else:
+        app_stats = stats.app_stats()
+    await destroy_clients(play_clients)
+    if connection:
+        await asyncio.get_running_loop().run_in_executor(None, app_process.join)
+        await stop_server()
+
+    return {
+        "clients": args.clients,
+        "server": server,
+        "duration": elapsed,
+        "memory": memory,
+        "setup_pulse_job": percentiles(setup_durations),
+        "refill_lag": refill_lag,
+        "posts": app_stats["posts"],
+        "underruns": app_stats["underruns"],
+        "underrun_time": app_stats["underrun_time"],
+        "overflow_frames": app_stats["overflow_frames"],
+        "messages_per_second": app_stats["messages"] / elapsed,
+        "command_latency": percentiles(latencies),
+        "commands": len(latencies),
+        "bot_cpu": cpu / elapsed,
+    }
+
+
+def benchmark_conversion(repeat: int) -> Optional[Dict[str, float]]:
+    """转换 ``appPulseData.json`` 中的波形 ``repeat`` 遍"""
+    sys.path.insert(0, str(ROOT / "scripts"))
+    try:
+        pulse_data_db = importlib.import_module("pulse_data_db")
+    except ImportError as e:
+        print(f"跳过波形转换测试：{e}")
+        return None
+    pulse_datas = pulse_data_db.read_pulse_data_from_json(ROOT / "appPulseData.json") * repeat
+    start = time.perf_counter()
+    pulse_data_db.generate_results_from_pulse_datas(pulse_datas)
+    elapsed = time.perf_counter() - start
+    return {"waveforms": len(pulse_datas), "waveforms_per_second": len(pulse_datas) / elapsed}
+
+
+def print_report(result: Dict[str, Any]):
+    print(f"终端数：{result['clients']}，持续时间：{result['duration']:.1f}s")
+    if result["server"]:
+        print(f"服务端：{result['server']}")
+    if result["memory"]:
+        print(f"每终端内存：{result['memory']['bytes_per_client'] / 1024:.1f} KiB")
+    print(f"setup_pulse_job：{format_ms(result['setup_pulse_job'])}")
+    print(f"波形补充抖动：{format_ms(result['refill_lag'])}")
+    print(
+        f"波形下发：{result['posts']} 次，欠载 {result['underruns']} 次（共 {result['underrun_time']:.2f}s），"
+        f"溢出 {result['overflow_frames']} 条"
+    )
+    print(f"消息吞吐：{result['messages_per_second']:.1f} 条/s")
+    print(f"指令延迟（{result['commands']} 条）：{format_ms(result['command_latency'])}")
+    print(f"机器人进程 CPU 占用：{result['bot_cpu'] * 100:.1f}%")
+    if conversion := result.get("conversion"):
+        print(f"波形转换：{conversion['waveforms']} 个波形，{conversion['waveforms_per_second']:.0f} 个/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DG-Lab-Play 性能基准测试")
+    parser.add_argument("-n", "--clients", type=int, default=300, help="模拟的终端数")
+    parser.add_argument("-t", "--duration", type=float, default=30, help="测量持续时间（秒）")
+    parser.add_argument("--command-rate", type=float, default=20, help="每秒执行的强度控制指令数")
+    parser.add_argument("--server", action="store_true", help="通过插件配置的本地服务端连接独立进程中模拟的 App")
+    parser.add_argument("--conversion-repeat", type=int, default=50, help="波形转换测试中 App 波形的重复次数")
+    parser.add_argument("--json", type=Path, default=None, help="将结果以 JSON 格式写入此文件")
+    args = parser.parse_args()
+
+    result = asyncio.run(benchmark_clients(args))
+    result["conversion"] = benchmark_conversion(args.conversion_repeat)
+    print_report(result)
+    if args.json:
+        args.json.write_text(json.dumps(result, ensure_ascii=False, indent=4), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
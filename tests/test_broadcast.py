@@ -0,0 +1,103 @@
+"""全体命令的测试：目标解析与并发受限的批量操作"""
+import asyncio
+import importlib
+import unittest
+from types import SimpleNamespace
+from typing import List
+from unittest.mock import patch
+
+from .utils import init_plugin
+
+init_plugin()
+
+from nonebot_plugin_alconna import At, AtAll, Target  # noqa: E402
+from nonebot_plugin_dg_lab_play.client_manager import ClientManager, ClientRegistry, client_manager  # noqa: E402
+
+client_manager_module = importlib.import_module("nonebot_plugin_dg_lab_play.client_manager")
+broadcast_module = importlib.import_module("nonebot_plugin_dg_lab_play.commands.broadcast")
+
+
+def play_client(user_id: str) -> SimpleNamespace:
+    """代替 ``DGLabPlayClient``，只有全体命令用到的属性"""
+    return SimpleNamespace(user_id=user_id, client=SimpleNamespace(client_id=None, target_id=None), session=None)
+
+
+class BroadcastTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        concurrency_patch = patch.object(client_manager_module.config.dg_lab_client, "broadcast_concurrency", 3)
+        concurrency_patch.start()
+        self.addCleanup(concurrency_patch.stop)
+
+    async def test_bounded_concurrency(self):
+        running = 0
+        max_running = 0
+        play_clients = [play_client(str(i)) for i in range(10)]
+
+        async def operation(target) -> str:
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            # 较早的终端耗时更长，结果的顺序仍与终端的顺序一致
+            await asyncio.sleep(0.001 * (10 - int(target.user_id)))
+            running -= 1
+            return target.user_id
+
+        results = await ClientManager.broadcast(play_clients, operation)
+        self.assertEqual(results, [target.user_id for target in play_clients])
+        self.assertEqual(max_running, 3)
+
+    async def test_exceptions_are_returned(self):
+        error = RuntimeError("failed")
+        finished: List[str] = []
+
+        async def operation(target):
+            if target.user_id == "1":
+                raise error
+            await asyncio.sleep(0)
+            finished.append(target.user_id)
+
+        results = await ClientManager.broadcast([play_client(str(i)) for i in range(5)], operation)
+        # 一个终端出现异常不影响其他终端
+        self.assertEqual(results, [None, error, None, None, None])
+        self.assertEqual(sorted(finished), ["0", "2", "3", "4"])
+
+    async def test_no_targets(self):
+        async def operation(_):
+            raise AssertionError
+
+        self.assertEqual(await ClientManager.broadcast([], operation), [])
+
+
+class ResolveTargetsTest(unittest.TestCase):
+    def setUp(self):
+        registry_patch = patch.object(client_manager, "registry", ClientRegistry())
+        registry_patch.start()
+        self.addCleanup(registry_patch.stop)
+        self.session = Target("group")
+        self.other_session = Target("other_group")
+        self.players = {user_id: play_client(user_id) for user_id in ("1", "2", "3")}
+        for user_id, player in self.players.items():
+            client_manager.registry.add(player)
+            client_manager.registry.set_session(player, self.other_session if user_id == "3" else self.session)
+
+    def test_at_all_targets_current_session(self):
+        self.assertEqual(
+            broadcast_module.resolve_targets((AtAll(),), self.session),
+            {"1": self.players["1"], "2": self.players["2"]}
+        )
+        self.assertEqual(
+            broadcast_module.resolve_targets((At("user", "1"), AtAll()), self.other_session),
+            {"3": self.players["3"]}
+        )
+        self.assertEqual(broadcast_module.resolve_targets((AtAll(),), Target("empty_group")), {})
+
+    def test_mentioned_users(self):
+        # 被 @ 的玩家不受会话限制，没有终端的用户映射到 None
+        self.assertEqual(
+            broadcast_module.resolve_targets((At("user", "3"), At("user", "4")), self.session),
+            {"3": self.players["3"], "4": None}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,626 @@
+"""
+``client_manager`` 模块的测试：波形发送调度、App 波形队列占用估计、已编码波形的发送、波形补充追踪的导出、
+工作进程的启动超时与输出读取、远程连接失败的处理、预连接终端注册失败的处理、终端注册表、乐观的强度状态与强度指令合并
+"""
+import asyncio
+import csv
+import importlib
+import socket
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from types import SimpleNamespace
+from unittest.mock import patch
+from uuid import uuid4
+
+from pydglab_ws import Channel, StrengthData, StrengthOperationType, DGLabClient, MessageType, PulseOperation
+from websockets.server import serve as ws_serve
+
+from .utils import init_plugin
+
+init_plugin()
+
+from nonebot_plugin_dg_lab_play.client_manager import OptimisticStrength, StrengthAggregator, PulseScheduler, \
+    PulseJob, PulseQueueTracker, APP_PULSE_QUEUE_LEN, DGLabPlayClient, ClientRegistry, WarmConnection, \
+    ClientManager, PulseTraceEvent, send_compiled_pulses  # noqa: E402
+from nonebot_plugin_dg_lab_play.model import PulseLoop, PulseWaveform  # noqa: E402
+from nonebot_plugin_dg_lab_play.transport import RemoteTransport  # noqa: E402
+
+client_manager_module = importlib.import_module("nonebot_plugin_dg_lab_play.client_manager")
+
+CONFIRM_TIMEOUT = 2
+
+
+class SchedulerPlayClient:
+    """代替 ``DGLabPlayClient``，只有 :class:`PulseScheduler` 用到的属性"""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.pulse_job: Optional[PulseJob] = None
+        self.pulse_step: Optional[asyncio.Task] = None
+        self.pulse_cursor = None
+
+
+class PulseSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.scheduler = PulseScheduler()
+        self.steps: List[str] = []
+        self.closed: List[str] = []
+
+    async def asyncTearDown(self):
+        if self.scheduler._task:
+            self.scheduler._task.cancel()
+
+    async def job(self, name: str, delays: List[float]) -> PulseJob:
+        """每执行一步记录一次 ``name``，依次等待 ``delays`` 中的时间，之后结束"""
+        try:
+            for delay in delays:
+                self.steps.append(name)
+                yield delay
+            self.steps.append(name)
+        finally:
+            self.closed.append(name)
+
+    def start(self, name: str, delays: List[float], delay: float = 0) -> SchedulerPlayClient:
+        play_client = SchedulerPlayClient(name)
+        play_client.pulse_job = self.job(name, delays)
+        self.scheduler.schedule(play_client, play_client.pulse_job, delay)
+        return play_client
+
+    async def test_runs_in_due_order(self):
+        self.start("c", [], 0.06)
+        self.start("a", [], 0.02)
+        self.start("b", [], 0.04)
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.steps, ["a", "b", "c"])
+
+    async def test_interleaves_steps_by_delay(self):
+        self.start("slow", [0.1])
+        self.start("fast", [0.02, 0.02])
+        await asyncio.sleep(0.15)
+        self.assertEqual(self.steps, ["slow", "fast", "fast", "fast", "slow"])
+
+    async def test_finished_job_is_cleared(self):
+        play_client = self.start("a", [0.01])
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.steps, ["a", "a"])
+        self.assertIsNone(play_client.pulse_job)
+        self.assertEqual(len(self.scheduler), 0)
+
+    async def test_replaced_job_is_closed(self):
+        play_client = self.start("old", [0.02] * 10)
+        await asyncio.sleep(0.01)
+        # 替换任务后，旧任务到期时不再执行而是被关闭
+        play_client.pulse_job = self.job("new", [0.02] * 10)
+        self.scheduler.schedule(play_client, play_client.pulse_job)
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.steps.count("old"), 1)
+        self.assertIn("old", self.closed)
+        self.assertGreater(self.steps.count("new"), 1)
+
+    async def test_slow_step_does_not_block_others(self):
+        async def slow_job() -> PulseJob:
+            await asyncio.sleep(1)
+            yield 0
+
+        slow_client = SchedulerPlayClient("slow")
+        slow_client.pulse_job = slow_job()
+        self.scheduler.schedule(slow_client, slow_client.pulse_job)
+        self.start("a", [0.01, 0.01])
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.steps, ["a", "a", "a"])
+        slow_client.pulse_step.cancel()
+
+    async def test_earlier_job_wakes_scheduler(self):
+        self.start("late", [], 1)
+        await asyncio.sleep(0.01)
+        self.start("early", [], 0.01)
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.steps, ["early"])
+
+
+def strength_data(a: int, b: int) -> StrengthData:
+    return StrengthData(a=a, b=b, a_limit=100, b_limit=100)
+
+
+class PulseQueueTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.tracker = PulseQueueTracker(20)
+
+    def test_empty_queue(self):
+        self.assertEqual(self.tracker.occupancy(0), 0)
+        self.assertEqual(self.tracker.deficit(0), 20)
+        self.assertEqual(self.tracker.time_until_deficit(8, 0), 0)
+
+    def test_record_and_drain(self):
+        self.tracker.record(80, now=100)
+        self.assertAlmostEqual(self.tracker.occupancy(100), 8)
+        self.assertAlmostEqual(self.tracker.occupancy(103), 5)
+        self.assertAlmostEqual(self.tracker.deficit(103), 15)
+        self.assertEqual(self.tracker.occupancy(110), 0)
+        self.assertEqual((self.tracker.last_post_time, self.tracker.last_post_length), (100, 80))
+
+    def test_records_queue_up(self):
+        self.tracker.record(80, now=100)
+        self.tracker.record(80, now=102)
+        # 第二次下发排在第一次剩余的 6 秒之后
+        self.assertAlmostEqual(self.tracker.occupancy(102), 14)
+        # 队列已播放完后再下发，从下发时开始计算
+        self.tracker.record(10, now=200)
+        self.assertAlmostEqual(self.tracker.occupancy(200), 1)
+
+    def test_time_until_deficit(self):
+        self.tracker.record(200, now=0)
+        self.assertAlmostEqual(self.tracker.deficit(0), 0)
+        self.assertAlmostEqual(self.tracker.time_until_deficit(8, 0), 8)
+        self.assertAlmostEqual(self.tracker.time_until_deficit(8, 5), 3)
+        self.assertEqual(self.tracker.time_until_deficit(8, 10), 0)
+
+    def test_overflow_is_dropped(self):
+        for _ in range(10):
+            self.tracker.record(100, now=0)
+        # 超出 App 队列长度的部分被 App 丢弃
+        self.assertAlmostEqual(self.tracker.occupancy(0), APP_PULSE_QUEUE_LEN)
+
+    def test_clear(self):
+        self.tracker.record(80, now=0)
+        self.tracker.clear()
+        self.assertEqual(self.tracker.occupancy(1), 0)
+
+    def test_refill_delay(self):
+        self.tracker.record(200, now=0)
+        # 队列已满，等待空出一次下发的时长
+        self.assertAlmostEqual(self.tracker.refill_delay(8, 1, now=0), 8)
+        # 队列仍有空余，按补充间隔继续补充
+        self.assertEqual(self.tracker.refill_delay(8, 1, now=8), 1)
+
+    def test_refill_delay_small_capacity(self):
+        tracker = PulseQueueTracker(5)
+        tracker.record(50, now=0)
+        # 容量小于一次下发的时长时，最多等到队列只剩一半，而不是永远等不到足够的空间
+        self.assertAlmostEqual(tracker.refill_delay(8, 1, now=0), 2.5)
+
+
+class FakeClock:
+    """代替 ``client_manager`` 模块中的 ``time``，时间只在测试中推进"""
+
+    def __init__(self):
+        self.now: float = 0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+
+class FakePulseClient:
+    """代替 pydglab-ws 的终端，只需要能够清空波形队列"""
+
+    async def clear_pulses(self, channel: Channel):
+        pass
+
+
+class PulseJobRefillTest(unittest.IsolatedAsyncioTestCase):
+    """按模拟的时钟驱动波形发送任务，检查 App 波形队列在两次补充之间不会被播放完"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        clock_patch = patch.object(client_manager_module, "time", self.clock)
+        clock_patch.start()
+        self.addCleanup(clock_patch.stop)
+        self.play_client = DGLabPlayClient("user", lambda _: None, FakePulseClient())
+        self.play_client.add_compiled_pulses = self.add_compiled_pulses
+        # 下发时的时间与下发前的队列占用
+        self.posts: List[Tuple[float, float, int]] = []
+
+    async def add_compiled_pulses(self, channel: Channel, compiled_post: str, length: int):
+        self.posts.append((self.clock.now, self.play_client.pulse_queue.occupancy(self.clock.now), length))
+
+    async def run_job(self, duration: float):
+        waveform = PulseWaveform.from_operations([((10, 10, 10, 10), (50, 50, 50, 50))] * 10)
+        job = self.play_client._pulse_job(PulseLoop.of("x", waveform), Channel.A)
+        delay = await job.__anext__()
+        while self.clock.now < duration:
+            self.clock.now += delay
+            delay = await job.__anext__()
+        await job.aclose()
+
+    def assert_no_underrun(self, duration: float):
+        self.assertTrue(self.posts)
+        for posted_at, queue_level, _ in self.posts[1:]:
+            self.assertGreater(queue_level, 0, f"波形队列在 {posted_at:.1f}s 时已被播放完")
+        # 下发的波形足够覆盖经过的时间
+        self.assertGreaterEqual(sum(length for *_, length in self.posts) * 0.1, duration - self.posts[0][0])
+
+    async def test_refill_keeps_queue_filled(self):
+        await self.run_job(120)
+        self.assert_no_underrun(120)
+
+    async def test_refill_with_small_capacity(self):
+        # 队列容量小于每次下发的时长（默认 8 秒）
+        self.play_client.pulse_queue = PulseQueueTracker(5)
+        await self.run_job(120)
+        self.assert_no_underrun(120)
+
+
+class RecordingClient(DGLabClient):
+    """记录发送的消息与调用的 ``add_pulses``，不实际连接服务端"""
+
+    def __init__(self):
+        super().__init__(uuid4(), uuid4())
+        self.sent: List[Tuple[MessageType, str]] = []
+        self.added: List[Tuple[Channel, Tuple[PulseOperation, ...]]] = []
+
+    async def _recv(self):
+        raise NotImplementedError
+
+    async def _send(self, message):
+        self.sent.append((message.type, message.message))
+
+    async def add_pulses(self, channel: Channel, *pulses: PulseOperation):
+        self.added.append((channel, pulses))
+
+
+class SendCompiledPulsesTest(unittest.IsolatedAsyncioTestCase):
+    PULSES = [((10, 20, 30, 40), (0, 50, 100, 0)), ((11, 11, 11, 11), (1, 2, 3, 4))]
+    COMPILED_POST = '["0a141e2800326400","0b0b0b0b01020304"]'
+
+    def setUp(self):
+        self.client = RecordingClient()
+
+    async def test_send_compiled(self):
+        await send_compiled_pulses(self.client, Channel.B, self.COMPILED_POST)
+        self.assertEqual(self.client.sent, [(MessageType.MSG, f"pulse-B:{self.COMPILED_POST}")])
+        self.assertEqual(self.client.added, [])
+
+    async def test_fallback_to_add_pulses(self):
+        # pydglab-ws 的私有方法不可用时，解码后通过公开的 add_pulses 发送
+        with patch.object(client_manager_module, "_send_owned_compatible", False):
+            await send_compiled_pulses(self.client, Channel.A, self.COMPILED_POST)
+        self.assertEqual(self.client.added, [(Channel.A, tuple(self.PULSES))])
+        self.assertEqual(self.client.sent, [])
+
+    def test_send_owned_compatibility(self):
+        self.assertTrue(client_manager_module._is_send_owned_compatible())
+
+        async def changed_signature(_, msg):
+            pass
+
+        def not_coroutine(_, msg_type, msg):
+            pass
+
+        for send_owned in changed_signature, not_coroutine:
+            with patch.object(DGLabClient, "_send_owned", send_owned):
+                self.assertFalse(client_manager_module._is_send_owned_compatible())
+        with patch.object(DGLabClient, "_send_owned", None):
+            self.assertFalse(client_manager_module._is_send_owned_compatible())
+
+
+class PulseTraceDumpTest(unittest.IsolatedAsyncioTestCase):
+    async def test_dump_in_thread(self):
+        play_client = DGLabPlayClient("user", lambda _: None)
+        play_client.enable_pulse_trace(2)
+        for i in range(3):
+            play_client.pulse_trace.append(PulseTraceEvent(1000.0 + i, None if i == 0 else 0.01, 0.002, 10, 1.5))
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "traces" / "user.csv"
+            with patch.object(client_manager_module.asyncio, "to_thread", wraps=asyncio.to_thread) as to_thread:
+                await play_client.dump_pulse_trace(path)
+            to_thread.assert_called_once()
+            with path.open(encoding="utf-8", newline="") as f:
+                rows = list(csv.reader(f))
+        self.assertEqual(rows, [
+            list(PulseTraceEvent._fields),
+            ["1001.0", "0.01", "0.002", "10", "1.5"],
+            ["1002.0", "0.01", "0.002", "10", "1.5"]
+        ])
+
+
+class RemoteConnectFailureTest(unittest.IsolatedAsyncioTestCase):
+    async def test_connect_error_invalidates_dns_cache(self):
+        # 本机未监听的端口，解析成功但连接被拒绝
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            uri = f"ws://localhost:{sock.getsockname()[1]}"
+        transport = RemoteTransport(uri)
+        address = await transport.resolve()
+        destroyed = []
+        async with DGLabPlayClient("user", destroyed.append, server_uri=uri, transport=transport) as play_client:
+            pass
+        await asyncio.wait([play_client.fetch_task])
+        self.assertEqual(destroyed, [play_client])
+        self.assertNotIn(address, transport._addresses)
+
+
+class WarmConnectionOpenTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        timeout_patch = patch.object(client_manager_module.config.dg_lab_client, "register_timeout", 0.1)
+        timeout_patch.start()
+        self.addCleanup(timeout_patch.stop)
+
+    async def test_register_timeout_closes_websocket(self):
+        closed = asyncio.Event()
+
+        async def handler(websocket):
+            # 接受连接但不下发 clientId
+            await websocket.wait_closed()
+            closed.set()
+
+        server = await ws_serve(handler, "127.0.0.1", 0)
+        self.addAsyncCleanup(server.wait_closed)
+        self.addCleanup(server.close)
+        transport = RemoteTransport(f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+        with self.assertRaises(asyncio.TimeoutError):
+            await WarmConnection.open(transport)
+        await asyncio.wait_for(closed.wait(), 1)
+
+    async def test_connect_error(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            transport = RemoteTransport(f"ws://localhost:{sock.getsockname()[1]}")
+        address = await transport.resolve()
+        with self.assertRaises(OSError):
+            await WarmConnection.open(transport)
+        self.assertNotIn(address, transport._addresses)
+
+
+class WorkerProcessTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def script(self, source: str) -> str:
+        path = Path(self.directory.name) / "worker.py"
+        path.write_text(source, encoding="utf-8")
+        return str(path)
+
+    async def test_start_timeout(self):
+        # 不输出 READY 的工作进程被结束，而不是一直等待
+        processes = []
+        create_subprocess_exec = asyncio.create_subprocess_exec
+
+        async def record_process(*args, **kwargs):
+            processes.append(process := await create_subprocess_exec(*args, **kwargs))
+            return process
+
+        with patch.object(client_manager_module.ws_worker, "__file__", self.script("import sys\nsys.stdin.read()\n")), \
+                patch.object(client_manager_module, "WORKER_START_TIMEOUT", 0.5), \
+                patch.object(client_manager_module.asyncio, "create_subprocess_exec", record_process):
+            with self.assertRaises(RuntimeError):
+                await asyncio.wait_for(client_manager_module.client_manager._start_worker(0), 5)
+        self.assertIsNotNone(processes[0].returncode)
+
+    async def test_output_is_drained(self):
+        # 输出超过管道缓冲区大小的工作进程不会因管道被写满而阻塞
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, self.script("for i in range(20000):\n    print('x' * 100)\nprint('y' * 200000)\n"),
+            stdout=asyncio.subprocess.PIPE
+        )
+        return_code, _ = await asyncio.wait_for(asyncio.gather(
+            process.wait(),
+            ClientManager._log_worker_output(0, process.stdout)
+        ), 10)
+        self.assertEqual(return_code, 0)
+
+
+def registry_client(user_id: str, client_id=None, target_id=None) -> SimpleNamespace:
+    """代替 ``DGLabPlayClient``，只有 :class:`ClientRegistry` 用到的属性"""
+    return SimpleNamespace(
+        user_id=user_id,
+        client=SimpleNamespace(client_id=client_id, target_id=target_id),
+        session=None
+    )
+
+
+class ClientRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = ClientRegistry()
+
+    def test_add_and_lookup(self):
+        client_id, target_id = uuid4(), uuid4()
+        play_client = registry_client("1", client_id, target_id)
+        self.registry.add(play_client)
+        self.assertIn("1", self.registry)
+        self.assertEqual(len(self.registry), 1)
+        self.assertIs(self.registry.get("1"), play_client)
+        self.assertIs(self.registry.get_by_client_id(client_id), play_client)
+        self.assertIs(self.registry.get_by_target_id(target_id), play_client)
+
+    def test_update_on_bind_and_rebind(self):
+        client_id = uuid4()
+        play_client = registry_client("1", client_id)
+        self.registry.add(play_client)
+        self.assertEqual(self.registry.target_id_to_client, {})
+        # 绑定后建立 target_id 索引
+        first_target, second_target = uuid4(), uuid4()
+        play_client.client.target_id = first_target
+        self.registry.update(play_client)
+        self.assertIs(self.registry.get_by_target_id(first_target), play_client)
+        # 重新绑定到另一个 App 后，旧的索引被移除
+        play_client.client.target_id = second_target
+        self.registry.update(play_client)
+        self.assertIsNone(self.registry.get_by_target_id(first_target))
+        self.assertIs(self.registry.get_by_target_id(second_target), play_client)
+        self.assertIs(self.registry.get_by_client_id(client_id), play_client)
+
+    def test_remove_on_destroy(self):
+        client_id, target_id = uuid4(), uuid4()
+        play_client = registry_client("1", client_id, target_id)
+        session = object()
+        self.registry.add(play_client)
+        self.registry.set_session(play_client, session)
+        self.registry.remove(play_client)
+        self.assertNotIn("1", self.registry)
+        self.assertIsNone(self.registry.get_by_client_id(client_id))
+        self.assertIsNone(self.registry.get_by_target_id(target_id))
+        self.assertEqual(self.registry.get_by_session(session), [])
+        self.assertEqual(self.registry.session_to_clients, {})
+
+    def test_replace_same_user(self):
+        old_client = registry_client("1", uuid4(), uuid4())
+        new_client = registry_client("1", uuid4())
+        self.registry.add(old_client)
+        self.registry.add(new_client)
+        self.assertIs(self.registry.get("1"), new_client)
+        self.assertIsNone(self.registry.get_by_client_id(old_client.client.client_id))
+        self.assertIsNone(self.registry.get_by_target_id(old_client.client.target_id))
+        # 旧终端之后被摧毁时不影响新终端
+        self.registry.remove(old_client)
+        self.assertIs(self.registry.get("1"), new_client)
+        self.assertIs(self.registry.get_by_client_id(new_client.client.client_id), new_client)
+
+    def test_update_ignores_unregistered_client(self):
+        play_client = registry_client("1", uuid4(), uuid4())
+        self.registry.update(play_client)
+        self.assertEqual(self.registry.client_id_to_client, {})
+
+    def test_sessions(self):
+        first, second = registry_client("1"), registry_client("2")
+        session = object()
+        for play_client in first, second:
+            self.registry.add(play_client)
+            self.registry.set_session(play_client, session)
+        self.assertEqual(self.registry.get_by_session(session), [first, second])
+        other_session = object()
+        self.registry.set_session(first, other_session)
+        self.assertEqual(self.registry.get_by_session(session), [second])
+        self.assertEqual(self.registry.get_by_session(other_session), [first])
+
+
+class OptimisticStrengthTest(unittest.TestCase):
+    def setUp(self):
+        self.state = OptimisticStrength(CONFIRM_TIMEOUT)
+        self.state.reconcile(strength_data(0, 0))
+
+    def test_current_before_feedback(self):
+        state = OptimisticStrength(CONFIRM_TIMEOUT)
+        state.apply({Channel.A: 10})
+        self.assertIsNone(state.current)
+
+    def test_apply_updates_current(self):
+        self.state.apply({Channel.A: 10})
+        self.state.apply({Channel.A: 20, Channel.B: 5})
+        self.assertEqual((self.state.current.a, self.state.current.b), (20, 5))
+
+    def test_reconcile_confirms_earlier_targets(self):
+        self.state.apply({Channel.A: 10})
+        self.state.apply({Channel.A: 20})
+        # App 反馈了较早的目标，较晚的目标仍未确认
+        self.state.reconcile(strength_data(10, 0))
+        self.assertEqual(self.state.current.a, 20)
+        self.state.reconcile(strength_data(20, 0))
+        self.assertEqual(self.state.current.a, 20)
+        self.state.reconcile(strength_data(15, 0))
+        self.assertEqual(self.state.current.a, 15)
+
+    def test_reconcile_keeps_unmatched_targets(self):
+        self.state.apply({Channel.A: 30})
+        self.state.reconcile(strength_data(5, 0))
+        self.assertEqual(self.state.current.a, 30)
+        self.assertEqual(self.state.confirmed.a, 5)
+
+    def test_expire_unconfirmed_targets(self):
+        self.state.apply({Channel.A: 30})
+        self.state.reconcile(strength_data(5, 0))
+        self.state._expire(time.monotonic() + CONFIRM_TIMEOUT + 1)
+        self.assertEqual(self.state.current.a, 5)
+
+    def test_discard(self):
+        version = self.state.apply({Channel.A: 30, Channel.B: 40})
+        self.state.discard(version, Channel.B)
+        self.assertEqual((self.state.current.a, self.state.current.b), (30, 0))
+
+    def test_version_increments(self):
+        version = self.state.version
+        self.assertEqual(self.state.apply({Channel.A: 1}), version + 1)
+        self.state.reconcile(strength_data(1, 0))
+        self.assertEqual(self.state.version, version + 2)
+
+
+class FakePlayClient:
+    """代替 ``DGLabPlayClient``，记录发送的强度并按发送的强度反馈"""
+
+    def __init__(self):
+        self.strength_state = OptimisticStrength(CONFIRM_TIMEOUT)
+        self.strength_state.reconcile(strength_data(10, 10))
+        self.sent: List[Tuple[StrengthOperationType, Dict[Channel, int]]] = []
+
+    @property
+    def strength(self) -> Optional[StrengthData]:
+        return self.strength_state.current
+
+    async def set_strengths(
+            self,
+            operation_type: StrengthOperationType,
+            channel_to_value: Dict[Channel, int]
+    ) -> Dict[Channel, Optional[BaseException]]:
+        self.sent.append((operation_type, channel_to_value))
+        return {channel: None for channel in channel_to_value}
+
+
+class StrengthAggregatorTest(unittest.IsolatedAsyncioTestCase):
+    WINDOW = 0.2
+
+    def setUp(self):
+        self.play_client = FakePlayClient()
+        self.aggregator = StrengthAggregator(self.play_client, self.WINDOW)
+
+    async def test_leading_edge_sends_immediately(self):
+        result = await self.aggregator.submit(StrengthOperationType.INCREASE, {Channel.A: 5})
+        self.assertEqual(result, {Channel.A: None})
+        self.assertEqual(self.play_client.sent, [(StrengthOperationType.SET_TO, {Channel.A: 15})])
+
+    async def test_trailing_edge_coalesces_window(self):
+        await self.aggregator.submit(StrengthOperationType.INCREASE, {Channel.A: 5})
+        submits = [
+            asyncio.create_task(self.aggregator.submit(StrengthOperationType.INCREASE, {Channel.A: 3})),
+            asyncio.create_task(self.aggregator.submit(StrengthOperationType.DECREASE, {Channel.A: 1, Channel.B: 20})),
+        ]
+        await asyncio.sleep(0)
+        # 窗口结束前不发送
+        self.assertEqual(len(self.play_client.sent), 1)
+        results = await asyncio.gather(*submits)
+        self.assertEqual(
+            self.play_client.sent[1:],
+            [(StrengthOperationType.SET_TO, {Channel.A: 17, Channel.B: 0})]
+        )
+        self.assertEqual(results, [{Channel.A: None, Channel.B: None}] * 2)
+
+    async def test_next_window_after_flush(self):
+        await self.aggregator.submit(StrengthOperationType.INCREASE, {Channel.A: 5})
+        await self.aggregator.submit(StrengthOperationType.INCREASE, {Channel.A: 5})
+        # 合并发送后开启下一个窗口，紧接着的指令仍需等待
+        submit = asyncio.create_task(self.aggregator.submit(StrengthOperationType.SET_TO, {Channel.A: 50}))
+        await asyncio.sleep(0)
+        self.assertEqual(len(self.play_client.sent), 2)
+        await submit
+        self.assertEqual(self.play_client.sent[-1], (StrengthOperationType.SET_TO, {Channel.A: 50}))
+
+    async def test_window_expires(self):
+        await self.aggregator.submit(StrengthOperationType.INCREASE, {Channel.A: 5})
+        await asyncio.sleep(self.WINDOW * 1.5)
+        await asyncio.wait_for(self.aggregator.submit(StrengthOperationType.INCREASE, {Channel.A: 5}), self.WINDOW / 2)
+        self.assertEqual(len(self.play_client.sent), 2)
+
+    async def test_without_coalesce(self):
+        await self.aggregator.submit(StrengthOperationType.INCREASE, {Channel.A: 5})
+        await asyncio.wait_for(
+            self.aggregator.submit(StrengthOperationType.INCREASE, {Channel.A: 5}, coalesce=False),
+            self.WINDOW / 2
+        )
+        self.assertEqual(self.play_client.sent[-1], (StrengthOperationType.SET_TO, {Channel.A: 20}))
+
+    async def test_zero_window(self):
+        aggregator = StrengthAggregator(self.play_client, 0)
+        for _ in range(3):
+            await aggregator.submit(StrengthOperationType.INCREASE, {Channel.B: 1})
+        self.assertEqual([channel_to_value for _, channel_to_value in self.play_client.sent],
+                         [{Channel.B: 11}, {Channel.B: 12}, {Channel.B: 13}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+"""``config`` 模块的测试：波形数据设置的校验"""
+import unittest
+
+from .utils import init_plugin
+
+init_plugin()
+
+from nonebot_plugin_dg_lab_play.config import PulseDataConfig  # noqa: E402
+
+
+class PulseDataConfigTest(unittest.TestCase):
+    def test_defaults_unchanged(self):
+        config = PulseDataConfig()
+        self.assertEqual((config.queue_duration, config.duration_per_post), (20, 8))
+
+    def test_duration_per_post_clamped_to_queue_duration(self):
+        config = PulseDataConfig(queue_duration=5)
+        self.assertEqual(config.duration_per_post, 5)
+
+    def test_duration_per_post_too_long(self):
+        with self.assertRaises(Exception):
+            PulseDataConfig(duration_per_post=20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""``metrics`` 模块的测试：Prometheus 文本格式输出与指标 HTTP 端点"""
+import asyncio
+import unittest
+from http import HTTPStatus
+from unittest.mock import patch
+
+from websockets.server import serve as ws_serve
+
+from .utils import init_plugin
+
+init_plugin()
+
+from nonebot_plugin_dg_lab_play import metrics as metrics_module  # noqa: E402
+from nonebot_plugin_dg_lab_play.metrics import MetricsRegistry, metrics_process_request, CONTENT_TYPE  # noqa: E402
+
+
+class MetricsRenderTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.requests = self.registry.counter("requests", "请求数", ["kind"])
+        self.clients = self.registry.gauge("clients", "终端数", lambda: 3)
+        self.latency = self.registry.histogram("latency_seconds", "耗时", buckets=(0.1, 1))
+
+    def test_render(self):
+        self.requests.inc(kind="a")
+        self.requests.inc(2, kind='b"\n')
+        self.latency.observe(0.05)
+        self.latency.observe(0.1)
+        self.latency.observe(0.5)
+        self.latency.observe(2)
+        self.assertEqual(self.registry.render(), "\n".join([
+            "# HELP dg_lab_play_requests_total 请求数",
+            "# TYPE dg_lab_play_requests_total counter",
+            'dg_lab_play_requests_total{kind="a"} 1',
+            'dg_lab_play_requests_total{kind="b\\"\\n"} 2',
+            "# HELP dg_lab_play_clients 终端数",
+            "# TYPE dg_lab_play_clients gauge",
+            "dg_lab_play_clients 3",
+            "# HELP dg_lab_play_latency_seconds 耗时",
+            "# TYPE dg_lab_play_latency_seconds histogram",
+            'dg_lab_play_latency_seconds_bucket{le="0.1"} 2',
+            'dg_lab_play_latency_seconds_bucket{le="1"} 3',
+            'dg_lab_play_latency_seconds_bucket{le="+Inf"} 4',
+            "dg_lab_play_latency_seconds_sum 2.65",
+            "dg_lab_play_latency_seconds_count 4",
+        ]) + "\n")
+
+    def test_unlabeled_counter_starts_at_zero(self):
+        self.registry.counter("errors", "错误数")
+        self.assertIn("dg_lab_play_errors_total 0\n", self.registry.render())
+
+    def test_duplicate_name(self):
+        with self.assertRaises(ValueError):
+            self.registry.gauge("clients", "终端数")
+
+
+class MetricsEndpointTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        registry = MetricsRegistry()
+        registry.counter("requests", "请求数").inc()
+        registry_patch = patch.object(metrics_module, "metrics", registry)
+        registry_patch.start()
+        self.addCleanup(registry_patch.stop)
+
+        async def handler(websocket):
+            await websocket.send("websocket")
+
+        self.server = await ws_serve(handler, "127.0.0.1", 0, process_request=metrics_process_request("/metrics"))
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def get(self, path: str) -> bytes:
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+        response = await asyncio.wait_for(reader.read(), 1)
+        writer.close()
+        await writer.wait_closed()
+        return response
+
+    async def test_process_request(self):
+        process_request = metrics_process_request("/metrics")
+        for path in "/metrics", "/metrics?x=1", "/metrics#top":
+            with self.subTest(path=path):
+                status, headers, body = await process_request(path, None)
+                self.assertEqual(status, HTTPStatus.OK)
+                self.assertEqual(headers, [("Content-Type", CONTENT_TYPE)])
+                self.assertIn(b"dg_lab_play_requests_total 1\n", body)
+        for path in "/", "/metrics/", "/other?path=/metrics":
+            with self.subTest(path=path):
+                self.assertIsNone(await process_request(path, None))
+
+    async def test_scrape_with_query(self):
+        response = await self.get("/metrics?x=1")
+        self.assertTrue(response.startswith(b"HTTP/1.1 200 OK\r\n"))
+        self.assertIn(b"\r\n\r\n# HELP dg_lab_play_requests_total", response)
+
+    async def test_other_path_is_websocket(self):
+        # 不是 WebSocket 握手的普通请求被拒绝
+        response = await self.get("/")
+        self.assertFalse(response.startswith(b"HTTP/1.1 200 OK\r\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
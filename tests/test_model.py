@@ -0,0 +1,256 @@
+"""``model`` 模块的测试：波形循环游标、波形库文件的编译与解析、自定义波形热重载"""
+import importlib
+import json
+import mmap
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from .utils import init_plugin
+
+init_plugin()
+
+from nonebot_plugin_dg_lab_play import pulse_library_format  # noqa: E402
+from nonebot_plugin_dg_lab_play.model import PulseWaveform, PulseLoop, PulseLibrary, CustomPulseData, \
+    CustomPulseDataReloader, custom_pulse_data  # noqa: E402
+
+model_module = importlib.import_module("nonebot_plugin_dg_lab_play.model")
+compile_pulse_library = importlib.import_module("scripts.compile_pulse_library")
+
+
+def make_waveform(*intensities: int) -> PulseWaveform:
+    """每条波形操作数据的强度均为对应的 ``intensity``，以便区分各条数据"""
+    return PulseWaveform.from_operations(((10, 10, 10, 10), (intensity,) * 4) for intensity in intensities)
+
+
+def expand(pulse_loop: PulseLoop) -> list:
+    """波形循环展开后的十六进制字符串"""
+    return [
+        frame for segment in pulse_loop.segments for _ in range(segment.repeat)
+        for frame in segment.waveform.hex_frames()
+    ]
+
+
+class PulseLoopCursorTest(unittest.TestCase):
+    def setUp(self):
+        self.x = make_waveform(1, 2, 3)
+        self.y = make_waveform(4, 5)
+        self.pulse_loop = PulseLoop.of("x", self.x).appended("x", self.x).appended("y", self.y)
+
+    def test_take_wraps_around(self):
+        frames = expand(self.pulse_loop)
+        self.assertEqual(len(frames), 8)
+        cursor = self.pulse_loop.cursor()
+        self.assertEqual(cursor.take(5), frames[:5])
+        self.assertEqual(cursor.take(5), frames[5:] + frames[:2])
+        self.assertEqual(cursor.position, 2)
+        self.assertEqual(cursor.take(16), frames[2:] + frames + frames[:2])
+
+    def test_start_position(self):
+        frames = expand(self.pulse_loop)
+        cursor = self.pulse_loop.cursor(7)
+        self.assertEqual(cursor.position, 7)
+        self.assertEqual(cursor.take(3), frames[7:] + frames[:2])
+        self.assertEqual(self.pulse_loop.cursor(10).take(1), frames[2:3])
+
+    def test_take_empty_loop(self):
+        cursor = PulseLoop().cursor()
+        self.assertEqual(cursor.take(5), [])
+        self.assertEqual(cursor.position, 0)
+
+    def test_switch_keeps_position(self):
+        cursor = self.pulse_loop.cursor()
+        cursor.take(7)
+        new_loop = self.pulse_loop.appended("z", make_waveform(6))
+        cursor.switch(new_loop)
+        self.assertEqual(cursor.position, 7)
+        self.assertEqual(cursor.take(3), expand(new_loop)[7:] + expand(new_loop)[:1])
+
+    def test_switch_to_shorter_loop(self):
+        cursor = self.pulse_loop.cursor()
+        cursor.take(7)
+        new_loop = PulseLoop.of("y", self.y)
+        cursor.switch(new_loop)
+        self.assertEqual(cursor.position, 7 % len(new_loop))
+
+
+class PulseLibraryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "library.dgpl"
+        self.waveforms = {"波形1": make_waveform(1, 2, 3), "wave2": make_waveform(4)}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def build(self, magic: bytes = pulse_library_format.MAGIC, offset_delta: int = 0) -> bytes:
+        """按文件格式构造波形库，``offset_delta`` 用于构造偏移错误的索引"""
+        names = [name.encode("utf-8") for name in self.waveforms]
+        offset = pulse_library_format.HEADER.size + sum(pulse_library_format.INDEX_ENTRY.size + len(name) for name in names)
+        index = b""
+        data = b""
+        for name, waveform in zip(names, self.waveforms.values()):
+            index += pulse_library_format.INDEX_ENTRY.pack(offset + offset_delta, len(waveform), len(name)) + name
+            data += bytes.fromhex("".join(waveform.hex_frames()))
+            offset += waveform.nbytes
+        return pulse_library_format.HEADER.pack(magic, pulse_library_format.VERSION, 0, len(names)) + index + data
+
+    def test_read_index(self):
+        self.path.write_bytes(self.build())
+        library = PulseLibrary(self.path)
+        self.assertEqual(list(library), list(self.waveforms))
+        self.assertEqual(len(library), 2)
+        self.assertIn("波形1", library)
+        self.assertNotIn("波形3", library)
+        for name, waveform in self.waveforms.items():
+            self.assertEqual(library[name], waveform)
+        self.assertIs(library["wave2"], library["wave2"])
+        with self.assertRaises(KeyError):
+            library["波形3"]
+
+    def test_invalid_magic(self):
+        self.path.write_bytes(self.build(magic=b"XXXX"))
+        with self.assertRaises(ValueError):
+            PulseLibrary(self.path)
+
+    def test_truncated_header(self):
+        self.path.write_bytes(self.build()[:pulse_library_format.HEADER.size - 1])
+        with self.assertRaises(ValueError):
+            PulseLibrary(self.path)
+
+    def test_offset_out_of_range(self):
+        self.path.write_bytes(self.build(offset_delta=8))
+        with self.assertRaises(ValueError):
+            PulseLibrary(self.path)
+
+    def test_truncated_index(self):
+        self.path.write_bytes(self.build()[:pulse_library_format.HEADER.size + 2])
+        with self.assertRaises(ValueError):
+            PulseLibrary(self.path)
+
+    def test_invalid_file_is_unmapped(self):
+        self.path.write_bytes(self.build(offset_delta=8))
+        closed = []
+        original_close = mmap.mmap.close
+
+        class TrackedMmap(mmap.mmap):
+            def close(self):
+                closed.append(self)
+                original_close(self)
+
+        with patch.object(model_module.mmap, "mmap", TrackedMmap):
+            with self.assertRaises(ValueError):
+                PulseLibrary(self.path)
+        self.assertEqual(len(closed), 1)
+        self.assertTrue(closed[0].closed)
+
+    def test_compile(self):
+        raw = {name: [list(map(list, pulse)) for pulse in waveform] for name, waveform in self.waveforms.items()}
+        self.path.write_bytes(compile_pulse_library.compile_pulse_library(raw))
+        self.assertEqual(dict(PulseLibrary(self.path)), self.waveforms)
+
+    def test_compile_rejects_invalid_pulses(self):
+        # JSON 格式的自定义波形同样不接受这些数据
+        for pulses in (
+                [[1, 2, 3, 4, 5, 6, 7, 8]],
+                [[[1, 2, 3], [4, 5, 6, 7, 8]]],
+                [[[1, 2, 3, 4], [5, 6, 7]], [[1, 2, 3, 4], [5, 6, 7, 8, 9]]],
+                [[[1, 2, 3, 4], [5, 6, 7, 256]]],
+                [[[1, 2, 3, 4], [5, 6, 7, -1]]],
+                [[[1, 2, 3, 4], [5, 6, 7, 8], [9, 9, 9, 9]]]
+        ):
+            with self.subTest(pulses=pulses):
+                with self.assertRaises(ValueError):
+                    CustomPulseData.model_validate({"x": pulses})
+                with self.assertRaises(ValueError):
+                    compile_pulse_library.compile_pulse_library({"x": pulses})
+
+
+class CustomPulseDataReloaderTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name) / "customPulseData.json"
+        original_root = custom_pulse_data.root
+        self.addCleanup(setattr, custom_pulse_data, "root", original_root)
+
+        self.raw = {
+            "x": [[[10, 10, 10, 10], [1, 1, 1, 1]]],
+            "y": [[[10, 10, 10, 10], [2, 2, 2, 2]]],
+            "z": [[[10, 10, 10, 10], [3, 3, 3, 3]]]
+        }
+        self.write(self.raw)
+        custom_pulse_data.root = CustomPulseData.model_validate(self.raw).root
+        self.reloader = CustomPulseDataReloader()
+        self.reloader.track(self.path, self.raw)
+        self.reloaded = []
+        self.reloader.on_reload(self.reloaded.append)
+
+    def write(self, raw: dict):
+        self.path.write_text(json.dumps(raw), encoding="utf-8")
+        # 确保修改时间发生变化，不受文件系统时间精度影响
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    async def test_unchanged_file(self):
+        self.assertFalse(await self.reloader.reload())
+        self.assertEqual(self.reloaded, [])
+
+    async def test_incremental_diff(self):
+        old_root = custom_pulse_data.root
+        raw = dict(self.raw)
+        raw["y"] = [[[20, 20, 20, 20], [5, 5, 5, 5]]]
+        raw["w"] = [[[10, 10, 10, 10], [4, 4, 4, 4]]]
+        del raw["z"]
+        self.write(raw)
+
+        self.assertTrue(await self.reloader.reload())
+        root = custom_pulse_data.root
+        self.assertEqual(list(root), ["x", "y", "w"])
+        # 未变化的波形沿用原有的对象，变化的波形重新校验
+        self.assertIs(root["x"], old_root["x"])
+        self.assertIsNot(root["y"], old_root["y"])
+        self.assertEqual(root["y"], PulseWaveform.from_operations([((20, 20, 20, 20), (5, 5, 5, 5))]))
+        self.assertEqual(root["w"], PulseWaveform.from_operations([((10, 10, 10, 10), (4, 4, 4, 4))]))
+        self.assertEqual(self.reloaded, [root])
+
+        # 之后的比较基于新的文件内容
+        raw["x"] = [[[30, 30, 30, 30], [6, 6, 6, 6]]]
+        self.write(raw)
+        self.assertTrue(await self.reloader.reload())
+        self.assertIs(custom_pulse_data.root["y"], root["y"])
+        self.assertIsNot(custom_pulse_data.root["x"], root["x"])
+
+    async def test_invalid_file_keeps_old_data(self):
+        old_root = custom_pulse_data.root
+        raw = dict(self.raw)
+        raw["y"] = [[[300, 10, 10, 10], [1, 1, 1, 1]]]
+        self.write(raw)
+        self.assertFalse(await self.reloader.reload())
+        self.assertIs(custom_pulse_data.root, old_root)
+        self.assertEqual(self.reloaded, [])
+        # 修正后重新读取，与最后一次成功读取的内容比较
+        raw["y"] = self.raw["y"]
+        raw["x"] = [[[40, 40, 40, 40], [7, 7, 7, 7]]]
+        self.write(raw)
+        self.assertTrue(await self.reloader.reload())
+        self.assertIs(custom_pulse_data.root["y"], old_root["y"])
+        self.assertIsNot(custom_pulse_data.root["x"], old_root["x"])
+
+    async def test_callback_error_does_not_stop_reload(self):
+        def broken_callback(_):
+            raise RuntimeError
+
+        reloader = CustomPulseDataReloader()
+        reloader.track(self.path, self.raw)
+        reloader.on_reload(broken_callback)
+        reloader.on_reload(self.reloaded.append)
+        self.write({"x": self.raw["x"]})
+        self.assertTrue(await reloader.reload())
+        self.assertEqual(list(self.reloaded[0]), ["x"])
+
+
+if __name__ == "__main__":
+    unittest.main()
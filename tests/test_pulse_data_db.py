@@ -0,0 +1,154 @@
+"""``scripts/pulse_data_db.py`` 的测试：分块增量解析 App 导出文件，批量转换 App 波形"""
+import importlib
+import io
+import itertools
+import json
+import unittest
+from pathlib import Path
+
+try:
+    pulse_data_db = importlib.import_module("scripts.pulse_data_db")
+except ImportError:
+    pulse_data_db = None
+
+ROOT = Path(__file__).parent.parent
+
+
+@unittest.skipIf(pulse_data_db is None, "未安装 scripts 依赖组")
+class IterJsonArrayTest(unittest.TestCase):
+    ITEMS = [
+        {"name": "波形", "points": "[1, 2]", "values": [4.5, -1e3, 2E-2, 0.25]},
+        1234567,
+        4.5e10,
+        "字符串,包含]分隔符",
+        [],
+        {},
+        None,
+        True,
+        [[1, 2], {"a": [3.0]}]
+    ]
+
+    def parse(self, text: str, chunk_size: int):
+        return list(pulse_data_db.iter_json_array(io.StringIO(text), json.JSONDecoder(), chunk_size))
+
+    def test_every_chunk_size(self):
+        # 缓冲区边界落在元素、数字、字符串与空白的每一个位置上
+        for text in (json.dumps(self.ITEMS), json.dumps(self.ITEMS, indent=4, ensure_ascii=False)):
+            for chunk_size in range(1, len(text) + 2):
+                with self.subTest(chunk_size=chunk_size):
+                    self.assertEqual(self.parse(text, chunk_size), self.ITEMS)
+
+    def test_truncated_numbers(self):
+        for value in (4.5, 45, 4e5, 4.5e-5, -0.125):
+            text = f"[{json.dumps(value)}]"
+            for chunk_size in range(1, len(text) + 1):
+                with self.subTest(value=value, chunk_size=chunk_size):
+                    self.assertEqual(self.parse(text, chunk_size), [value])
+
+    def test_empty_array(self):
+        for chunk_size in (1, 2, 64):
+            self.assertEqual(self.parse(" [ \n ] ", chunk_size), [])
+
+    def test_invalid_input(self):
+        for text in ("{}", "", "[1, 2", "[1 2]", "[1,", "[{\"a\": 1]"):
+            for chunk_size in (1, 3, 64):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    with self.assertRaises(ValueError):
+                        self.parse(text, chunk_size)
+
+    def test_decode_points(self):
+        text = json.dumps([{"BG_points1": "[{\"x\": 1}]", "BG_points2": [], "other": "[1]"}])
+        for chunk_size in (1, 7, 1 << 16):
+            self.assertEqual(
+                list(pulse_data_db.iter_json_array(io.StringIO(text), chunk_size=chunk_size)),
+                [{"BG_points1": [{"x": 1}], "BG_points2": [], "other": "[1]"}]
+            )
+
+
+def reference_ms_to_frequency(data: int) -> int:
+    """逐个数值换算的实现，用于验证批量换算的结果"""
+    if 10 <= data <= 100:
+        return data
+    elif 101 <= data <= 600:
+        return round((data - 100) / 5 + 100)
+    elif 601 <= data <= 1000:
+        return round((data - 600) / 10 + 200)
+    else:
+        return 10
+
+
+def reference_parse_frequency(data: int) -> int:
+    """逐个数值换算的实现，用于验证批量换算的结果"""
+    sections = ((40, 1), (15, 2), (4, 5), (10, 10), (6, 100 / 3), (4, 50), (4, 100))
+    boundary = value = step = 0
+    for boundary, value, step in zip(
+            itertools.accumulate(count for count, _ in sections),
+            itertools.accumulate(count * multiple for count, multiple in sections),
+            (count for count, _ in sections)
+    ):
+        if boundary >= data:
+            break
+    return round(value - (boundary - data) * step)
+
+
+@unittest.skipIf(pulse_data_db is None, "未安装 scripts 依赖组")
+class ConversionTest(unittest.TestCase):
+    def test_ms_to_frequency_boundaries(self):
+        for data, expected in (
+                (-1, 10), (0, 10), (9, 10), (10, 10), (100, 100), (101, 100), (103, 101),
+                (600, 200), (601, 200), (605, 200), (615, 202), (1000, 240), (1001, 10)
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(pulse_data_db.ms_to_frequency(data), expected)
+                self.assertEqual(reference_ms_to_frequency(data), expected)
+        data = pulse_data_db.np.arange(-10, 1100)
+        self.assertEqual(pulse_data_db.ms_to_frequency_array(data).tolist(), list(map(reference_ms_to_frequency, data)))
+
+    def test_parse_frequency_boundaries(self):
+        # 参数位于各段终点时为该段累计的毫秒数
+        for data, expected in ((40, 40), (55, 70), (59, 90), (69, 190), (75, 390), (79, 590), (83, 990)):
+            with self.subTest(data=data):
+                self.assertEqual(pulse_data_db.parse_frequency(data), expected)
+                self.assertEqual(reference_parse_frequency(data), expected)
+        # 各段终点前后的参数，以及超出最后一段的参数
+        for data in (0, 1, 39, 41, 54, 56, 58, 60, 68, 70, 74, 76, 78, 80, 82, 84, 100):
+            with self.subTest(data=data):
+                self.assertEqual(pulse_data_db.parse_frequency(data), reference_parse_frequency(data))
+        data = pulse_data_db.np.arange(0, 100)
+        self.assertEqual(pulse_data_db.parse_frequency_array(data).tolist(), list(map(reference_parse_frequency, data)))
+
+    def test_frequency_table(self):
+        data = pulse_data_db.np.arange(-5, 100)
+        self.assertEqual(
+            pulse_data_db.frequency_of(data).tolist(),
+            [reference_ms_to_frequency(reference_parse_frequency(value)) for value in data.tolist()]
+        )
+
+    def test_convert_bundled_pulse_data(self):
+        # 仓库中的 customPulseData.json 由 appPulseData.json 转换得到
+        with (ROOT / "customPulseData.json").open(encoding="utf-8") as f:
+            expected = json.load(f)
+        pulse_datas = pulse_data_db.read_pulse_data_from_json(ROOT / "appPulseData.json")
+        results = pulse_data_db.generate_results_from_pulse_datas(pulse_datas)
+        self.assertEqual(
+            {pulse_data.BG_waveName: json.loads(json.dumps(result)) for pulse_data, result in zip(pulse_datas, results)},
+            expected
+        )
+        # 逐个转换与批量转换的结果一致
+        for pulse_data, result in zip(pulse_datas, results):
+            self.assertEqual(pulse_data_db.generate_result_from_pulse_data(pulse_data), result)
+
+    def test_write_bundled_pulse_data(self):
+        with (ROOT / "customPulseData.json").open(encoding="utf-8") as f:
+            expected = json.load(f)
+        output = io.StringIO()
+        items = pulse_data_db.iter_raw_pulse_datas([ROOT / "appPulseData.json"])
+        with pulse_data_db.CustomPulseDataWriter(output) as writer:
+            for name, encoded in pulse_data_db.iter_converted(items, jobs=1, batch_size=5):
+                writer.write(name, encoded)
+        self.assertEqual(json.loads(output.getvalue()), expected)
+        self.assertEqual(list(json.loads(output.getvalue())), list(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""``transport`` 模块的测试：远程服务端地址的解析、缓存与轮换"""
+import socket
+import unittest
+from typing import List
+from unittest.mock import patch
+
+from .utils import init_plugin
+
+init_plugin()
+
+from nonebot_plugin_dg_lab_play import transport as transport_module  # noqa: E402
+from nonebot_plugin_dg_lab_play.transport import RemoteTransport  # noqa: E402
+
+
+def address_info(*addresses: str) -> list:
+    """``getaddrinfo`` 的返回值，每个地址对应一项"""
+    return [
+        (socket.AF_INET6 if ":" in address else socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, 443))
+        for address in addresses
+    ]
+
+
+class RemoteTransportTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.now = 0.0
+        time_patch = patch.object(transport_module.time, "monotonic", lambda: self.now)
+        time_patch.start()
+        self.addCleanup(time_patch.stop)
+        self.results: List[list] = []
+        self.lookups = 0
+        self.transport = RemoteTransport("wss://example.com/ws", dns_cache_ttl=300)
+
+    async def asyncSetUp(self):
+        async def getaddrinfo(host, port, **_):
+            self.assertEqual((host, port), ("example.com", 443))
+            self.lookups += 1
+            result = self.results.pop(0)
+            if isinstance(result, OSError):
+                raise result
+            return result
+
+        loop_patch = patch.object(transport_module.asyncio.get_running_loop(), "getaddrinfo", getaddrinfo)
+        loop_patch.start()
+        self.addCleanup(loop_patch.stop)
+
+    async def test_cached_within_ttl(self):
+        self.results = [address_info("2001:db8::1", "192.0.2.1"), address_info("192.0.2.2")]
+        self.assertEqual(await self.transport.resolve(), "2001:db8::1")
+        self.now = 299
+        self.assertEqual(await self.transport.resolve(), "2001:db8::1")
+        self.assertEqual(self.lookups, 1)
+        self.now = 300
+        self.assertEqual(await self.transport.resolve(), "192.0.2.2")
+        self.assertEqual(self.lookups, 2)
+
+    async def test_invalidate_rotates_addresses(self):
+        self.results = [
+            address_info("2001:db8::1", "192.0.2.1", "192.0.2.1", "192.0.2.3"),
+            address_info("192.0.2.4")
+        ]
+        self.assertEqual(await self.transport.resolve(), "2001:db8::1")
+        # 首个地址无法连接时改用下一个地址，而不是在缓存过期前一直失败
+        self.transport.invalidate()
+        self.assertEqual(await self.transport.resolve(), "192.0.2.1")
+        self.transport.invalidate()
+        self.assertEqual(await self.transport.resolve(), "192.0.2.3")
+        self.assertEqual(self.lookups, 1)
+        # 全部地址都已丢弃时重新解析
+        self.transport.invalidate()
+        self.assertEqual(await self.transport.resolve(), "192.0.2.4")
+        self.assertEqual(self.lookups, 2)
+        self.transport.invalidate()
+        self.transport.invalidate()
+
+    async def test_resolve_error(self):
+        self.results = [OSError("lookup failed"), address_info("192.0.2.1")]
+        # 解析失败时不指定地址，由 websockets 自行解析
+        self.assertEqual(await self.transport.connect_kwargs(), {
+            "compression": None,
+            "ssl": self.transport.ssl_context,
+            "server_hostname": "example.com"
+        })
+        self.assertEqual(await self.transport.resolve(), "192.0.2.1")
+        self.assertEqual(self.lookups, 2)
+
+    async def test_connect_kwargs(self):
+        self.results = [address_info("192.0.2.1", "192.0.2.2")]
+        self.assertEqual(await self.transport.connect_kwargs(), {
+            "compression": None,
+            "ssl": self.transport.ssl_context,
+            "server_hostname": "example.com",
+            "host": "192.0.2.1",
+            "port": 443
+        })
+        self.transport.invalidate()
+        self.assertEqual((await self.transport.connect_kwargs())["host"], "192.0.2.2")
+
+    async def test_without_cache(self):
+        transport = RemoteTransport("ws://example.com:8080", dns_cache_ttl=0, compression=True)
+        self.assertEqual(await transport.connect_kwargs(), {})
+        self.assertEqual(self.lookups, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""``ws_worker`` 模块的测试：机器人通过一个连接操作工作进程上的终端"""
+import asyncio
+import socket
+import unittest
+from typing import Set
+
+from pydglab_ws import DGLabWSServer, Channel, StrengthOperationType, StrengthData, RetCode, MessageType, \
+    MessageDataHead
+from pydglab_ws.models import WebSocketMessage
+from websockets.client import connect as ws_connect
+from websockets.server import serve as ws_serve
+
+from .utils import init_plugin
+
+init_plugin()
+
+from nonebot_plugin_dg_lab_play.ws_worker import BotSession, WorkerConnection, WorkerError, BOT_HOST, \
+    close_connections  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((BOT_HOST, 0))
+        return sock.getsockname()[1]
+
+
+class WorkerConnectionTest(unittest.IsolatedAsyncioTestCase):
+    """在测试进程中运行工作进程的服务端，模拟的 App 通过 WebSocket 连接服务端"""
+
+    async def asyncSetUp(self):
+        self.app_port = free_port()
+        self.server = DGLabWSServer(BOT_HOST, self.app_port)
+        await self.server.__aenter__()
+        self.sessions: Set[BotSession] = set()
+
+        async def handle_bot(websocket):
+            session = BotSession(self.server, websocket)
+            self.sessions.add(session)
+            await session.serve()
+
+        self.bot_server = await ws_serve(handle_bot, BOT_HOST, 0)
+        self.connection = await WorkerConnection.connect(self.bot_server.sockets[0].getsockname()[1])
+
+    async def asyncTearDown(self):
+        await self.connection.close()
+        await close_connections(self.server)
+        self.bot_server.close()
+        await self.bot_server.wait_closed()
+        await self.server.__aexit__(None, None, None)
+
+    async def connect_app(self, client_id):
+        """模拟 App 连接服务端并请求与终端绑定，返回 App 的连接与 ID"""
+        websocket = await ws_connect(f"ws://{BOT_HOST}:{self.app_port}")
+        target_id = WebSocketMessage.model_validate_json(await websocket.recv()).client_id
+        await websocket.send(WebSocketMessage(
+            type=MessageType.BIND,
+            client_id=client_id,
+            target_id=target_id,
+            message=MessageDataHead.DG_LAB
+        ).model_dump_json(by_alias=True))
+        self.assertEqual(WebSocketMessage.model_validate_json(await websocket.recv()).message, RetCode.SUCCESS)
+        return websocket, target_id
+
+    async def test_bind_and_exchange_messages(self):
+        client = await self.connection.new_client()
+        self.assertIn(str(client.client_id), client.get_qrcode("ws://127.0.0.1:4567"))
+        app, target_id = await self.connect_app(client.client_id)
+        await asyncio.wait_for(client.bind(), 1)
+        self.assertEqual(client.target_id, target_id)
+
+        await client.set_strength(Channel.B, StrengthOperationType.INCREASE, 20)
+        self.assertEqual(WebSocketMessage.model_validate_json(await app.recv()).message, "strength-2+1+20")
+        compiled_post = '["0a0a0a0a00000000","0a0a0a0a64646464"]'
+        await client.add_compiled_pulses(Channel.A, compiled_post)
+        self.assertEqual(WebSocketMessage.model_validate_json(await app.recv()).message, f"pulse-A:{compiled_post}")
+        await client.clear_pulses(Channel.A)
+        self.assertEqual(WebSocketMessage.model_validate_json(await app.recv()).message, "clear-1")
+
+        await app.send(WebSocketMessage(
+            type=MessageType.MSG,
+            client_id=client.client_id,
+            target_id=target_id,
+            message="strength-10+20+100+200"
+        ).model_dump_json(by_alias=True))
+        self.assertEqual(
+            await asyncio.wait_for(client.recv_data(), 1),
+            StrengthData(a=10, b=20, a_limit=100, b_limit=200)
+        )
+        await app.close()
+        self.assertEqual(await asyncio.wait_for(client.recv_data(), 1), RetCode.CLIENT_DISCONNECTED)
+
+    async def test_rebind_after_app_disconnected(self):
+        client = await self.connection.new_client()
+        app, _ = await self.connect_app(client.client_id)
+        await app.close()
+        self.assertEqual(await asyncio.wait_for(client.recv_data(), 1), RetCode.CLIENT_DISCONNECTED)
+        rebind = asyncio.create_task(client.rebind())
+        _, new_target_id = await self.connect_app(client.client_id)
+        await asyncio.wait_for(rebind, 1)
+        self.assertEqual(client.target_id, new_target_id)
+
+    async def test_request_before_bind_is_rejected(self):
+        client = await self.connection.new_client()
+        with self.assertRaises(WorkerError):
+            await self.connection.request("clear", client.client_id, channel=Channel.A.value)
+
+    async def test_remove_client_notifies_app(self):
+        client = await self.connection.new_client()
+        app, _ = await self.connect_app(client.client_id)
+        await client.bind()
+        await client.close()
+        message = WebSocketMessage.model_validate_json(await app.recv())
+        self.assertEqual((message.type, message.message), (MessageType.BREAK, RetCode.CLIENT_DISCONNECTED))
+        self.assertNotIn(client.client_id, self.server.local_client_ids)
+
+    async def test_connection_closed(self):
+        client = await self.connection.new_client()
+        receive = asyncio.create_task(client.recv_data())
+        await self.connection.close()
+        # 工作进程移除了通过该连接创建的终端
+        await asyncio.sleep(0.1)
+        self.assertNotIn(client.client_id, self.server.local_client_ids)
+        with self.assertRaises(ConnectionError):
+            await asyncio.wait_for(receive, 1)
+        with self.assertRaises(ConnectionError):
+            await self.connection.new_client()
+        # 已断开时移除终端不会抛出异常
+        await client.close()
+
+    async def test_close_connections(self):
+        client = await self.connection.new_client()
+        app, _ = await self.connect_app(client.client_id)
+        await client.bind()
+        for session in list(self.sessions):
+            await session.close()
+        await close_connections(self.server)
+        self.assertEqual(self.server.uuid_to_ws, {})
+        message = WebSocketMessage.model_validate_json(await app.recv())
+        self.assertEqual(message.type, MessageType.BREAK)
+        await app.wait_closed()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,15 @@
+"""
+测试共用的工具
+
+在项目根目录下通过 ``python -m unittest discover -s tests -t .`` 运行测试
+"""
+import nonebot
+
+
+def init_plugin():
+    """初始化 NoneBot 并加载插件，插件模块需要在此之后导入。已初始化时不重复初始化"""
+    try:
+        nonebot.get_driver()
+    except ValueError:
+        nonebot.init(driver="~none", log_level="WARNING")
+        nonebot.load_plugin("nonebot_plugin_dg_lab_play")